@@ -0,0 +1,130 @@
+"""Feed page latency by depth: LIMIT/OFFSET vs a (created_at, id) cursor
+
+Seeds --rows active listings under a throwaway user of --dsn, then fetches a
+--page-size page at each depth with both strategies through paginate(). Offset
+pages slow down linearly with depth, cursor pages stay flat on PostgreSQL where
+the seek is an index range scan. The seeded rows are deleted afterwards.
+
+    python -m benchmarks.keyset_pages --dsn postgresql+asyncpg://... --rows 250000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.models import RenExUser
+from src.database import Base
+from src.database.pagination import encode_cursor, paginate
+from src.listings.models import Listings
+from src.swaps.models import Swap  # noqa: F401
+from src.utils import generate_uuid7, get_current_time
+
+DEPTHS = (0, 100, 1_000, 10_000, 100_000)
+
+
+async def seed(session_maker, user_id, rows: int, batch: int = 5_000):
+    async with session_maker() as session:
+        session.add(
+            RenExUser(
+                id=user_id,
+                email=f"{user_id.hex}@keyset-bench.renex.io",
+                password_hxh="$argon2id$benchmark",
+                first_name="Bench",
+                last_name="Mark",
+            )
+        )
+        await session.commit()
+
+    now = get_current_time()
+    start = now + timedelta(days=1)
+    for offset in range(0, rows, batch):
+        values = [
+            dict(
+                id=generate_uuid7(),
+                listing_type="supply",
+                energy_type="solar",
+                volume=100,
+                price=0.15,
+                location="Lagos, Nigeria",
+                start_time=start,
+                end_time=start + timedelta(hours=8),
+                status="active",
+                user_id=user_id,
+                created_at=now - timedelta(seconds=offset + i),
+            )
+            for i in range(min(batch, rows - offset))
+        ]
+        async with session_maker() as session:
+            await session.execute(insert(Listings), values)
+            await session.commit()
+
+
+def feed_query():
+    # the prefix of get_feed_listings served by ix_listings_status_created_at
+    return select(Listings).filter(Listings.status == "active")
+
+
+async def time_page(session_maker, query, page_size, repeat, **kwargs) -> float:
+    latencies = []
+    for _ in range(repeat):
+        async with session_maker() as session:
+            start = time.perf_counter()
+            await paginate(session, query, Listings, page_size, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+async def main(dsn: str, rows: int, page_size: int, repeat: int):
+    engine = create_async_engine(dsn)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    user_id = uuid4()
+    try:
+        await seed(session_maker, user_id, rows)
+        query = feed_query()
+        for depth in DEPTHS:
+            if depth + page_size > rows:
+                break
+            # the cursor a client holds after reading `depth` rows, not timed
+            cursor = None
+            if depth:
+                async with session_maker() as session:
+                    last, _ = await paginate(
+                        session, query, Listings, 1, offset=depth - 1
+                    )
+                cursor = encode_cursor(last[0].created_at, last[0].id)
+
+            offset_ms = await time_page(
+                session_maker, query, page_size, repeat, offset=depth
+            )
+            cursor_ms = await time_page(
+                session_maker, query, page_size, repeat, cursor=cursor
+            )
+            print(
+                f"depth {depth:>7}: offset p50={offset_ms:8.2f}ms  "
+                f"cursor p50={cursor_ms:8.2f}ms"
+            )
+    finally:
+        async with session_maker() as session:
+            await session.execute(delete(Listings).where(Listings.user_id == user_id))
+            await session.execute(delete(RenExUser).where(RenExUser.id == user_id))
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--rows", type=int, default=250_000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.dsn, args.rows, args.page_size, args.repeat))
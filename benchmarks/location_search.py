@@ -0,0 +1,132 @@
+"""Feed latency with a location filter: ILIKE '%x%' vs the trigram search column
+
+Seeds --rows active listings spread over generated place names under a
+throwaway user of --dsn, then runs the feed's count and first page for each
+--query with the old ILIKE on location and with location_match(). Run it
+against a database migrated to v0004 so the pg_trgm index exists. The seeded
+rows are deleted afterwards.
+
+    python -m benchmarks.location_search --dsn postgresql+asyncpg://... --rows 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.models import RenExUser
+from src.database import setup  # noqa: F401, word_similarity on SQLite
+from src.database.pagination import paginate
+from src.listings.models import Listings
+from src.listings.search import location_match
+from src.swaps.models import Swap  # noqa: F401
+from src.utils import generate_uuid7, get_current_time
+from src.utils.search import normalize_text
+
+CITIES = ["Lagos", "Abuja", "Nairobi", "Mombasa", "Accra", "Kumasi", "Kano", "Ibadan"]
+REGIONS = ["North", "South", "East", "West", "Central", "Island", "Mainland"]
+QUERIES = ["lagos", "nairobi east", "mombsa", "kano central"]
+
+
+def place(rng: random.Random) -> str:
+    return f"{rng.choice(CITIES)} {rng.choice(REGIONS)} Farm {rng.randrange(10_000)}"
+
+
+async def seed(session_maker, user_id, rows: int, batch: int = 5_000):
+    async with session_maker() as session:
+        session.add(
+            RenExUser(
+                id=user_id,
+                email=f"{user_id.hex}@search-bench.renex.io",
+                password_hxh="$argon2id$benchmark",
+                first_name="Bench",
+                last_name="Mark",
+            )
+        )
+        await session.commit()
+
+    rng = random.Random(7)
+    start = get_current_time() + timedelta(days=1)
+    for offset in range(0, rows, batch):
+        values = []
+        for _ in range(min(batch, rows - offset)):
+            location = place(rng)
+            values.append(
+                dict(
+                    id=generate_uuid7(),
+                    listing_type="supply",
+                    energy_type="solar",
+                    volume=100,
+                    price=0.15,
+                    location=location,
+                    location_search=normalize_text(location),
+                    start_time=start,
+                    end_time=start + timedelta(hours=8),
+                    status="active",
+                    user_id=user_id,
+                )
+            )
+        async with session_maker() as session:
+            await session.execute(insert(Listings), values)
+            await session.commit()
+
+
+async def feed_page(session, match) -> int:
+    # the two statements get_feed_listings runs
+    query = select(Listings).filter(Listings.status == "active", match)
+    total = await session.scalar(select(func.count()).select_from(query.subquery()))
+    await paginate(session, query, Listings, 20)
+    return total
+
+
+async def time_feed(session_maker, build, repeat: int) -> tuple[float, int]:
+    latencies = []
+    for _ in range(repeat):
+        async with session_maker() as session:
+            start = time.perf_counter()
+            total = await feed_page(session, build(session))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), total
+
+
+async def main(dsn: str, rows: int, repeat: int):
+    engine = create_async_engine(dsn)
+    session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    user_id = uuid4()
+    try:
+        await seed(session_maker, user_id, rows)
+        for query in QUERIES:
+            ilike_ms, ilike_total = await time_feed(
+                session_maker,
+                lambda session: Listings.location.ilike(f"%{query}%"),
+                repeat,
+            )
+            search_ms, search_total = await time_feed(
+                session_maker, lambda session: location_match(session, query), repeat
+            )
+            print(
+                f"{query!r:>16}: ilike p50={ilike_ms:9.2f}ms ({ilike_total} rows)  "
+                f"search p50={search_ms:9.2f}ms ({search_total} rows)"
+            )
+    finally:
+        async with session_maker() as session:
+            await session.execute(delete(Listings).where(Listings.user_id == user_id))
+            await session.execute(delete(RenExUser).where(RenExUser.id == user_id))
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.dsn, args.rows, args.repeat))
@@ -0,0 +1,130 @@
+"""Listing match latency: order book vs a scan over every active listing
+
+Fills an OrderBook with --listings active listings, spread over two energy
+types, both listing types, --users sellers and buyers and a --days horizon,
+then matches --queries random listings with both. The scan filters and ranks
+the opposite side the way the old unbounded query plus rank() would, without
+the database round trip. Every listing is then updated once to time writes,
+and the matches are timed again. Nothing touches the database.
+
+    python -m benchmarks.orderbook --listings 100000 --queries 5000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from src.listings.events import ListingChange, ListingState
+from src.listings.orderbook import Order, OrderBook, build_sides, opposite, rank
+from src.utils import generate_uuid7, get_current_time
+
+ENERGY_TYPES = ["solar", "wind"]
+LISTING_TYPES = ["supply", "demand"]
+
+
+def make_states(rng: random.Random, count: int, users: int, days: int):
+    owners = [uuid4() for _ in range(users)]
+    now = get_current_time()
+    states = []
+    for _ in range(count):
+        start = now + timedelta(minutes=rng.randrange(days * 24 * 60))
+        states.append(
+            ListingState(
+                id=generate_uuid7(),
+                user_id=rng.choice(owners),
+                listing_type=rng.choice(LISTING_TYPES),
+                energy_type=rng.choice(ENERGY_TYPES),
+                status="active",
+                location_search=None,
+                price=round(rng.uniform(0.05, 0.30), 3),
+                volume=rng.uniform(10, 1000),
+                start_time=start,
+                end_time=start + timedelta(hours=rng.uniform(1, 24)),
+            )
+        )
+    return states
+
+
+def scan(states, target: ListingState, limit: int):
+    candidates = [
+        Order.of(state)
+        for state in states
+        if state.listing_type == opposite(target.listing_type)
+        and state.energy_type == target.energy_type
+        and state.user_id != target.user_id
+        and state.start_time <= target.end_time
+        and state.end_time >= target.start_time
+    ]
+    return rank(Order.of(target), target.listing_type == "supply", candidates, limit)
+
+
+def time_matches(book: OrderBook, targets, limit: int) -> tuple[list[float], int]:
+    latencies, found = [], 0
+    for target in targets:
+        start = time.perf_counter()
+        matches = book.match(
+            Order.of(target), target.listing_type, target.energy_type, limit
+        )
+        latencies.append((time.perf_counter() - start) * 1e6)
+        found += len(matches)
+    return latencies, found
+
+
+def percentiles(latencies: list[float]) -> str:
+    cuts = statistics.quantiles(latencies, n=100)
+    return f"p50={cuts[49]:8.1f}us  p99={cuts[98]:8.1f}us  max={max(latencies):8.1f}us"
+
+
+def run(listings: int, users: int, days: int, queries: int, limit: int):
+    rng = random.Random(11)
+    states = make_states(rng, listings, users, days)
+
+    # what OrderBook.load does with the rows it reads
+    book = OrderBook()
+    start = time.perf_counter()
+    book.sides = build_sides(
+        ((state.energy_type, state.listing_type), Order.of(state)) for state in states
+    )
+    book.loaded = True
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{listings} listings loaded in {build_ms:.0f}ms")
+
+    targets = [rng.choice(states) for _ in range(queries)]
+    book_us, found = time_matches(book, targets, limit)
+
+    scan_us = []
+    for target in targets[: max(1, queries // 50)]:
+        start = time.perf_counter()
+        expected = scan(states, target, limit)
+        scan_us.append((time.perf_counter() - start) * 1e6)
+        matches = book.match(
+            Order.of(target), target.listing_type, target.energy_type, limit
+        )
+        assert [m.order.id for m in matches] == [m.order.id for m in expected]
+
+    print(f"order book: {percentiles(book_us)}  ({found / queries:.1f} matches)")
+    print(f"scan:       {percentiles(scan_us)}")
+
+    # steady writes: every listing is replaced once more, a random number of
+    # the last ones still sit next to the interval trees afterwards
+    start = time.perf_counter()
+    for state in states[: listings - rng.randrange(listings // 100)]:
+        book.apply(ListingChange(before=state, after=state))
+    write_us = (time.perf_counter() - start) / listings * 1e6
+    print(f"updates:    {write_us:.1f}us per write, rebuilds included")
+    book_us, _ = time_matches(book, targets, limit)
+    print(f"after them: {percentiles(book_us)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    run(args.listings, args.users, args.days, args.queries, args.limit)
@@ -0,0 +1,110 @@
+"""Concurrent sign-up latency: SELECT + INSERT + refresh vs INSERT ... ON CONFLICT
+
+Password hashing is replaced by a constant so only the database work is timed.
+Rows are written to the users table of --dsn and deleted afterwards.
+
+    python -m benchmarks.signup --dsn postgresql+asyncpg://... --concurrency 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from uuid import uuid4
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import src.auth.service as auth_service
+from src.auth.models import RenExUser
+from src.auth.schemas import UserCreateRequest
+from src.database import Base
+from src.listings.models import Listings  # noqa: F401
+from src.swaps.models import Swap  # noqa: F401
+
+EMAIL_DOMAIN = "signup-bench.renex.io"
+
+
+async def _fake_hash(password: str) -> str:
+    return "$argon2id$benchmark"
+
+
+async def legacy_signup(session_maker, request: UserCreateRequest):
+    async with session_maker() as session:
+        result = await session.execute(
+            select(RenExUser).filter(RenExUser.email == request.email)
+        )
+        if result.scalar_one_or_none():
+            return
+        new_user = RenExUser(
+            email=request.email,
+            password_hxh=await _fake_hash(request.password),
+            first_name=request.first_name,
+            last_name=request.last_name,
+        )
+        session.add(new_user)
+        await session.commit()
+        await session.refresh(new_user)
+        auth_service.create_access_token(auth_service.user_claims(new_user))
+        auth_service.create_refresh_token({"sub": str(new_user.id)})
+
+
+async def single_statement_signup(session_maker, request: UserCreateRequest):
+    async with session_maker() as session:
+        await auth_service.create_user(request, session)
+
+
+async def run_strategy(name, signup, session_maker, users: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        request = UserCreateRequest(
+            email=f"{name}-{i}-{uuid4().hex[:8]}@{EMAIL_DOMAIN}",
+            password="benchmark",
+            first_name="Bench",
+            last_name="Mark",
+        )
+        async with semaphore:
+            start = time.perf_counter()
+            await signup(session_maker, request)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(users)))
+    elapsed = time.perf_counter() - start
+    p95 = statistics.quantiles(latencies, n=100)[94]
+    print(
+        f"{name:>16}: {users / elapsed:8.1f} sign-ups/s  "
+        f"p50={statistics.median(latencies):6.2f}ms  p95={p95:6.2f}ms"
+    )
+
+
+async def main(dsn: str, users: int, concurrency: int):
+    auth_service.hash_password = _fake_hash
+    engine = create_async_engine(dsn, pool_size=concurrency, max_overflow=0)
+    session_maker = async_sessionmaker(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        for name, signup in (
+            ("select+insert", legacy_signup),
+            ("insert-on-conflict", single_statement_signup),
+        ):
+            await run_strategy(name, signup, session_maker, users, concurrency)
+    finally:
+        async with session_maker() as session:
+            await session.execute(
+                delete(RenExUser).where(RenExUser.email.like(f"%@{EMAIL_DOMAIN}"))
+            )
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.dsn, args.users, args.concurrency))
@@ -0,0 +1,48 @@
+"""Compare cached and uncached access token verification on the JWT_ALGORITHM path
+
+    python -m benchmarks.token_cache --tokens 1000 --rounds 100
+"""
+
+import argparse
+import time
+from uuid import uuid4
+
+import jwt
+
+from src.auth.service import create_access_token, decode_access_token, settings
+
+
+def run(tokens: int, rounds: int):
+    minted = [
+        create_access_token(
+            {"sub": str(uuid4()), "email": "user@renex.io", "verified": True, "ver": 0}
+        )
+        for _ in range(tokens)
+    ]
+    calls = tokens * rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for token in minted:
+            jwt.decode(
+                token, key=settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+            )
+    uncached = (time.perf_counter() - start) / calls * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for token in minted:
+            decode_access_token(token)
+    cached = (time.perf_counter() - start) / calls * 1e6
+
+    print(f"{settings.JWT_ALGORITHM} jwt.decode:          {uncached:8.2f} us/token")
+    print(f"{settings.JWT_ALGORITHM} decode_access_token: {cached:8.2f} us/token")
+    print(f"speedup: {uncached / cached:.1f}x over {calls} verifications")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+    run(args.tokens, args.rounds)
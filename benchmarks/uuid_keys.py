@@ -0,0 +1,83 @@
+"""Insert throughput and primary key index size: uuid4 vs UUIDv7 keys
+
+Inserts --rows rows into two scratch tables shaped like listings (uuid primary
+key, timestamp, payload) in --batch sized multi-row INSERTs, then reports rows/s
+and the size of each primary key index. Needs PostgreSQL, the tables are
+dropped afterwards.
+
+    python -m benchmarks.uuid_keys --dsn postgresql+asyncpg://... --rows 10000000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.utils import generate_uuid7
+
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": generate_uuid7}
+
+
+async def insert_rows(engine, table: str, generate, rows: int, batch: int) -> float:
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        await conn.execute(
+            text(
+                f"CREATE TABLE {table} (id uuid PRIMARY KEY, "
+                "created_at timestamptz NOT NULL DEFAULT now(), payload text)"
+            )
+        )
+
+    insert = text(
+        f"INSERT INTO {table} (id, payload) "
+        "SELECT * FROM unnest(CAST(:ids AS uuid[]), CAST(:payloads AS text[]))"
+    )
+    payloads = ["x" * 64] * batch
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        count = min(batch, rows - offset)
+        ids = [generate() for _ in range(count)]
+        async with engine.begin() as conn:
+            await conn.execute(insert, {"ids": ids, "payloads": payloads[:count]})
+    return time.perf_counter() - start
+
+
+async def index_size(engine, table: str) -> int:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text("SELECT pg_relation_size(CAST(:index AS regclass))"),
+            {"index": f"{table}_pkey"},
+        )
+        return result.scalar_one()
+
+
+async def main(dsn: str, rows: int, batch: int):
+    engine = create_async_engine(dsn)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("uuid_keys needs a PostgreSQL --dsn")
+    try:
+        for name, generate in GENERATORS.items():
+            table = f"bench_keys_{name}"
+            elapsed = await insert_rows(engine, table, generate, rows, batch)
+            size = await index_size(engine, table)
+            print(
+                f"{name}: {rows / elapsed:10.0f} rows/s  "
+                f"pkey index {size / 2**20:8.1f} MiB"
+            )
+    finally:
+        async with engine.begin() as conn:
+            for name in GENERATORS:
+                await conn.execute(text(f"DROP TABLE IF EXISTS bench_keys_{name}"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.dsn, args.rows, args.batch))
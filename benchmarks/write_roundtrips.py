@@ -0,0 +1,166 @@
+"""Listing writes: commit + refresh with expire_on_commit vs RETURNING defaults
+
+Each strategy creates and then updates --listings listings. Statements per
+write are counted on the engine, so the saved SELECT shows up even on SQLite.
+Rows are written under a throwaway user of --dsn and deleted afterwards.
+
+    python -m benchmarks.write_roundtrips --dsn postgresql+asyncpg://...
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from sqlalchemy import delete, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.models import RenExUser
+from src.database import Base
+from src.database.setup import create_async_session
+from src.listings.enums import EnergyType, ListingType
+from src.listings.models import Listings
+from src.listings.schemas import (
+    ListingCreateRequest,
+    ListingResponse,
+    ListingUpdateRequest,
+)
+from src.listings.service import create_listing, update_listing
+from src.swaps.models import Swap  # noqa: F401
+from src.utils import get_current_time
+
+
+def listing_request() -> ListingCreateRequest:
+    start = get_current_time() + timedelta(days=1)
+    return ListingCreateRequest(
+        listing_type=ListingType.supply,
+        energy_type=EnergyType.solar,
+        volume=100,
+        price=0.15,
+        location="Lagos, Nigeria",
+        start_time=start,
+        end_time=start + timedelta(hours=8),
+    )
+
+
+async def legacy_create(session, request: ListingCreateRequest, user_id):
+    # same owner check as create_listing
+    await session.get(RenExUser, user_id)
+    listing = Listings(
+        listing_type=request.listing_type.value,
+        energy_type=request.energy_type.value,
+        volume=request.volume,
+        price=request.price,
+        location=request.location,
+        start_time=request.start_time,
+        end_time=request.end_time,
+        user_id=user_id,
+        status="active",
+    )
+    session.add(listing)
+    await session.commit()
+    await session.refresh(listing)
+    return ListingResponse.model_validate(listing)
+
+
+async def legacy_update(session, listing_id, user_id, request: ListingUpdateRequest):
+    listing = await session.get(Listings, listing_id)
+    for field, value in request.model_dump(exclude_unset=True).items():
+        setattr(listing, field, value)
+    await session.commit()
+    await session.refresh(listing)
+    return ListingResponse.model_validate(listing)
+
+
+async def returning_create(session, request: ListingCreateRequest, user_id):
+    return await create_listing(request, user_id, session)
+
+
+async def returning_update(session, listing_id, user_id, request):
+    return await update_listing(listing_id, user_id, request, session)
+
+
+async def run_strategy(name, create, update, session_maker, user_id, count, stats):
+    created, updated = [], []
+    statements = {"create": 0, "update": 0}
+    for _ in range(count):
+        stats["statements"] = 0
+        start = time.perf_counter()
+        async with session_maker() as session:
+            listing = await create(session, listing_request(), user_id)
+        created.append((time.perf_counter() - start) * 1000)
+        statements["create"] += stats["statements"]
+
+        stats["statements"] = 0
+        start = time.perf_counter()
+        async with session_maker() as session:
+            await update(session, listing.id, user_id, ListingUpdateRequest(price=0.2))
+        updated.append((time.perf_counter() - start) * 1000)
+        statements["update"] += stats["statements"]
+
+    for op, latencies in (("create", created), ("update", updated)):
+        print(
+            f"{name:>10} {op}: {statements[op] / count:4.1f} statements  "
+            f"p50={statistics.median(latencies):6.2f}ms  "
+            f"p95={statistics.quantiles(latencies, n=100)[94]:6.2f}ms"
+        )
+
+
+async def main(dsn: str, count: int):
+    engine = create_async_engine(dsn)
+    stats = {"statements": 0}
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statements(*args):
+        stats["statements"] += 1
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    user_id = uuid4()
+    async with async_sessionmaker(bind=engine)() as session:
+        session.add(
+            RenExUser(
+                id=user_id,
+                email=f"{user_id.hex}@write-bench.renex.io",
+                password_hxh="$argon2id$benchmark",
+                first_name="Bench",
+                last_name="Mark",
+            )
+        )
+        await session.commit()
+
+    try:
+        await run_strategy(
+            "refresh",
+            legacy_create,
+            legacy_update,
+            async_sessionmaker(bind=engine),
+            user_id,
+            count,
+            stats,
+        )
+        await run_strategy(
+            "returning",
+            returning_create,
+            returning_update,
+            await create_async_session(engine),
+            user_id,
+            count,
+            stats,
+        )
+    finally:
+        async with async_sessionmaker(bind=engine)() as session:
+            await session.execute(delete(RenExUser).where(RenExUser.id == user_id))
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--listings", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.dsn, args.listings))
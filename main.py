@@ -3,14 +3,23 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from contextlib import asynccontextmanager
 
-from src.database import Base
-
 # Import all models so SQLAlchemy can discover them
 from src.auth.models import RenExUser  # noqa: F401
 from src.listings.models import Listings  # noqa: F401
 from src.swaps.models import Swap  # noqa: F401
 
-from src.database.setup import _create_engine, create_async_session
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+
+from src.database.migrate import check_schema_version, migrate
+from src.database.query_log import QueryAttributionMiddleware
+from src.database.setup import (
+    _create_engine,
+    create_async_session,
+    create_replica_router,
+    db_timeout_handler,
+)
+from src.auth.hashing import start_hashing_pool, shutdown_hashing_pool
+from src.listings.orderbook import order_book
 from src.config import get_settings, LOG
 from src.api import base_router
 
@@ -22,10 +31,27 @@ async def lifespan(app: FastAPI):
     # set up database connection
     try:
         db_engine = await _create_engine(settings.DB_CONNECTION_STRING)
-        async with db_engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        # the schema is migrated once per deploy, workers only check its version
+        if settings.DB_AUTO_MIGRATE:
+            await migrate(db_engine)
+        await check_schema_version(db_engine)
         session_maker = await create_async_session(db_engine)
         app.state.session_maker = session_maker
+        replica_router = await create_replica_router(
+            settings.DB_REPLICA_CONNECTION_STRINGS
+        )
+        if replica_router is not None:
+            replica_router.start(settings.DB_REPLICA_HEALTH_INTERVAL)
+        app.state.replica_router = replica_router
+        if settings.ORDER_BOOK_ENABLED:
+            async with session_maker() as session:
+                await order_book.load(session)
+            order_book.start(
+                session_maker,
+                settings.ORDER_BOOK_REFRESH_INTERVAL,
+                settings.ORDER_BOOK_RELOAD_INTERVAL,
+            )
+        start_hashing_pool()
     except Exception as e:
         LOG.error(f"Failed to setup DB connection with error {e}")
         raise e
@@ -35,6 +61,10 @@ async def lifespan(app: FastAPI):
     finally:
         LOG.info("RenEx Server Shutting Down.....")
         await db_engine.dispose()
+        if replica_router is not None:
+            await replica_router.close()
+        order_book.stop()
+        shutdown_hashing_pool()
 
 
 app = FastAPI(
@@ -53,6 +83,11 @@ app.add_middleware(
     allow_credentials=True,
 )
 
+app.add_middleware(QueryAttributionMiddleware)
+
+app.add_exception_handler(DBAPIError, db_timeout_handler)
+app.add_exception_handler(PoolTimeoutError, db_timeout_handler)
+
 app.include_router(base_router)
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, status
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, status
 from fastapi.responses import JSONResponse
 
 from src.auth.views import base_router as auth_router
 from src.listings.views import base_router as listings_router
 from src.swaps.views import base_router as swaps_router
+from src.auth.service import require_admin_key
+from src.database.query_log import top_queries
+from src.utils.metrics import METRICS
 
 
 base_router = APIRouter(prefix="/renex/api")
@@ -33,6 +38,24 @@ def heartbeat():
     )
 
 
+@base_router.get("/metrics", dependencies=[Depends(require_admin_key)])
+def metrics():
+    """Process local service metrics (latencies, counters and gauges)"""
+    return JSONResponse(status_code=status.HTTP_200_OK, content=METRICS.snapshot())
+
+
+@base_router.get("/admin/query-stats", dependencies=[Depends(require_admin_key)])
+def query_stats(
+    limit: int = Query(50, ge=1, le=500),
+    order_by: Literal["total_ms", "count", "p95_ms", "max_ms"] = "total_ms",
+):
+    """Process local SQL statistics per statement fingerprint, with the routes
+    that ran each statement"""
+    return JSONResponse(
+        status_code=status.HTTP_200_OK, content=top_queries(limit, order_by)
+    )
+
+
 base_router.include_router(auth_router, tags=["Auth"])
 base_router.include_router(listings_router, tags=["Listings"])
 base_router.include_router(swaps_router, tags=["Swaps"])
@@ -0,0 +1,371 @@
+"""Bulk import of users from CSV or NDJSON.
+
+    python -m src.auth.bulk_import members.csv --workers 8
+
+Rows need email, password, first_name and last_name. Each batch is deduplicated
+against existing emails with one query, hashed across a process pool and
+written with COPY (PostgreSQL) or a multi-row INSERT, skipping emails that
+already exist. Progress is written to a checkpoint file after every batch, so
+an interrupted import resumes where it stopped when run again.
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TextIO
+
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from src.auth.hashing import admission, hash_password
+from src.auth.models import RenExUser
+from src.auth.schemas import UserCreateRequest, UserImportProgress
+from src.auth.service import get_password_hash
+from src.config import get_settings, LOG
+from src.database.query_log import current_request
+from src.database.setup import AsyncSession, dialect_insert
+from src.utils import generate_uuid, generate_uuid7, get_current_time
+from src.utils.metrics import METRICS
+
+settings = get_settings()
+
+USER_COLUMNS = (
+    "id",
+    "email",
+    "password_hxh",
+    "first_name",
+    "last_name",
+    "email_verified",
+    "token_version",
+    "created_at",
+    "updated_at",
+)
+
+# job id -> progress of imports started from the admin endpoint
+import_jobs: dict[str, UserImportProgress] = {}
+# jobs with a task in this process, a checkpoint left by a crash still says
+# "running" and can't tell
+running_jobs: set[str] = set()
+
+# hashing slots shared by every import in this process, one is always left to
+# logins. With a single slot the app can't import, the CLI still can.
+IMPORT_HASH_SLOTS = admission.capacity - 1
+_import_slots = asyncio.Semaphore(max(0, IMPORT_HASH_SLOTS))
+# longest wait between retries of a hash the admission controller turned away
+_MAX_RETRY_DELAY = 60.0
+
+Hasher = Callable[[list[str]], Awaitable[list[str]]]
+
+
+def detect_format(filename: str) -> str:
+    return "csv" if filename.lower().endswith(".csv") else "ndjson"
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[dict]:
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            # still yielded so rows_processed lines up with the input
+            yield {}
+
+
+def load_checkpoint(path: Path | None) -> UserImportProgress | None:
+    if path and path.exists():
+        return UserImportProgress.model_validate_json(path.read_text())
+    return None
+
+
+def save_checkpoint(path: Path | None, progress: UserImportProgress):
+    if path:
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(progress.model_dump_json())
+        os.replace(tmp, path)
+
+
+def pool_hasher(executor: ProcessPoolExecutor, concurrency: int) -> Hasher:
+    """Hash on a dedicated pool, used by the CLI"""
+
+    async def hasher(passwords: list[str]) -> list[str]:
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def hash_one(password):
+            async with semaphore:
+                return await loop.run_in_executor(executor, get_password_hash, password)
+
+        return await asyncio.gather(*(hash_one(p) for p in passwords))
+
+    return hasher
+
+
+async def admitted_hasher(passwords: list[str]) -> list[str]:
+    """Hash on the app's hashing pool without taking the admission queue from logins
+
+    Hashes shed by the admission controller are retried with backoff, a busy
+    login burst slows the import down instead of failing it.
+    """
+
+    async def hash_one(password):
+        delay = settings.HASH_RETRY_AFTER
+        async with _import_slots:
+            while True:
+                try:
+                    return await hash_password(password)
+                except HTTPException as e:
+                    if e.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                        raise
+                METRICS.counter("auth.import.hash_retries").inc()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _MAX_RETRY_DELAY)
+
+    return await asyncio.gather(*(hash_one(p) for p in passwords))
+
+
+async def _insert_users(session: AsyncSession, records: list[dict]) -> int:
+    connection = await session.connection()
+    if connection.dialect.driver == "asyncpg":
+        raw = await connection.get_raw_connection()
+        pg = raw.driver_connection
+        columns = ", ".join(USER_COLUMNS)
+        async with pg.transaction():
+            await pg.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS users_import "
+                "(LIKE users INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            await pg.copy_records_to_table(
+                "users_import",
+                records=[tuple(r[c] for c in USER_COLUMNS) for r in records],
+                columns=USER_COLUMNS,
+            )
+            # emails registered since the dedupe query are skipped, not failed
+            result = await pg.execute(
+                f"INSERT INTO users ({columns}) SELECT {columns} FROM users_import "
+                "ON CONFLICT (email) DO NOTHING"
+            )
+        return int(result.split()[-1])
+
+    result = await session.execute(
+        dialect_insert(session, RenExUser)
+        .values(records)
+        .on_conflict_do_nothing(index_elements=[RenExUser.email])
+        .returning(RenExUser.id)
+    )
+    return len(result.all())
+
+
+async def _import_batch(
+    rows: list[dict], session_maker, hasher: Hasher, progress: UserImportProgress
+):
+    users: dict[str, UserCreateRequest] = {}
+    for row in rows:
+        try:
+            user = UserCreateRequest.model_validate(row)
+        except ValidationError:
+            progress.invalid += 1
+            continue
+        if user.email in users:
+            progress.existing += 1
+        users[user.email] = user
+
+    if users:
+        async with session_maker() as session:
+            result = await session.execute(
+                select(RenExUser.email).where(RenExUser.email.in_(list(users)))
+            )
+            for email in result.scalars():
+                progress.existing += 1
+                del users[email]
+
+    # hash with no connection checked out, it takes far longer than the queries
+    new_users = list(users.values())
+    hashes = await hasher([user.password for user in new_users])
+    now = get_current_time()
+    records = [
+        {
+            "id": generate_uuid7(),
+            "email": user.email,
+            "password_hxh": password_hash,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "email_verified": False,
+            "token_version": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for user, password_hash in zip(new_users, hashes)
+    ]
+
+    inserted = 0
+    if records:
+        async with session_maker() as session:
+            inserted = await _insert_users(session, records)
+            await session.commit()
+
+    progress.imported += inserted
+    progress.existing += len(records) - inserted
+    progress.rows_processed += len(rows)
+
+
+async def import_users(
+    stream: TextIO,
+    fmt: str,
+    session_maker,
+    hasher: Hasher,
+    checkpoint: Path | None = None,
+    batch_size: int = settings.IMPORT_BATCH_SIZE,
+    progress: UserImportProgress | None = None,
+) -> UserImportProgress:
+    """Import users from a CSV or NDJSON stream, resuming from the checkpoint"""
+    progress = progress or load_checkpoint(checkpoint) or UserImportProgress()
+    progress.status = "running"
+    resume_from = progress.rows_processed
+    if resume_from:
+        LOG.info(f"Resuming user import after row {resume_from}")
+
+    start = time.perf_counter()
+    batch = []
+    try:
+        for index, row in enumerate(read_rows(stream, fmt)):
+            if index < resume_from:
+                continue
+            batch.append(row)
+            if len(batch) < batch_size:
+                continue
+            await _import_batch(batch, session_maker, hasher, progress)
+            save_checkpoint(checkpoint, progress)
+            batch = []
+            elapsed = time.perf_counter() - start
+            rate = (progress.rows_processed - resume_from) / elapsed
+            LOG.info(
+                f"Imported {progress.imported} users, {progress.existing} existing, "
+                f"{progress.invalid} invalid, {progress.rows_processed} rows "
+                f"({rate:.0f} rows/s)"
+            )
+        if batch:
+            await _import_batch(batch, session_maker, hasher, progress)
+        progress.status = "completed"
+    except Exception as e:
+        progress.status = "failed"
+        progress.error = str(e)
+        LOG.error(f"User import failed after row {progress.rows_processed}: {e}")
+        raise
+    finally:
+        save_checkpoint(checkpoint, progress)
+
+    LOG.info(f"User import finished: {progress.model_dump()}")
+    return progress
+
+
+async def start_import_job(file: UploadFile) -> tuple[UserImportProgress, Path]:
+    """Spool an upload to IMPORT_DIR and register a job keyed by its content
+
+    Uploading the same file again resumes that job from its checkpoint.
+    """
+    if IMPORT_HASH_SLOTS < 1:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Hashing pool is too small to import users next to logins, "
+            "use python -m src.auth.bulk_import",
+        )
+    import_dir = Path(settings.IMPORT_DIR)
+    await asyncio.to_thread(import_dir.mkdir, parents=True, exist_ok=True)
+
+    # file I/O runs in threads, the upload can be large
+    digest = hashlib.sha256()
+    tmp = import_dir / f"upload-{generate_uuid().hex}"
+    out = await asyncio.to_thread(tmp.open, "wb")
+    try:
+        while chunk := await file.read(1 << 20):
+            digest.update(chunk)
+            await asyncio.to_thread(out.write, chunk)
+    finally:
+        await asyncio.to_thread(out.close)
+
+    job_id = digest.hexdigest()[:16]
+    upload = import_dir / f"{job_id}.{detect_format(file.filename or '')}"
+    await asyncio.to_thread(os.replace, tmp, upload)
+
+    progress = import_jobs.get(job_id) or await asyncio.to_thread(
+        load_checkpoint, upload.with_suffix(".checkpoint")
+    )
+    if progress is None:
+        progress = UserImportProgress()
+    progress.job_id = job_id
+    import_jobs[job_id] = progress
+    return progress, upload
+
+
+async def run_import_job(upload: Path, session_maker):
+    progress = import_jobs[upload.stem]
+    # runs as a background task of the upload request, its statements aren't
+    # the request's
+    token = current_request.set(None)
+    try:
+        with upload.open(newline="") as stream:
+            await import_users(
+                stream,
+                upload.suffix.lstrip("."),
+                session_maker,
+                admitted_hasher,
+                checkpoint=upload.with_suffix(".checkpoint"),
+                progress=progress,
+            )
+    except Exception:
+        # already recorded on the job, see GET /auth/admin/import-users/{job_id}
+        pass
+    finally:
+        running_jobs.discard(upload.stem)
+        current_request.reset(token)
+
+
+async def main():
+    # register every model with the mapper, as main.py does
+    from src.listings.models import Listings  # noqa: F401
+    from src.swaps.models import Swap  # noqa: F401
+    from src.database.setup import _create_engine, create_async_session
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--checkpoint", type=Path)
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    checkpoint = args.checkpoint or args.path.with_name(
+        args.path.name + ".checkpoint"
+    )
+    engine = await _create_engine(settings.DB_CONNECTION_STRING)
+    session_maker = await create_async_session(engine)
+    executor = ProcessPoolExecutor(max_workers=args.workers)
+    try:
+        with args.path.open(newline="") as stream:
+            await import_users(
+                stream,
+                args.format or detect_format(args.path.name),
+                session_maker,
+                pool_hasher(executor, args.workers),
+                checkpoint=checkpoint,
+                batch_size=args.batch_size,
+            )
+    finally:
+        executor.shutdown()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""Benchmark argon2 on this machine and write the cost parameters that hit a
+target verify latency to the env file read by Settings.
+
+    python -m src.auth.calibrate --target-ms 50 --percentile 95
+
+Existing password hashes are migrated to the new cost on the next successful
+login (see authenticate_user), so no password reset is needed.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+from passlib.context import CryptContext
+
+from src.config import get_settings
+
+MIN_MEMORY_COST = 19456  # KiB, OWASP minimum for argon2id
+
+
+def measure_verify_ms(
+    time_cost: int, memory_cost: int, parallelism: int, samples: int, percentile: int
+) -> float:
+    context = CryptContext(
+        schemes=["argon2"],
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+    password_hash = context.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify("calibration-password", password_hash)
+        timings.append((time.perf_counter() - start) * 1000)
+    if samples == 1:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method="inclusive")[percentile - 1]
+
+
+def calibrate(
+    target_ms: float,
+    percentile: int,
+    memory_cost: int,
+    parallelism: int,
+    samples: int,
+    max_time_cost: int = 10,
+) -> dict:
+    """Find the highest time_cost (then memory_cost) that stays under target_ms
+
+    memory_cost is kept as configured where possible since it also sizes hashing
+    admission, and is only halved when a single pass is already too slow.
+    """
+    while True:
+        best = None
+        for time_cost in range(1, max_time_cost + 1):
+            latency = measure_verify_ms(
+                time_cost, memory_cost, parallelism, samples, percentile
+            )
+            print(
+                f"t={time_cost} m={memory_cost} p={parallelism}: "
+                f"p{percentile}={latency:.1f}ms"
+            )
+            if latency > target_ms:
+                break
+            best = {
+                "ARGON2_TIME_COST": time_cost,
+                "ARGON2_MEMORY_COST": memory_cost,
+                "ARGON2_PARALLELISM": parallelism,
+                "latency_ms": latency,
+            }
+        if best or memory_cost // 2 < MIN_MEMORY_COST:
+            break
+        memory_cost //= 2
+
+    if best is None:
+        raise SystemExit(
+            f"No argon2 parameters reach {target_ms}ms at p{percentile} on this "
+            f"machine without going below {MIN_MEMORY_COST} KiB of memory"
+        )
+    return best
+
+
+def write_env_file(env_file: Path, values: dict):
+    """Update (or append) the given keys in an env file, keeping other lines"""
+    lines = env_file.read_text().splitlines() if env_file.exists() else []
+    remaining = dict(values)
+    for i, line in enumerate(lines):
+        key = line.split("=", 1)[0].strip()
+        if key in remaining:
+            lines[i] = f"{key}={remaining.pop(key)}"
+    lines.extend(f"{key}={value}" for key, value in remaining.items())
+    env_file.write_text("\n".join(lines) + "\n")
+
+
+def main():
+    settings = get_settings()
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=50.0)
+    parser.add_argument("--percentile", type=int, default=95)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--memory-cost", type=int, default=settings.ARGON2_MEMORY_COST)
+    parser.add_argument("--parallelism", type=int, default=settings.ARGON2_PARALLELISM)
+    parser.add_argument("--env-file", type=Path, default=Path(".env"))
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    result = calibrate(
+        target_ms=args.target_ms,
+        percentile=args.percentile,
+        memory_cost=args.memory_cost,
+        parallelism=min(args.parallelism, os.cpu_count() or 1),
+        samples=args.samples,
+    )
+    latency = result.pop("latency_ms")
+    print(f"Selected {result} (p{args.percentile}={latency:.1f}ms)")
+
+    if not args.dry_run:
+        write_env_file(args.env_file, result)
+        print(f"Wrote argon2 parameters to {args.env_file}")
+
+
+if __name__ == "__main__":
+    main()
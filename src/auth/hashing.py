@@ -0,0 +1,136 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from src.config import get_settings, LOG
+from src.utils.metrics import METRICS
+
+settings = get_settings()
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
+)
+
+_executor: ProcessPoolExecutor | None = None
+
+
+class AdmissionController:
+    """Semaphore bounding concurrent argon2 operations, with a bounded wait queue"""
+
+    def __init__(self, name: str, capacity: int, max_queued: int, timeout: float):
+        self.name = name
+        self.capacity = capacity
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.in_flight = 0
+        self.queued = 0
+        self._semaphore = asyncio.Semaphore(capacity)
+        self._wait_ms = METRICS.histogram(f"{name}.wait_ms")
+
+        METRICS.gauge(f"{name}.capacity", lambda: self.capacity)
+        METRICS.gauge(f"{name}.in_flight", lambda: self.in_flight)
+        METRICS.gauge(f"{name}.queued", lambda: self.queued)
+
+    def _shed(self, reason: str):
+        METRICS.counter(f"{self.name}.shed.{reason}").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy, please retry",
+            headers={"Retry-After": str(settings.HASH_RETRY_AFTER)},
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            self._shed("queue_full")
+
+        self.queued += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+        except TimeoutError:
+            self._shed("timeout")
+        finally:
+            self.queued -= 1
+            self._wait_ms.observe((time.perf_counter() - start) * 1000)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+def _admission_capacity() -> int:
+    """Concurrent hashes that fit in HASH_MEMORY_BUDGET_MB, capped by the pool size"""
+    per_operation_mb = pwd_context.handler("argon2").memory_cost / 1024
+    memory_slots = max(1, int(settings.HASH_MEMORY_BUDGET_MB // per_operation_mb))
+    if memory_slots < settings.HASH_POOL_SIZE:
+        LOG.warning(
+            f"HASH_MEMORY_BUDGET_MB only allows {memory_slots} concurrent hashes, "
+            f"{settings.HASH_POOL_SIZE} pool workers will not all be used"
+        )
+    return min(memory_slots, settings.HASH_POOL_SIZE)
+
+
+admission = AdmissionController(
+    "auth.hashing.admission",
+    capacity=_admission_capacity(),
+    max_queued=settings.HASH_QUEUE_LIMIT,
+    timeout=settings.HASH_ADMISSION_TIMEOUT,
+)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+def start_hashing_pool() -> ProcessPoolExecutor:
+    """Start the process pool argon2 work is offloaded to"""
+    global _executor
+    if _executor is None:
+        # spawn keeps the workers free of the parent's event loop and threads
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.HASH_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        LOG.info(f"Started hashing pool with {settings.HASH_POOL_SIZE} workers")
+    return _executor
+
+
+def shutdown_hashing_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def _run_in_pool(operation: str, func, *args):
+    async with admission.slot():
+        with METRICS.histogram(f"auth.hashing.{operation}_ms").time_ms():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(start_hashing_pool(), func, *args)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await _run_in_pool("hash", _hash, password)
+
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    """Verify a password against its hash without blocking the event loop"""
+    return await _run_in_pool("verify", _verify, password, password_hash)
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Boolean, String
+from sqlalchemy import Boolean, Integer, String
 
 from src.database import RecordModel
 
@@ -27,6 +27,11 @@ class RenExUser(RecordModel):
     last_name: Mapped[str] = mapped_column(String(320), nullable=False, unique=False)
 
     password_hxh: Mapped[str] = mapped_column(String(320), nullable=False, unique=False)
+
+    # bumped to revoke every access token issued before, see revoke_user_tokens
+    token_version: Mapped[int] = mapped_column(
+        Integer(), nullable=False, default=0, server_default="0"
+    )
     listings = relationship("Listings", back_populates="user")
 
     # Swaps where user is the initiator
@@ -1,4 +1,4 @@
-from typing import Annotated
+from typing import Annotated, List, Optional
 from pydantic import BaseModel
 from pydantic import EmailStr, StringConstraints
 from uuid import UUID
@@ -43,3 +43,29 @@ class CurrentUser(BaseModel):
     email: EmailStr
     id: UUID
     is_verified: bool = False
+
+
+class UserImportProgress(BaseModel):
+    job_id: Optional[str] = None
+    status: str = "pending"
+    rows_processed: int = 0
+    imported: int = 0
+    existing: int = 0
+    invalid: int = 0
+    error: Optional[str] = None
+
+
+class IntrospectRequest(BaseModel):
+    tokens: List[str]
+
+
+class TokenIntrospection(BaseModel):
+    status: str  # valid, expired or invalid
+    sub: Optional[str] = None
+    exp: Optional[int] = None
+    email: Optional[str] = None
+    is_verified: Optional[bool] = None
+
+
+class IntrospectResponse(BaseModel):
+    results: List[TokenIntrospection]
@@ -1,36 +1,86 @@
+import asyncio
+import hashlib
+import hmac
+import time
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
-from src.config import get_settings
+from uuid import UUID
+from src.config import get_settings, LOG
 import jwt
 from fastapi import HTTPException, status
 
-from sqlalchemy import select
-from fastapi import status, HTTPException, Depends
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session, object_session
+from fastapi import status, HTTPException, Depends, BackgroundTasks
 from fastapi.responses import JSONResponse
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from src.auth.models import RenExUser
-from src.database.setup import AsyncSession, get_db_session
+from src.auth.hashing import pwd_context, hash_password, verify_password
+from src.auth.throttle import login_throttle
+from src.database.setup import (
+    AsyncSession,
+    AuthDBSession,
+    dialect_insert,
+    match_any,
+    reraise_db_timeout,
+)
+from src.utils import generate_uuid7
+from src.utils.cache import TTLCache
 from src.auth.schemas import (
     UserCreateRequest,
     UserCreateResponse,
     LoginRequest,
     LoginResponse,
     CurrentUser,
+    IntrospectResponse,
+    TokenIntrospection,
 )
 
 settings = get_settings()
 
 oauth2scheme = OAuth2PasswordBearer(tokenUrl="/renex/api/auth/form-login")
+admin_key_header = APIKeyHeader(name="X-Admin-Key", auto_error=False)
+internal_key_header = APIKeyHeader(name="X-Internal-Key", auto_error=False)
+
+# sha256(token) -> verified payload, entries never outlive the token's exp
+token_cache = TTLCache(
+    "access_tokens", maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.JWT_EXP * 60
+)
+
+# user id -> CurrentUser for get_current_user
+user_cache = TTLCache(
+    "users", maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL
+)
 
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    deprecated="auto",
-    argon2__time_cost=4,
-    argon2__memory_cost=65536,
-    argon2__parallelism=4,
+# user id -> token_version for get_current_user_from_token
+token_version_cache = TTLCache(
+    "token_versions",
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL,
 )
 
 
+# changed users are collected at flush and evicted once the transaction commits,
+# evicting at flush would let a concurrent reader cache the pre-commit row again
+@event.listens_for(RenExUser, "after_update")
+@event.listens_for(RenExUser, "after_delete")
+def _collect_changed_user(mapper, connection, target: RenExUser):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_users", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_cached_users(session):
+    for user_id in session.info.pop("changed_users", ()):
+        user_cache.invalidate(user_id)
+        token_version_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("changed_users", None)
+
+
 async def get_user_by_email(email: str, session: AsyncSession):
 
     try:
@@ -39,6 +89,7 @@ async def get_user_by_email(email: str, session: AsyncSession):
         )
         user = result.scalar_one_or_none()
     except Exception as e:
+        reraise_db_timeout(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content=f"Failed to find user with error {e}",
@@ -47,97 +98,350 @@ async def get_user_by_email(email: str, session: AsyncSession):
 
 
 async def create_user(user: UserCreateRequest, session: AsyncSession):
-    # check if user exists
-    db_user = await get_user_by_email(user.email, session)
+    password_hash = await hash_password(user.password)
+    new_user = RenExUser(
+        id=generate_uuid7(),
+        email=user.email,
+        password_hxh=password_hash,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        email_verified=False,
+        token_version=0,
+    )
 
-    if db_user:
+    # one round trip: the unique email index decides, no check-then-insert race
+    try:
+        result = await session.execute(
+            dialect_insert(session, RenExUser)
+            .values(
+                id=new_user.id,
+                email=new_user.email,
+                password_hxh=new_user.password_hxh,
+                first_name=new_user.first_name,
+                last_name=new_user.last_name,
+            )
+            .on_conflict_do_nothing(index_elements=[RenExUser.email])
+            .returning(RenExUser.id)
+        )
+        inserted = result.scalar_one_or_none()
+    except Exception as e:
+        reraise_db_timeout(e)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed creating new user with error {e}",
+        )
+
+    if inserted is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User with email already exists",
         )
-    else:
-        try:
 
-            password_hash = get_password_hash(user.password)
-            new_user = RenExUser(
-                email=user.email,
-                password_hxh=password_hash,
-                first_name=user.first_name,
-                last_name=user.last_name,
-            )
-
-            session.add(new_user)
-            await session.commit()
-            await session.refresh((new_user))
+    # the id is generated client side, so tokens are minted while COMMIT is in flight
+    commit = asyncio.ensure_future(session.commit())
+    await asyncio.sleep(0)
+    try:
+        access_token = create_access_token(user_claims(new_user))
+        refresh_token = create_refresh_token(refresh_claims(new_user))
+    except Exception as e:
+        await asyncio.gather(commit, return_exceptions=True)
+        reraise_db_timeout(e)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed creating user token with error {e}",
+        )
+    try:
+        await commit
+    except Exception as e:
+        reraise_db_timeout(e)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed creating new user with error {e}",
+        )
 
-        except Exception as e:
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed creating new user with error {e}",
-            )
-        try:
-            access_token = create_access_token({"sub": str(new_user.id)})
-            refresh_token = create_refresh_token({"sub": str(new_user.id)})
-        except Exception as e:
-            raise HTTPException(
-                status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed creating user token with error {e}",
-            )
+    return UserCreateResponse(
+        msg="Created User Successfully",
+        access_token=access_token,
+        refresh_token=refresh_token,
+    )
 
-        return UserCreateResponse(
-            msg="Created User Successfully",
-            access_token=access_token,
-            refresh_token=refresh_token,
-        )
 
+async def authenticate_user(
+    user: LoginRequest,
+    session: AsyncSession,
+    background_tasks: BackgroundTasks | None = None,
+    session_maker=None,
+    client_ip: str | None = None,
+):
+    # throttled attempts never reach the database or argon2
+    await login_throttle.check(client_ip, user.email)
 
-async def authenticate_user(user: LoginRequest, session: AsyncSession):
     db_user = await get_user_by_email(user.email, session)
     if not db_user:
+        await login_throttle.record_failure(client_ip, user.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User doesn't exist"
         )
     else:
 
-        if verify_password_hash(
+        if await verify_password(
             password=user.password, password_hash=db_user.password_hxh
         ):
-            access_token = create_access_token({"sub": str(db_user.id)})
-            refresh_token = create_refresh_token({"sub": str(db_user.id)})
+            # migrate hashes made with older argon2 parameters to the current cost
+            if background_tasks is not None and pwd_context.needs_update(
+                db_user.password_hxh
+            ):
+                background_tasks.add_task(
+                    rehash_password,
+                    session_maker,
+                    db_user.id,
+                    user.password,
+                    db_user.password_hxh,
+                )
+
+            await login_throttle.record_success(client_ip, user.email)
+            access_token = create_access_token(user_claims(db_user))
+            refresh_token = create_refresh_token(refresh_claims(db_user))
 
             return LoginResponse(access_token=access_token, refresh_token=refresh_token)
         else:
+            await login_throttle.record_failure(client_ip, user.email)
             raise HTTPException(
                 status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials provided"
             )
 
 
+async def rehash_password(session_maker, user_id, password: str, old_hash: str):
+    """Re-hash a password with the current argon2 parameters after a login"""
+    try:
+        new_hash = await hash_password(password)
+        async with session_maker() as session:
+            # only replace the hash we verified, a concurrent password change wins
+            await session.execute(
+                update(RenExUser)
+                .where(RenExUser.id == user_id, RenExUser.password_hxh == old_hash)
+                .values(password_hxh=new_hash)
+            )
+            await session.commit()
+        user_cache.invalidate(user_id)
+    except Exception as e:
+        LOG.warning(f"Failed to rehash password for user {user_id} with error {e}")
+
+
 async def get_current_user(
-    token=Depends(oauth2scheme), session: AsyncSession = Depends(get_db_session)
+    token=Depends(oauth2scheme), session: AsyncSession = AuthDBSession
 ) -> CurrentUser:
-    """Get current user from bearer token"""
+    """Get current user from bearer token, rejecting revoked tokens"""
 
-    try:
-        user_id = verify_access_token(token)
-    except Exception as e:
-        raise e
-    try:
-        result = await session.execute(
-            select(RenExUser).filter(RenExUser.id == user_id)
+    payload = decode_access_token(token)
+    user_id = UUID(payload["sub"])
+    await check_token_version(payload, user_id, session)
+    return await load_current_user(user_id, session)
+
+
+async def load_current_user(user_id: UUID, session: AsyncSession) -> CurrentUser:
+    async def load_user():
+        try:
+            result = await session.execute(
+                select(RenExUser.email, RenExUser.email_verified).filter(
+                    RenExUser.id == user_id
+                )
+            )
+            row = result.one_or_none()
+        except Exception as e:
+            reraise_db_timeout(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to get user from db with error {e}",
+            ) from e
+        finally:
+            # endpoints run on their own session, don't hold this connection
+            await session.close()
+        if row:
+            return CurrentUser(
+                email=row.email, id=user_id, is_verified=row.email_verified
+            )
+
+    user = await user_cache.get_or_load(user_id, load_user)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User doesn't exist"
         )
-        user = result.scalar_one_or_none()
+    return user
+
+
+async def get_current_user_from_token(
+    token=Depends(oauth2scheme), session: AsyncSession = AuthDBSession
+) -> CurrentUser:
+    """Get current user from the claims of the bearer token, without loading the user
+
+    Only the token version is checked against the database, and that lookup is
+    cached for TOKEN_VERSION_CACHE_TTL seconds. Tokens minted before the claims
+    were added count as version 0, so any revocation rejects them, and load the
+    user from the database.
+    """
+
+    payload = decode_access_token(token)
+    user_id = UUID(payload["sub"])
+    await check_token_version(payload, user_id, session)
+    if "email" not in payload:
+        return await load_current_user(user_id, session)
+
+    return CurrentUser(
+        email=payload["email"], id=user_id, is_verified=payload["verified"]
+    )
+
+
+async def check_token_version(payload: dict, user_id: UUID, session: AsyncSession):
+    if payload.get("ver", 0) < await get_token_version(user_id, session):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Access token has been revoked",
+        )
+
 
-        if user:
-            user_resp = CurrentUser(
-                email=user.email, id=user.id, is_verified=user.email_verified
+async def get_token_version(user_id: UUID, session: AsyncSession) -> int:
+    async def load_version():
+        try:
+            result = await session.execute(
+                select(RenExUser.token_version).filter(RenExUser.id == user_id)
             )
-            return user_resp
+            return result.scalar_one_or_none()
+        finally:
+            # endpoints run on their own session, don't hold this connection
+            await session.close()
 
-    except Exception as e:
+    version = await token_version_cache.get_or_load(user_id, load_version)
+    if version is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to get user from db with error {e}",
-        ) from e
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User doesn't exist"
+        )
+    return version
+
+
+async def revoke_user_tokens(user_id: UUID, session: AsyncSession):
+    """Invalidate every access and refresh token issued to a user so far
+
+    Other workers notice within TOKEN_VERSION_CACHE_TTL seconds.
+    """
+    result = await session.execute(
+        update(RenExUser)
+        .where(RenExUser.id == user_id)
+        .values(token_version=RenExUser.token_version + 1)
+        .returning(RenExUser.token_version)
+    )
+    version = result.scalar_one()
+    await session.commit()
+    user_cache.invalidate(user_id)
+    token_version_cache.set(user_id, version)
+
+
+def _key_matches(key: str | None, expected: str | None) -> bool:
+    return bool(
+        expected and key and hmac.compare_digest(key.encode(), expected.encode())
+    )
+
+
+def require_admin_key(key: str | None = Depends(admin_key_header)):
+    """Guard for admin endpoints, disabled unless ADMIN_API_KEY is set"""
+    if not _key_matches(key, settings.ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin key required"
+        )
+
+
+def require_internal_key(key: str | None = Depends(internal_key_header)):
+    """Guard for internal service endpoints, disabled unless INTERNAL_API_KEY is set"""
+    if not _key_matches(key, settings.INTERNAL_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Internal key required"
+        )
+
+
+async def introspect_tokens(
+    tokens: list[str], session: AsyncSession
+) -> IntrospectResponse:
+    """Validate a batch of access tokens and resolve their users in one query"""
+    if len(tokens) > settings.INTROSPECT_MAX_TOKENS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.INTROSPECT_MAX_TOKENS} tokens per request",
+        )
+
+    results: list[TokenIntrospection] = []
+    versions: list[int] = []
+    for token in tokens:
+        try:
+            payload = _verify_access_token_payload(token)
+            token_status = "valid"
+        except jwt.ExpiredSignatureError:
+            # the signature is still checked, only exp is skipped
+            payload = jwt.decode(
+                token,
+                key=settings.JWT_SECRET_KEY,
+                algorithms=[settings.JWT_ALGORITHM],
+                options={"verify_exp": False},
+            )
+            token_status = "expired"
+        except jwt.PyJWTError:
+            results.append(TokenIntrospection(status="invalid"))
+            versions.append(0)
+            continue
+        results.append(
+            TokenIntrospection(
+                status=token_status, sub=payload.get("sub"), exp=payload.get("exp")
+            )
+        )
+        # tokens minted before the claim was added count as version 0
+        versions.append(payload.get("ver", 0))
+
+    user_ids = set()
+    for result in results:
+        if result.status == "valid":
+            try:
+                user_ids.add(UUID(result.sub))
+            except (TypeError, ValueError):
+                result.status = "invalid"
+
+    users = {}
+    if user_ids:
+        rows = await session.execute(
+            select(
+                RenExUser.id,
+                RenExUser.email,
+                RenExUser.email_verified,
+                RenExUser.token_version,
+            ).where(match_any(session, RenExUser.id, list(user_ids)))
+        )
+        users = {row.id: row for row in rows}
+
+    for result, version in zip(results, versions):
+        if result.status != "valid":
+            continue
+        user = users.get(UUID(result.sub))
+        # deleted users and revoked tokens are reported as invalid
+        if user is None or version < (user.token_version or 0):
+            result.status = "invalid"
+            continue
+        result.email = user.email
+        result.is_verified = bool(user.email_verified)
+
+    return IntrospectResponse(results=results)
+
+
+def user_claims(user: RenExUser) -> dict:
+    """Access token claims needed to build a CurrentUser without a db lookup"""
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "verified": bool(user.email_verified),
+        "ver": user.token_version or 0,
+    }
+
+
+def refresh_claims(user: RenExUser) -> dict:
+    """Refresh token claims, the version lets revoke_user_tokens reject it"""
+    return {"sub": str(user.id), "ver": user.token_version or 0}
 
 
 def create_access_token(sub: dict):
@@ -151,19 +455,41 @@ def create_access_token(sub: dict):
     return token
 
 
-def verify_access_token(token):
+def _verify_access_token_payload(token: str) -> dict:
+    """Verify an access token, reusing the result for tokens seen before
+
+    Raises the PyJWT error on failure. The returned payload is shared with
+    the cache and must not be mutated.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(
+        token, key=settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+    )
+    token_cache.set(digest, payload, ttl=payload.get("exp", 0) - time.time())
+    return payload
+
+
+def decode_access_token(token) -> dict:
     try:
-        payload = jwt.decode(
-            token, key=settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
-        )
-        return payload["sub"]
+        return _verify_access_token_payload(token)
     except jwt.ExpiredSignatureError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Access token has expired",
         ) from e
     except jwt.PyJWTError as e:
-        raise e
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Bearer access token is invalid",
+        ) from e
+
+
+def verify_access_token(token):
+    return decode_access_token(token)["sub"]
 
 
 def create_refresh_token(sub: dict):
@@ -183,13 +509,16 @@ def create_refresh_token(sub: dict):
 
 
 def verify_refresh_token(token: str):
+    return decode_refresh_token(token)["sub"]
+
+
+def decode_refresh_token(token: str) -> dict:
     try:
-        payload = jwt.decode(
-            token=token,
+        return jwt.decode(
+            token,
             key=settings.JWT_REFRESH_SECRET,
             algorithms=[settings.JWT_ALGORITHM],
         )
-        return payload["sub"]
     except jwt.ExpiredSignatureError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -210,16 +539,41 @@ def verify_password_hash(password, password_hash) -> str:
     return pwd_context.verify(password, password_hash)
 
 
-def get_refresh_token(token: str):
+async def get_refresh_token(token: str, session: AsyncSession):
+    """Exchange a refresh token for a new token pair
+
+    The user is loaded so the refresh token's version can be checked and the
+    new access token carries current claims. Refresh tokens minted before the
+    version claim was added count as version 0.
+    """
+    payload = decode_refresh_token(token)
     try:
-        id = verify_refresh_token(token)
-        access_token = create_access_token({"sub": id})
-        refresh_token = create_refresh_token({"sub": id})
+        user_id = UUID(payload["sub"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token credentials"
+        ) from e
 
-        return LoginResponse(
-            access_token=access_token, refresh_token=refresh_token, token_type="bearer"
-        )
+    try:
+        user = await session.get(RenExUser, user_id)
     except Exception as e:
+        reraise_db_timeout(e)
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token credentials"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get user from db with error {e}",
         ) from e
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User doesn't exist"
+        )
+    if payload.get("ver", 0) < (user.token_version or 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked",
+        )
+
+    return LoginResponse(
+        access_token=create_access_token(user_claims(user)),
+        refresh_token=create_refresh_token(refresh_claims(user)),
+        token_type="bearer",
+    )
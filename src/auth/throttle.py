@@ -0,0 +1,212 @@
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from fastapi import HTTPException, status
+
+from src.config import get_settings
+from src.utils.cache import TTLCache
+from src.utils.metrics import METRICS
+
+settings = get_settings()
+
+# (window_start, previous_count, current_count, failures, blocked_until)
+ThrottleState = tuple[float, float, float, int, float]
+
+
+class ThrottleBackend(ABC):
+    """Storage for per-key throttle state"""
+
+    @abstractmethod
+    async def get(self, key: str) -> ThrottleState | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, state: ThrottleState, ttl: float): ...
+
+
+class MemoryThrottleBackend(ThrottleBackend):
+    """Per-process state, bounded to THROTTLE_MAX_KEYS with LRU eviction"""
+
+    def __init__(self, max_keys: int):
+        self._states = TTLCache("login_throttle", maxsize=max_keys, ttl=60)
+
+    async def get(self, key: str) -> ThrottleState | None:
+        return self._states.get(key)
+
+    async def set(self, key: str, state: ThrottleState, ttl: float):
+        self._states.set(key, state, ttl=ttl)
+
+
+class SQLiteThrottleBackend(ThrottleBackend):
+    """State shared by every worker on the host through a local SQLite file
+
+    Statements run on a worker thread so a locked database file never stalls
+    the event loop. Expired rows are deleted every purge_interval seconds.
+    """
+
+    purge_interval = 60.0
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(
+            path, isolation_level=None, timeout=1.0, check_same_thread=False
+        )
+        # the connection is shared by the worker threads, one statement at a time
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS login_throttle ("
+            "key TEXT PRIMARY KEY, window_start REAL, previous REAL, current REAL, "
+            "failures INTEGER, blocked_until REAL, expires_at REAL)"
+        )
+
+    async def get(self, key: str) -> ThrottleState | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, state: ThrottleState, ttl: float):
+        await asyncio.to_thread(self._set, key, state, ttl)
+
+    def _get(self, key: str) -> ThrottleState | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT window_start, previous, current, failures, blocked_until "
+                "FROM login_throttle WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def _set(self, key: str, state: ThrottleState, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO login_throttle VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, *state, now + ttl),
+            )
+            if now - self._purged_at >= self.purge_interval:
+                self._purged_at = now
+                self._conn.execute(
+                    "DELETE FROM login_throttle WHERE expires_at < ?", (now,)
+                )
+
+
+class LoginThrottle:
+    """Sliding-window attempt limits plus exponential back-off on failures
+
+    Each key (client ip or email) keeps the attempt counts of the current and
+    previous window; the previous one is weighted by how much of it still
+    overlaps the sliding window. After `free_failures` consecutive failures
+    from one ip, an email is blocked for that ip for base_delay * 2**n
+    seconds, capped at max_delay. Failures sent from elsewhere can't lock the
+    owner out, across ips the email is only rate limited. Ips are only rate
+    limited too, so users behind a shared NAT don't lock each other out.
+    """
+
+    def __init__(
+        self,
+        backend: ThrottleBackend,
+        window: float,
+        ip_limit: int,
+        email_limit: int,
+        free_failures: int,
+        base_delay: float,
+        max_delay: float,
+    ):
+        self.backend = backend
+        self.window = window
+        self.ip_limit = ip_limit
+        self.email_limit = email_limit
+        self.free_failures = free_failures
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    async def _load(self, key: str, now: float) -> ThrottleState:
+        state = await self.backend.get(key)
+        if state is None:
+            return (now, 0, 0, 0, 0.0)
+        window_start, previous, current, failures, blocked_until = state
+        elapsed = now - window_start
+        if elapsed >= 2 * self.window:
+            return (now, 0, 0, failures, blocked_until)
+        if elapsed >= self.window:
+            return (window_start + self.window, current, 0, failures, blocked_until)
+        return state
+
+    async def _save(self, key: str, state: ThrottleState, now: float):
+        ttl = max(2 * self.window, state[4] - now)
+        await self.backend.set(key, state, ttl)
+
+    def _reject(self, reason: str, retry_after: float):
+        METRICS.counter(f"auth.throttle.rejected.{reason}").inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please retry later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def _keys(self, ip: str | None, email: str) -> list[tuple[str, int]]:
+        keys = [(f"email:{email}", self.email_limit)]
+        if ip:
+            keys.append((f"ip:{ip}", self.ip_limit))
+        return keys
+
+    @staticmethod
+    def _backoff_key(ip: str | None, email: str) -> str:
+        return f"failures:{email}:{ip or ''}"
+
+    async def check(self, ip: str | None, email: str):
+        """Record a login attempt, raising 429 if the ip or email is throttled"""
+        now = time.time()
+        *_, blocked_until = await self._load(self._backoff_key(ip, email), now)
+        if blocked_until > now:
+            self._reject("backoff", blocked_until - now)
+
+        states = [
+            (key, limit, await self._load(key, now))
+            for key, limit in self._keys(ip, email)
+        ]
+        for _, limit, (window_start, previous, current, *_) in states:
+            overlap = 1 - (now - window_start) / self.window
+            if previous * overlap + current + 1 > limit:
+                self._reject("rate", window_start + self.window - now)
+
+        for key, _, (window_start, previous, current, *rest) in states:
+            await self._save(key, (window_start, previous, current + 1, *rest), now)
+
+    async def record_failure(self, ip: str | None, email: str):
+        now = time.time()
+        key = self._backoff_key(ip, email)
+        window_start, previous, current, failures, _ = await self._load(key, now)
+        failures += 1
+        blocked_until = 0.0
+        if failures > self.free_failures:
+            delay = self.base_delay * 2 ** (failures - self.free_failures - 1)
+            blocked_until = now + min(delay, self.max_delay)
+        state = (window_start, previous, current, failures, blocked_until)
+        await self._save(key, state, now)
+
+    async def record_success(self, ip: str | None, email: str):
+        now = time.time()
+        key = self._backoff_key(ip, email)
+        window_start, previous, current, _, _ = await self._load(key, now)
+        await self._save(key, (window_start, previous, current, 0, 0.0), now)
+
+
+def _create_backend() -> ThrottleBackend:
+    if settings.THROTTLE_BACKEND == "sqlite":
+        return SQLiteThrottleBackend(settings.THROTTLE_SQLITE_PATH)
+    return MemoryThrottleBackend(settings.THROTTLE_MAX_KEYS)
+
+
+login_throttle = LoginThrottle(
+    _create_backend(),
+    window=settings.THROTTLE_WINDOW,
+    ip_limit=settings.THROTTLE_IP_LIMIT,
+    email_limit=settings.THROTTLE_EMAIL_LIMIT,
+    free_failures=settings.THROTTLE_FREE_FAILURES,
+    base_delay=settings.THROTTLE_BASE_DELAY,
+    max_delay=settings.THROTTLE_MAX_DELAY,
+)
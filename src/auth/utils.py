@@ -1,19 +1,11 @@
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
 from src.config import get_settings
+from src.auth.hashing import pwd_context
 import jwt
 from fastapi import HTTPException, status
 
 settings = get_settings()
 
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    deprecated="auto",
-    argon2__time_cost=4,
-    argon2__memory_cost=65536,
-    argon2__parallelism=4,
-)
-
 
 def create_access_token(sub: dict):
     to_encode = sub.copy()
@@ -1,6 +1,14 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, status
-from fastapi.responses import JSONResponse
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Request,
+    UploadFile,
+    status,
+)
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
 
 from src.auth.schemas import (
@@ -10,13 +18,28 @@ from src.auth.schemas import (
     LoginResponse,
     OauthRequest,
     RefreshRequest,
+    UserImportProgress,
+    IntrospectRequest,
+    IntrospectResponse,
+    CurrentUser,
 )
-from src.database.setup import get_db_session
+from src.database.setup import AuthDBSession, DBSession
 from src.auth.service import (
     create_user,
     authenticate_user,
     get_current_user,
+    get_current_user_from_token,
     get_refresh_token,
+    revoke_user_tokens,
+    require_admin_key,
+    require_internal_key,
+    introspect_tokens,
+)
+from src.auth.bulk_import import (
+    import_jobs,
+    run_import_job,
+    running_jobs,
+    start_import_job,
 )
 
 
@@ -24,7 +47,7 @@ base_router = APIRouter(prefix="/auth")
 
 
 @base_router.post("/sign-up", response_model=UserCreateResponse)
-async def signup(user: UserCreateRequest, session=Depends(get_db_session)):
+async def signup(user: UserCreateRequest, session=AuthDBSession):
     response = await create_user(user, session)
     if response:
         return JSONResponse(
@@ -33,9 +56,20 @@ async def signup(user: UserCreateRequest, session=Depends(get_db_session)):
 
 
 @base_router.post("/login", response_model=LoginResponse)
-async def login(user: LoginRequest, session=Depends(get_db_session)):
+async def login(
+    user: LoginRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    session=AuthDBSession,
+):
     try:
-        resp = await authenticate_user(user, session)
+        resp = await authenticate_user(
+            user,
+            session,
+            background_tasks,
+            request.app.state.session_maker,
+            client_ip=request.client.host if request.client else None,
+        )
     except Exception as e:
         raise e
     return JSONResponse(status_code=status.HTTP_200_OK, content=resp.model_dump())
@@ -49,21 +83,29 @@ def get_user(user=Depends(get_current_user)):
 @base_router.post("/form-login")
 async def form_login(
     data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    session=Depends(get_db_session),
+    request: Request,
+    background_tasks: BackgroundTasks,
+    session=AuthDBSession,
 ):
     try:
         user = LoginRequest(email=data.username, password=data.password)
-        resp = await authenticate_user(user, session)
+        resp = await authenticate_user(
+            user,
+            session,
+            background_tasks,
+            request.app.state.session_maker,
+            client_ip=request.client.host if request.client else None,
+        )
     except Exception as e:
         raise e
     return JSONResponse(status_code=status.HTTP_200_OK, content=resp.model_dump())
 
 
 @base_router.post("/refresh-token", response_model=LoginResponse)
-def get_verify_refresh_token(request: RefreshRequest):
+async def get_verify_refresh_token(request: RefreshRequest, session=AuthDBSession):
     try:
 
-        resp = get_refresh_token(request.refresh_token)
+        resp = await get_refresh_token(request.refresh_token, session)
         if resp:
             return JSONResponse(
                 content=resp.model_dump(), status_code=status.HTTP_201_CREATED
@@ -72,11 +114,74 @@ def get_verify_refresh_token(request: RefreshRequest):
         raise e
 
 
+@base_router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    user: CurrentUser = Depends(get_current_user_from_token), session=AuthDBSession
+):
+    """Revoke every access and refresh token issued to the current user"""
+    await revoke_user_tokens(user.id, session)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@base_router.post(
+    "/introspect",
+    response_model=IntrospectResponse,
+    dependencies=[Depends(require_internal_key)],
+)
+async def introspect(request: IntrospectRequest, session=AuthDBSession):
+    """Validate a batch of access tokens for internal services"""
+    resp = await introspect_tokens(request.tokens, session)
+    return JSONResponse(status_code=status.HTTP_200_OK, content=resp.model_dump())
+
+
+@base_router.post(
+    "/admin/import-users",
+    response_model=UserImportProgress,
+    dependencies=[Depends(require_admin_key)],
+)
+async def import_users_upload(
+    file: UploadFile, request: Request, background_tasks: BackgroundTasks
+):
+    """Start importing users from a CSV or NDJSON upload
+
+    Re-uploading the same file resumes the job from its last checkpoint.
+    """
+    progress, upload = await start_import_job(file)
+    if progress.job_id not in running_jobs:
+        running_jobs.add(progress.job_id)
+        progress.status = "running"
+        background_tasks.add_task(
+            run_import_job, upload, request.app.state.session_maker
+        )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED, content=progress.model_dump()
+    )
+
+
+@base_router.get(
+    "/admin/import-users/{job_id}",
+    response_model=UserImportProgress,
+    dependencies=[Depends(require_admin_key)],
+)
+def get_import_progress(job_id: str):
+    if job_id not in import_jobs:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found"
+        )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK, content=import_jobs[job_id].model_dump()
+    )
+
+
 @base_router.post("/google-oauth", response_model=LoginResponse)
-def google_auth(request: OauthRequest, session=Depends(get_db_session)):
-    pass
+def google_auth(request: OauthRequest, session=DBSession):
+    raise HTTPException(
+        status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Not implemented yet"
+    )
 
 
-@base_router.post("forgot-password")
-def forgot_password(request, session=Depends(get_db_session)):
-    pass
+@base_router.post("/forgot-password")
+def forgot_password(request, session=DBSession):
+    raise HTTPException(
+        status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Not implemented yet"
+    )
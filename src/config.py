@@ -16,6 +16,126 @@ class Settings(BaseSettings):
 
     JWT_REFRESH_EXP: int = Field(..., alias="JWT_REFRESH_EXP")
     JWT_REFRESH_SECRET: str = Field(..., alias="JWT_REFRESH_SECRET")
+    # apply migrations at startup instead of `python -m src.database.migrate`,
+    # for local development with a single process
+    DB_AUTO_MIGRATE: bool = Field(False, alias="DB_AUTO_MIGRATE")
+    # statements slower than this are logged, see src/database/query_log.py
+    SLOW_QUERY_MS: float = Field(200.0, alias="SLOW_QUERY_MS")
+    QUERY_STATS_MAX_FINGERPRINTS: int = Field(
+        500, alias="QUERY_STATS_MAX_FINGERPRINTS"
+    )
+    # statements per request, see ROUTE_QUERY_BUDGETS in src/database/query_log.py
+    QUERY_BUDGET_MODE: str = Field("log", alias="QUERY_BUDGET_MODE")  # fail, off
+    QUERY_BUDGET_DEFAULT: int = Field(10, alias="QUERY_BUDGET_DEFAULT")
+    QUERY_BUDGETS: dict[str, int] = Field({}, alias="QUERY_BUDGETS")  # JSON
+    N_PLUS_ONE_THRESHOLD: int = Field(5, alias="N_PLUS_ONE_THRESHOLD")
+    # connection pool of each worker process, see src/database/setup.py
+    DB_POOL_SIZE: int = Field(5, alias="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(10, alias="DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT: float = Field(30.0, alias="DB_POOL_TIMEOUT")
+    DB_POOL_RECYCLE: int = Field(1800, alias="DB_POOL_RECYCLE")
+    DB_POOL_PRE_PING: bool = Field(True, alias="DB_POOL_PRE_PING")
+    DB_SSL_MODE: str = Field("require", alias="DB_SSL_MODE")  # disable, prefer...
+    # when set, pool sizes are derived from this many server connections shared
+    # by WEB_CONCURRENCY workers instead of DB_POOL_SIZE/DB_MAX_OVERFLOW
+    DB_CONNECTION_BUDGET: int | None = Field(None, alias="DB_CONNECTION_BUDGET")
+    WEB_CONCURRENCY: int = Field(1, alias="WEB_CONCURRENCY")
+    # comma separated read replica DSNs, GET endpoints read from these when set
+    DB_REPLICA_CONNECTION_STRINGS: str = Field(
+        "", alias="DB_REPLICA_CONNECTION_STRINGS"
+    )
+    DB_REPLICA_HEALTH_INTERVAL: float = Field(10.0, alias="DB_REPLICA_HEALTH_INTERVAL")
+    DB_REPLICA_COOLDOWN: float = Field(30.0, alias="DB_REPLICA_COOLDOWN")
+    # reads stay on the primary this long after a client's own write
+    DB_READ_AFTER_WRITE_WINDOW: float = Field(5.0, alias="DB_READ_AFTER_WRITE_WINDOW")
+    # statement and lock timeouts in ms per class of endpoints, 0 disables
+    DB_AUTH_STATEMENT_TIMEOUT_MS: int = Field(
+        2000, alias="DB_AUTH_STATEMENT_TIMEOUT_MS"
+    )
+    DB_AUTH_LOCK_TIMEOUT_MS: int = Field(1000, alias="DB_AUTH_LOCK_TIMEOUT_MS")
+    DB_FEED_STATEMENT_TIMEOUT_MS: int = Field(
+        5000, alias="DB_FEED_STATEMENT_TIMEOUT_MS"
+    )
+    DB_FEED_LOCK_TIMEOUT_MS: int = Field(1000, alias="DB_FEED_LOCK_TIMEOUT_MS")
+    DB_DETAIL_STATEMENT_TIMEOUT_MS: int = Field(
+        2000, alias="DB_DETAIL_STATEMENT_TIMEOUT_MS"
+    )
+    DB_DETAIL_LOCK_TIMEOUT_MS: int = Field(1000, alias="DB_DETAIL_LOCK_TIMEOUT_MS")
+    DB_WRITE_STATEMENT_TIMEOUT_MS: int = Field(
+        5000, alias="DB_WRITE_STATEMENT_TIMEOUT_MS"
+    )
+    DB_WRITE_LOCK_TIMEOUT_MS: int = Field(2000, alias="DB_WRITE_LOCK_TIMEOUT_MS")
+    # feed totals: exact COUNT(*), estimated or has_more, see src/listings/counts.py
+    FEED_COUNT_MODE: str = Field("exact", alias="FEED_COUNT_MODE")
+    # per-filter counters are reloaded after this many seconds, bounding the
+    # drift from writes made by other workers
+    FEED_COUNTER_TTL: float = Field(60.0, alias="FEED_COUNTER_TTL")
+    # shared cache of the newest feed rows per filter combination, see
+    # src/listings/feed_cache.py. Entries are served for FEED_CACHE_TTL
+    # seconds, then while refreshed in the background up to FEED_CACHE_STALE_TTL
+    FEED_CACHE_ENABLED: bool = Field(True, alias="FEED_CACHE_ENABLED")
+    FEED_CACHE_ROWS: int = Field(200, alias="FEED_CACHE_ROWS")
+    FEED_CACHE_TTL: float = Field(5.0, alias="FEED_CACHE_TTL")
+    FEED_CACHE_STALE_TTL: float = Field(30.0, alias="FEED_CACHE_STALE_TTL")
+    FEED_CACHE_MAX_BYTES: int = Field(32 * 2**20, alias="FEED_CACHE_MAX_BYTES")
+    # GET /listings/nearest searches circles growing NEAREST_RADIUS_GROWTH times
+    # from NEAREST_START_RADIUS_KM until one holds enough listings
+    NEAREST_START_RADIUS_KM: float = Field(10.0, alias="NEAREST_START_RADIUS_KM")
+    NEAREST_RADIUS_GROWTH: float = Field(4.0, alias="NEAREST_RADIUS_GROWTH")
+    # in-memory order book ranking listing matches, see src/listings/orderbook.py.
+    # Other workers' writes are read back every ORDER_BOOK_REFRESH_INTERVAL
+    # seconds (0 disables), the whole book every ORDER_BOOK_RELOAD_INTERVAL
+    ORDER_BOOK_ENABLED: bool = Field(True, alias="ORDER_BOOK_ENABLED")
+    ORDER_BOOK_REFRESH_INTERVAL: float = Field(
+        5.0, alias="ORDER_BOOK_REFRESH_INTERVAL"
+    )
+    ORDER_BOOK_RELOAD_INTERVAL: float = Field(
+        3600.0, alias="ORDER_BOOK_RELOAD_INTERVAL"
+    )
+    # verified access tokens kept in memory to skip repeated jwt.decode
+    TOKEN_CACHE_SIZE: int = Field(50000, alias="TOKEN_CACHE_SIZE")
+    # how long a user's token version is trusted before re-reading it
+    TOKEN_VERSION_CACHE_TTL: int = Field(30, alias="TOKEN_VERSION_CACHE_TTL")
+    # in-process cache of resolved users for get_current_user
+    USER_CACHE_SIZE: int = Field(10000, alias="USER_CACHE_SIZE")
+    USER_CACHE_TTL: int = Field(60, alias="USER_CACHE_TTL")
+
+    # enables the /admin endpoints when set, sent as the X-Admin-Key header
+    ADMIN_API_KEY: str | None = Field(None, alias="ADMIN_API_KEY")
+
+    # enables service-to-service endpoints such as /auth/introspect
+    INTERNAL_API_KEY: str | None = Field(None, alias="INTERNAL_API_KEY")
+    INTROSPECT_MAX_TOKENS: int = Field(1000, alias="INTROSPECT_MAX_TOKENS")
+
+    # bulk user import, see src/auth/bulk_import.py
+    IMPORT_BATCH_SIZE: int = Field(500, alias="IMPORT_BATCH_SIZE")
+    IMPORT_DIR: str = Field("/tmp/renex-imports", alias="IMPORT_DIR")
+
+    # login throttling, checked before any argon2 work (src/auth/throttle.py)
+    THROTTLE_BACKEND: str = Field("memory", alias="THROTTLE_BACKEND")  # or sqlite
+    THROTTLE_SQLITE_PATH: str = Field(
+        "/tmp/renex-throttle.sqlite", alias="THROTTLE_SQLITE_PATH"
+    )
+    THROTTLE_MAX_KEYS: int = Field(100000, alias="THROTTLE_MAX_KEYS")
+    THROTTLE_WINDOW: float = Field(60.0, alias="THROTTLE_WINDOW")
+    THROTTLE_IP_LIMIT: int = Field(30, alias="THROTTLE_IP_LIMIT")
+    THROTTLE_EMAIL_LIMIT: int = Field(10, alias="THROTTLE_EMAIL_LIMIT")
+    THROTTLE_FREE_FAILURES: int = Field(3, alias="THROTTLE_FREE_FAILURES")
+    THROTTLE_BASE_DELAY: float = Field(1.0, alias="THROTTLE_BASE_DELAY")
+    THROTTLE_MAX_DELAY: float = Field(900.0, alias="THROTTLE_MAX_DELAY")
+
+    # argon2 cost, tune per deployment with `python -m src.auth.calibrate`
+    ARGON2_TIME_COST: int = Field(4, alias="ARGON2_TIME_COST")
+    ARGON2_MEMORY_COST: int = Field(65536, alias="ARGON2_MEMORY_COST")
+    ARGON2_PARALLELISM: int = Field(4, alias="ARGON2_PARALLELISM")
+
+    # argon2 work is offloaded to a process pool, see src/auth/hashing.py
+    HASH_POOL_SIZE: int = Field(2, alias="HASH_POOL_SIZE")
+    HASH_QUEUE_LIMIT: int = Field(32, alias="HASH_QUEUE_LIMIT")
+    HASH_RETRY_AFTER: int = Field(2, alias="HASH_RETRY_AFTER")
+    # each argon2 operation allocates memory_cost KiB, admission is sized from this
+    HASH_MEMORY_BUDGET_MB: int = Field(256, alias="HASH_MEMORY_BUDGET_MB")
+    HASH_ADMISSION_TIMEOUT: float = Field(5.0, alias="HASH_ADMISSION_TIMEOUT")
 
     class Config:
         env_file = ".env"
@@ -1,9 +1,9 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import TIMESTAMP, Uuid, inspect
+from sqlalchemy import TIMESTAMP, Uuid, func, inspect
 from datetime import datetime
 from uuid import UUID
 
-from src.utils import get_current_time, generate_uuid
+from src.utils import get_current_time, generate_uuid7
 
 
 class Base(DeclarativeBase):
@@ -15,15 +15,22 @@ class Base(DeclarativeBase):
 
 class TimeStampedModel(Base):
     __abstract__ = True
+    # timestamps are set by the database and read back with RETURNING on the
+    # INSERT/UPDATE itself, so written objects don't need a refresh
+    __mapper_args__ = {"eager_defaults": True}
 
     created_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True),
         nullable=False,
-        default=get_current_time(),
+        server_default=func.now(),
     )
 
     updated_at: Mapped[datetime] = mapped_column(
-        TIMESTAMP(timezone=True), nullable=True, default=get_current_time, index=True
+        TIMESTAMP(timezone=True),
+        nullable=True,
+        server_default=func.now(),
+        onupdate=func.now(),
+        index=True,
     )
 
     def set_modified_at(self):
@@ -36,8 +43,9 @@ class TimeStampedModel(Base):
 class RecordModel(TimeStampedModel):
     __abstract__ = True
 
+    # time ordered, so keys sort by creation and inserts stay index local
     id: Mapped[UUID] = mapped_column(
-        Uuid, primary_key=True, index=True, default=generate_uuid
+        Uuid, primary_key=True, index=True, default=generate_uuid7
     )
 
     def __repr__(self) -> str:
@@ -0,0 +1,153 @@
+"""Apply pending schema migrations, run once per deploy before starting workers
+
+    python -m src.database.migrate            # apply pending migrations
+    python -m src.database.migrate --status   # show applied and pending versions
+
+Workers only check the schema_version table at boot, see check_schema_version.
+"""
+
+import argparse
+import asyncio
+import importlib
+import pkgutil
+import time
+from types import ModuleType
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.config import get_settings, LOG
+from src.database import migrations
+
+settings = get_settings()
+
+# arbitrary key for pg_advisory_lock, keeps concurrent deploys from racing
+MIGRATION_LOCK_ID = 72_906_513
+
+
+def discover() -> list[ModuleType]:
+    modules = [
+        importlib.import_module(f"{migrations.__name__}.{info.name}")
+        for info in pkgutil.iter_modules(migrations.__path__)
+        if info.name.startswith("v")
+    ]
+    modules.sort(key=lambda module: module.VERSION)
+    versions = [module.VERSION for module in modules]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions in {versions}")
+    return modules
+
+
+MIGRATIONS = discover()
+LATEST_VERSION = MIGRATIONS[-1].VERSION
+
+
+class SchemaOutdatedError(RuntimeError):
+    pass
+
+
+async def current_version(conn) -> int:
+    result = await conn.execute(text("SELECT max(version) FROM schema_version"))
+    return result.scalar() or 0
+
+
+async def check_schema_version(engine: AsyncEngine):
+    """Fail fast unless the database is at LATEST_VERSION, one query at boot"""
+    try:
+        async with engine.connect() as conn:
+            version = await current_version(conn)
+    except DBAPIError as e:
+        raise SchemaOutdatedError(
+            "No schema_version table, run `python -m src.database.migrate`"
+        ) from e
+    if version < LATEST_VERSION:
+        raise SchemaOutdatedError(
+            f"Database schema is at version {version}, the code needs "
+            f"{LATEST_VERSION}. Run `python -m src.database.migrate`"
+        )
+
+
+async def _record(conn, module: ModuleType):
+    await conn.execute(
+        text(
+            "INSERT INTO schema_version (version, description) "
+            "VALUES (:version, :description)"
+        ),
+        {"version": module.VERSION, "description": module.DESCRIPTION},
+    )
+
+
+async def migrate(engine: AsyncEngine) -> int:
+    """Apply every pending migration in order, returns the new schema version"""
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    async with autocommit.connect() as lock_conn:
+        if engine.dialect.name == "postgresql":
+            # held on its own session until the end, waits out another migrator
+            await lock_conn.execute(
+                text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}
+            )
+        try:
+            await lock_conn.execute(
+                text(
+                    "CREATE TABLE IF NOT EXISTS schema_version ("
+                    "version INTEGER PRIMARY KEY, description VARCHAR(200), "
+                    "applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)"
+                )
+            )
+            version = await current_version(lock_conn)
+
+            for module in MIGRATIONS:
+                if module.VERSION <= version:
+                    continue
+                LOG.info(f"Applying migration {module.VERSION}: {module.DESCRIPTION}")
+                start = time.perf_counter()
+                if module.TRANSACTIONAL:
+                    async with engine.begin() as conn:
+                        await module.upgrade(conn)
+                        await _record(conn, module)
+                else:
+                    async with autocommit.connect() as conn:
+                        await module.upgrade(conn)
+                        await _record(conn, module)
+                version = module.VERSION
+                LOG.info(
+                    f"Applied migration {version} in "
+                    f"{(time.perf_counter() - start) * 1000:.0f}ms"
+                )
+        finally:
+            # the lock belongs to the pooled connection, not the call, release it
+            # even when a migration failed so later migrate() calls don't block
+            if engine.dialect.name == "postgresql":
+                await lock_conn.execute(
+                    text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID}
+                )
+    return version
+
+
+async def main():
+    from src.database.setup import _create_engine
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--status", action="store_true")
+    args = parser.parse_args()
+
+    engine = await _create_engine(settings.DB_CONNECTION_STRING)
+    try:
+        if args.status:
+            try:
+                async with engine.connect() as conn:
+                    version = await current_version(conn)
+            except DBAPIError:
+                version = 0
+            pending = [m.VERSION for m in MIGRATIONS if m.VERSION > version]
+            print(f"schema version {version}, pending {pending or 'none'}")
+            return
+        version = await migrate(engine)
+        LOG.info(f"Database schema is at version {version}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
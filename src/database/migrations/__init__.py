@@ -0,0 +1,56 @@
+"""Versioned schema migrations, applied in order by `python -m src.database.migrate`
+
+Each `vNNNN_<name>.py` module defines:
+
+    VERSION: int              # NNNN, unique and increasing
+    DESCRIPTION: str
+    TRANSACTIONAL: bool       # False for CREATE INDEX CONCURRENTLY and friends
+    async def upgrade(conn: AsyncConnection): ...
+
+Transactional migrations run in one transaction together with their
+schema_version row. Non-transactional ones run on an autocommit connection, so
+they must be safe to re-run if interrupted (IF NOT EXISTS and so on).
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+async def column_exists(conn: AsyncConnection, table: str, column: str) -> bool:
+    columns = await conn.run_sync(
+        lambda sync_conn: inspect(sync_conn).get_columns(table)
+    )
+    return any(c["name"] == column for c in columns)
+
+
+async def create_index(
+    conn: AsyncConnection,
+    name: str,
+    table: str,
+    columns: str,
+    where: str = "",
+    using: str = "",
+):
+    """CREATE INDEX, CONCURRENTLY on PostgreSQL so writes aren't blocked"""
+    concurrently = ""
+    if conn.dialect.name == "postgresql":
+        concurrently = "CONCURRENTLY "
+        # an interrupted concurrent build leaves an invalid index behind, which
+        # IF NOT EXISTS would otherwise keep
+        invalid = await conn.scalar(
+            text(
+                "SELECT NOT indisvalid FROM pg_index "
+                "WHERE indexrelid = to_regclass(:name)"
+            ),
+            {"name": name},
+        )
+        if invalid:
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    where = f" WHERE {where}" if where else ""
+    using = f"USING {using} " if using else ""
+    await conn.execute(
+        text(
+            f"CREATE INDEX {concurrently}IF NOT EXISTS {name} "
+            f"ON {table} {using}({columns}){where}"
+        )
+    )
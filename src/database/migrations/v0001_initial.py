@@ -0,0 +1,116 @@
+"""Schema as of the introduction of migrations
+
+Tables are frozen here rather than taken from the models, so later model
+changes don't rewrite history. checkfirst adopts databases that were created
+by the old create_all at startup.
+"""
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Float,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    TIMESTAMP,
+    Uuid,
+    func,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+VERSION = 1
+DESCRIPTION = "users, listings and swaps"
+TRANSACTIONAL = True
+
+metadata = MetaData()
+
+
+def _record_columns() -> list[Column]:
+    return [
+        Column("id", Uuid, primary_key=True, index=True),
+        Column(
+            "created_at",
+            TIMESTAMP(timezone=True),
+            nullable=False,
+            server_default=func.now(),
+        ),
+        Column(
+            "updated_at",
+            TIMESTAMP(timezone=True),
+            nullable=True,
+            server_default=func.now(),
+            index=True,
+        ),
+    ]
+
+
+Table(
+    "users",
+    metadata,
+    Column("email", String(320), nullable=False, unique=True, index=True),
+    Column("email_verified", Boolean(), nullable=True),
+    Column("first_name", String(320), nullable=False),
+    Column("last_name", String(320), nullable=False),
+    Column("password_hxh", String(320), nullable=False),
+    Column("token_version", Integer(), nullable=False, server_default="0"),
+    *_record_columns(),
+)
+
+Table(
+    "listings",
+    metadata,
+    Column("listing_type", String(50), nullable=False, index=True),
+    Column("energy_type", String(50), nullable=False, index=True),
+    Column("volume", Float(), nullable=False),
+    Column("price", Float(), nullable=False),
+    Column("location", String(500), nullable=False),
+    Column("start_time", TIMESTAMP(timezone=True), nullable=False, index=True),
+    Column("end_time", TIMESTAMP(timezone=True), nullable=False, index=True),
+    Column("status", String(50), nullable=False, index=True),
+    Column("description", String(1000), nullable=True),
+    Column(
+        "user_id",
+        ForeignKey("users.id", ondelete="cascade"),
+        nullable=False,
+        index=True,
+    ),
+    *_record_columns(),
+)
+
+Table(
+    "swaps",
+    metadata,
+    Column(
+        "listing_id",
+        ForeignKey("listings.id", ondelete="cascade"),
+        nullable=False,
+        index=True,
+    ),
+    Column(
+        "initiator_id",
+        ForeignKey("users.id", ondelete="cascade"),
+        nullable=False,
+        index=True,
+    ),
+    Column(
+        "recipient_id",
+        ForeignKey("users.id", ondelete="cascade"),
+        nullable=False,
+        index=True,
+    ),
+    Column("proposed_volume", Float(), nullable=False),
+    Column("proposed_price", Float(), nullable=True),
+    Column("status", String(50), nullable=False, index=True),
+    Column("message", Text(), nullable=True),
+    Column("proposed_at", TIMESTAMP(timezone=True), nullable=False),
+    Column("responded_at", TIMESTAMP(timezone=True), nullable=True),
+    Column("completed_at", TIMESTAMP(timezone=True), nullable=True),
+    *_record_columns(),
+)
+
+
+async def upgrade(conn: AsyncConnection):
+    await conn.run_sync(metadata.create_all, checkfirst=True)
@@ -0,0 +1,36 @@
+"""Bring databases created by the old startup create_all up to v0001
+
+They may predate users.token_version and the server side timestamp defaults.
+SQLite can't change column defaults, so local SQLite databases from before
+should be recreated instead.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.database.migrations import column_exists
+
+VERSION = 2
+DESCRIPTION = "token_version and timestamp defaults on pre-migration schemas"
+TRANSACTIONAL = True
+
+
+async def upgrade(conn: AsyncConnection):
+    if not await column_exists(conn, "users", "token_version"):
+        await conn.execute(
+            text(
+                "ALTER TABLE users "
+                "ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"
+            )
+        )
+
+    if conn.dialect.name != "postgresql":
+        return
+    for table in ("users", "listings", "swaps"):
+        await conn.execute(
+            text(
+                f"ALTER TABLE {table} "
+                "ALTER COLUMN created_at SET DEFAULT now(), "
+                "ALTER COLUMN updated_at SET DEFAULT now()"
+            )
+        )
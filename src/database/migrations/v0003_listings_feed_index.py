@@ -0,0 +1,15 @@
+"""Index serving the feed: active listings, newest first"""
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.database.migrations import create_index
+
+VERSION = 3
+DESCRIPTION = "listings (status, created_at, id) index, built concurrently"
+TRANSACTIONAL = False
+
+
+async def upgrade(conn: AsyncConnection):
+    await create_index(
+        conn, "ix_listings_status_created_at", "listings", "status, created_at, id"
+    )
@@ -0,0 +1,60 @@
+"""Normalized listings.location_search column with a trigram index
+
+The column is backfilled in batches of committed UPDATEs, so an interrupted run
+resumes where it stopped. On PostgreSQL a pg_trgm GIN index serves substring
+and fuzzy matches; SQLite has no equivalent and scans.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.database.migrations import column_exists, create_index
+from src.utils.search import normalize_text
+
+VERSION = 4
+DESCRIPTION = "listings.location_search, backfilled, with a pg_trgm GIN index"
+TRANSACTIONAL = False
+
+BATCH_SIZE = 5_000
+
+
+async def upgrade(conn: AsyncConnection):
+    if not await column_exists(conn, "listings", "location_search"):
+        await conn.execute(
+            text("ALTER TABLE listings ADD COLUMN location_search VARCHAR(500)")
+        )
+
+    await backfill(conn)
+
+    if conn.dialect.name == "postgresql":
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await create_index(
+            conn,
+            "ix_listings_location_search_trgm",
+            "listings",
+            "location_search gin_trgm_ops",
+            using="gin",
+        )
+
+
+async def backfill(conn: AsyncConnection):
+    """Fill location_search of every listing that has none"""
+    last_id = None
+    while True:
+        after = "AND id > :last_id " if last_id is not None else ""
+        result = await conn.execute(
+            text(
+                "SELECT id, location FROM listings "
+                f"WHERE location_search IS NULL {after}"
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        )
+        rows = result.all()
+        if not rows:
+            break
+        await conn.execute(
+            text("UPDATE listings SET location_search = :search WHERE id = :id"),
+            [{"id": row.id, "search": normalize_text(row.location)} for row in rows],
+        )
+        last_id = rows[-1].id
@@ -0,0 +1,33 @@
+"""Optional listing coordinates and the geohash index for radius queries
+
+Existing listings have no coordinates, so there is nothing to backfill.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.database.migrations import column_exists, create_index
+
+VERSION = 5
+DESCRIPTION = "listings latitude, longitude and geohash, (status, geohash) index"
+TRANSACTIONAL = False
+
+
+async def upgrade(conn: AsyncConnection):
+    for column, type_ in (
+        ("latitude", "FLOAT"),
+        ("longitude", "FLOAT"),
+        ("geohash", "VARCHAR(12)"),
+    ):
+        if not await column_exists(conn, "listings", column):
+            await conn.execute(
+                text(f"ALTER TABLE listings ADD COLUMN {column} {type_}")
+            )
+
+    # LIKE 'prefix%' needs the pattern opclass under non-C collations
+    geohash = "geohash"
+    if conn.dialect.name == "postgresql":
+        geohash = "geohash varchar_pattern_ops"
+    await create_index(
+        conn, "ix_listings_status_geohash", "listings", f"status, {geohash}"
+    )
@@ -0,0 +1,27 @@
+"""Index for listings without location_search, and a second backfill
+
+Instances still running the code from before v0004 insert listings without
+location_search while a deploy rolls out. location_match finds them on their
+raw location through this partial index, which stays near empty. The backfill
+from v0004 runs again to fill the ones written since.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.database.migrations import create_index
+from src.database.migrations.v0004_listings_location_search import backfill
+
+VERSION = 6
+DESCRIPTION = "partial index on listings without location_search, backfilled"
+TRANSACTIONAL = False
+
+
+async def upgrade(conn: AsyncConnection):
+    await create_index(
+        conn,
+        "ix_listings_location_search_null",
+        "listings",
+        "status",
+        where="location_search IS NULL",
+    )
+    await backfill(conn)
@@ -0,0 +1,104 @@
+"""Keyset pagination on (created_at, id), newest first
+
+OFFSET makes the database walk and discard every skipped row, and rows
+inserted between two page loads shift the pages. A cursor instead carries the
+(created_at, id) of the last row served and the next page seeks past it, which
+stays one index range scan at any depth. Cursors are opaque to clients.
+
+estimate_count() is the cheap alternative to COUNT(*) for page totals.
+"""
+
+import base64
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, desc, func, literal_column, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{id.hex}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def _seek_predicate(session: AsyncSession, model, created_at: datetime, id: UUID):
+    """Rows strictly after (created_at, id) in newest first order"""
+    created_column = model.created_at
+    if session.bind.dialect.name == "sqlite":
+        # CURRENT_TIMESTAMP defaults and bound datetimes are stored as text in
+        # different formats there, compare them as numbers
+        created_column = func.julianday(created_column)
+        created_at = func.julianday(created_at)
+    return tuple_(created_column, model.id) < tuple_(created_at, id)
+
+
+async def paginate(
+    session: AsyncSession,
+    query: Select,
+    model,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> tuple[list, Optional[str]]:
+    """One page of `query`, newest first, and the cursor of the page after it
+
+    With a cursor the page starts after the row it points at and offset is
+    ignored. next_cursor is None on the last page.
+    """
+    query = query.order_by(desc(model.created_at), desc(model.id))
+    if cursor is not None:
+        query = query.filter(_seek_predicate(session, model, *decode_cursor(cursor)))
+    else:
+        query = query.offset(offset)
+
+    # one extra row tells whether there is a next page
+    result = await session.execute(query.limit(limit + 1))
+    rows = list(result.scalars().all())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+class _Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    # parameters stay bound, compiled with the statement as usual
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def estimate_count(session: AsyncSession, query: Select) -> Optional[int]:
+    """Rows the PostgreSQL planner expects `query` to return, None elsewhere
+
+    Comes from table statistics, so it costs planning time only and is off by
+    whatever ANALYZE last missed.
+    """
+    if session.bind.dialect.name != "postgresql":
+        return None
+    # an untyped column list keeps the SELECT's result types off the plan row
+    query = query.with_only_columns(literal_column("1"), maintain_column_froms=True)
+    result = await session.execute(_Explain(query))
+    plan = result.scalar_one()
+    return int(plan[0]["Plan"]["Plan Rows"])
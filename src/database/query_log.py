@@ -0,0 +1,306 @@
+"""Per-statement timing attributed to the request that ran it
+
+Engine events time every statement. The request it belongs to is found through
+a contextvar that QueryAttributionMiddleware sets for each HTTP request.
+Statements slower than SLOW_QUERY_MS are logged, and every statement is
+aggregated per SQL fingerprint for GET /renex/api/admin/query-stats. Failed
+statements, statement_timeout cancellations included, are recorded the same
+way and also counted as errors.
+
+Each response carries its statement count and DB time in the X-DB-Queries and
+Server-Timing headers. Requests over their route's query budget are logged, or
+fail with QUERY_BUDGET_MODE=fail, which is what tests should run with.
+"""
+
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.config import get_settings, LOG
+from src.utils.metrics import Histogram
+
+settings = get_settings()
+
+
+# statements each endpoint may run, locked in at their current counts. Keys are
+# "METHOD path", QUERY_BUDGETS in the environment overrides them. Authenticated
+# routes include the token_version lookup that runs when its cache is cold.
+ROUTE_QUERY_BUDGETS = {
+    "POST /auth/sign-up": 1,
+    "POST /auth/login": 1,
+    "POST /auth/form-login": 1,
+    "POST /auth/refresh-token": 1,
+    "POST /auth/logout": 2,
+    "GET /auth/me": 2,
+    "POST /auth/introspect": 1,
+    # the import itself runs after the response, outside the request's count
+    "POST /auth/admin/import-users": 0,
+    "GET /auth/admin/import-users/{job_id}": 0,
+    "POST /auth/google-oauth": 0,
+    "POST /auth/forgot-password": 0,
+    "POST /listings/": 4,
+    "GET /listings/feed": 4,
+    "GET /listings/me": 2,
+    "GET /listings/locations": 2,
+    "GET /listings/nearby": 2,
+    # one query per circle, at most 6 with the default NEAREST_* settings
+    "GET /listings/nearest": 7,
+    "GET /listings/{listing_id}": 2,
+    "PUT /listings/{listing_id}": 3,
+    "DELETE /listings/{listing_id}": 4,
+    "GET /listings/{listing_id}/matches": 3,
+    "POST /swaps/": 4,
+    "GET /swaps/me": 2,
+    "GET /swaps/{swap_id}": 2,
+    "PUT /swaps/{swap_id}/respond": 3,
+    "POST /swaps/{swap_id}/cancel": 3,
+    "POST /swaps/{swap_id}/complete": 5,
+    "GET /swaps/listing/{listing_id}": 3,
+}
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class RequestQueries:
+    """Statements run on behalf of one request"""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.count = 0
+        self.total_ms = 0.0
+        self.fingerprints: dict[str, int] = {}
+
+    @property
+    def route(self) -> str:
+        # the router sets scope["route"] once it matched, after this was created
+        route = self.scope.get("route")
+        path = getattr(route, "path", None) or self.scope.get("path", "")
+        return f"{self.scope.get('method', '')} {path}".strip()
+
+    @property
+    def budget(self) -> int:
+        route = self.route
+        return settings.QUERY_BUDGETS.get(
+            route, ROUTE_QUERY_BUDGETS.get(route, settings.QUERY_BUDGET_DEFAULT)
+        )
+
+    def headers(self) -> list[tuple[bytes, bytes]]:
+        return [
+            (b"x-db-queries", str(self.count).encode()),
+            (
+                b"server-timing",
+                f'db;dur={self.total_ms:.1f};desc="{self.count} queries"'.encode(),
+            ),
+        ]
+
+    def report(self):
+        """Log budget overruns and statements repeated like an N+1 loop"""
+        if settings.QUERY_BUDGET_MODE == "off":
+            return
+        if self.count > self.budget:
+            LOG.warning(
+                f"{self.route} ran {self.count} queries, over its budget of "
+                f"{self.budget}"
+            )
+        for sql, count in self.fingerprints.items():
+            if count >= settings.N_PLUS_ONE_THRESHOLD:
+                LOG.warning(
+                    f"Possible N+1 on {self.route}: {count} x {sql[:300]}"
+                )
+
+
+current_request: ContextVar[RequestQueries | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+class QueryAttributionMiddleware:
+    """Makes the current request visible to the engine events"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        queries = RequestQueries(scope)
+        token = current_request.set(queries)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), *queries.headers()],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_request.reset(token)
+            queries.report()
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Fail if the block runs more than `limit` statements, for tests
+
+        with assert_max_queries(1):
+            await get_swap_by_id(swap_id, session)
+
+    Through the API, compare the X-DB-Queries header of the response instead.
+    """
+    queries = RequestQueries({})
+    token = current_request.set(queries)
+    try:
+        yield queries
+    finally:
+        current_request.reset(token)
+    assert queries.count <= limit, (
+        f"{queries.count} queries, expected at most {limit}: "
+        f"{list(queries.fingerprints)}"
+    )
+
+
+_LITERALS = re.compile(
+    r"'(?:[^']|'')*'"  # string literals
+    r"|\$\d+|%\(\w+\)s|%s|(?<!:):\w+|\?"  # bind parameters of any paramstyle
+    r"|\b\d+(?:\.\d+)?\b"  # numbers
+)
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+# statements come from SQLAlchemy's compiled cache, so few distinct strings
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """SQL with literals and parameters replaced, so similar statements group"""
+    normalized = _LITERALS.sub("?", statement)
+    normalized = _LISTS.sub("(...)", normalized)
+    return _SPACES.sub(" ", normalized).strip()
+
+
+class QueryStats:
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.histogram = Histogram(window=512)
+        self.errors = 0
+        self.routes: dict[str, int] = {}
+
+    def observe(self, elapsed_ms: float, route: str | None, failed: bool = False):
+        self.histogram.observe(elapsed_ms)
+        if failed:
+            self.errors += 1
+        if route:
+            self.routes[route] = self.routes.get(route, 0) + 1
+
+    def snapshot(self) -> dict:
+        return {
+            "sql": self.sql,
+            "count": self.histogram.count,
+            "errors": self.errors,
+            "total_ms": self.histogram.total,
+            "p95_ms": self.histogram.percentile(95),
+            "max_ms": self.histogram.max,
+            "routes": self.routes,
+        }
+
+
+# fingerprint -> stats, bounded to QUERY_STATS_MAX_FINGERPRINTS
+query_stats: dict[str, QueryStats] = {}
+
+
+def _stats_for(sql: str) -> QueryStats:
+    stats = query_stats.get(sql)
+    if stats is None:
+        if len(query_stats) >= settings.QUERY_STATS_MAX_FINGERPRINTS:
+            # make room by dropping the least frequent statement
+            rarest = min(query_stats, key=lambda k: query_stats[k].histogram.count)
+            del query_stats[rarest]
+        stats = query_stats[sql] = QueryStats(sql)
+    return stats
+
+
+def top_queries(limit: int, order_by: str = "total_ms") -> list[dict]:
+    snapshots = [stats.snapshot() for stats in query_stats.values()]
+    snapshots.sort(key=lambda s: s[order_by], reverse=True)
+    return snapshots[:limit]
+
+
+def _parameter_count(parameters, executemany: bool) -> int:
+    if executemany and parameters:
+        parameters = parameters[0]
+    return len(parameters) if parameters else 0
+
+
+def register_query_events(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        request = current_request.get()
+        if (
+            request is not None
+            and settings.QUERY_BUDGET_MODE == "fail"
+            and request.scope
+            and request.count >= request.budget
+        ):
+            raise QueryBudgetExceeded(
+                f"{request.route} exceeded its budget of {request.budget} queries"
+            )
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        rows = cursor.rowcount if cursor.rowcount >= 0 else None
+        _record(conn, statement, parameters, executemany, rows)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def on_error(exception_context):
+        conn = exception_context.connection
+        # statements rejected before they were sent, like budget overruns, have
+        # no start time
+        if conn is None or "query_start" not in conn.info:
+            return
+        context = exception_context.execution_context
+        _record(
+            conn,
+            exception_context.statement,
+            exception_context.parameters,
+            bool(context and context.executemany),
+            None,
+            error=exception_context.original_exception,
+        )
+
+
+def _record(
+    conn,
+    statement: str,
+    parameters,
+    executemany: bool,
+    rows: int | None,
+    error: BaseException | None = None,
+):
+    elapsed_ms = (time.perf_counter() - conn.info.pop("query_start")) * 1000
+    request = current_request.get()
+    route = request.route if request is not None else None
+    sql = fingerprint(statement)
+    if request is not None:
+        request.count += 1
+        request.total_ms += elapsed_ms
+        request.fingerprints[sql] = request.fingerprints.get(sql, 0) + 1
+
+    _stats_for(sql).observe(elapsed_ms, route, failed=error is not None)
+    if elapsed_ms >= settings.SLOW_QUERY_MS:
+        outcome = f"{rows} rows" if error is None else f"failed: {error!r}"[:300]
+        LOG.warning(
+            f"Slow query {elapsed_ms:.1f}ms on {route}: {sql[:500]} "
+            f"({_parameter_count(parameters, executemany)} params, {outcome})"
+        )
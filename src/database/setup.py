@@ -1,37 +1,437 @@
+import asyncio
+import hashlib
+import time
 from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
 
-from fastapi import Request
+from fastapi import Depends, Request, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncEngine,
     async_sessionmaker,
     AsyncSession,
 )
-from src.config import LOG
+from sqlalchemy import any_, bindparam, event, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from src.config import get_settings, LOG
+from src.database.query_log import register_query_events
+from src.utils.cache import TTLCache
+from src.utils.metrics import METRICS
+from src.utils.search import word_similarity
 
+settings = get_settings()
 
-async def _create_engine(conn_string: str):
-    return create_async_engine(
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits for a connection"""
+
+    metrics_prefix = "db.pool"
+
+    def _do_get(self):
+        try:
+            with METRICS.histogram(f"{self.metrics_prefix}.checkout_wait_ms").time_ms():
+                return super()._do_get()
+        except PoolTimeoutError:
+            METRICS.counter(f"{self.metrics_prefix}.checkout_timeouts").inc()
+            raise
+
+
+def pool_sizing() -> tuple[int, int]:
+    """(pool_size, max_overflow) of each worker process
+
+    With DB_CONNECTION_BUDGET set, every worker gets an equal share of it: half
+    kept open as the pool, the rest as overflow for bursts, so all workers at
+    full overflow never exceed the budget.
+    """
+    if settings.DB_CONNECTION_BUDGET is None:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    per_worker = max(1, settings.DB_CONNECTION_BUDGET // settings.WEB_CONCURRENCY)
+    pool_size = max(1, (per_worker + 1) // 2)
+    return pool_size, per_worker - pool_size
+
+
+def register_pool_metrics(engine: AsyncEngine, prefix: str):
+    pool = engine.sync_engine.pool
+    pool.metrics_prefix = prefix
+    METRICS.gauge(f"{prefix}.size", pool.size)
+    METRICS.gauge(f"{prefix}.checked_out", pool.checkedout)
+    METRICS.gauge(f"{prefix}.idle", pool.checkedin)
+    # overflow() counts down from -pool_size until the pool is full
+    METRICS.gauge(f"{prefix}.overflow", lambda: max(0, pool.overflow()))
+
+
+async def _create_engine(conn_string: str, metrics_prefix: str = "db.pool"):
+    pool_size, max_overflow = pool_sizing()
+    LOG.info(
+        f"DB pool: pool_size={pool_size} max_overflow={max_overflow} "
+        f"workers={settings.WEB_CONCURRENCY}"
+    )
+    connect_args = {}
+    if settings.DB_SSL_MODE:
+        connect_args["ssl"] = settings.DB_SSL_MODE
+    engine = create_async_engine(
         url=conn_string,
-        connect_args={"ssl": "require"},
-        pool_size=5,
-        max_overflow=10,
-        pool_recycle=1800,
-        pool_pre_ping=True,
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
     )
+    register_pool_metrics(engine, metrics_prefix)
+    register_query_events(engine)
+    return engine
+
+
+@event.listens_for(Engine, "connect")
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    # pg_trgm stand-ins, so search queries run unchanged against SQLite
+    if isinstance(dbapi_connection, sqlite.aiosqlite.AsyncAdapt_aiosqlite_connection):
+        dbapi_connection.create_function(
+            "word_similarity", 2, word_similarity, deterministic=True
+        )
 
 
 async def create_async_session(engine: AsyncEngine):
-    return async_sessionmaker(autocommit=False, autoflush=True, bind=engine)
+    # loaded state stays valid after commit, responses are built from it
+    # without reloading every object
+    return async_sessionmaker(
+        autocommit=False, autoflush=True, expire_on_commit=False, bind=engine
+    )
+
+
+class ReplicaRouter:
+    """Round-robin over the read replicas that are currently healthy
+
+    A replica that fails a connection attempt or a periodic health check is
+    skipped for DB_REPLICA_COOLDOWN seconds.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], cooldown: float):
+        self.engines = engines
+        self.session_makers = [
+            async_sessionmaker(
+                autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+            )
+            for engine in engines
+        ]
+        self.cooldown = cooldown
+        self._down_until = [0.0] * len(engines)
+        self._next = 0
+        self._health_task: asyncio.Task | None = None
+        METRICS.gauge("db.replicas.healthy", lambda: len(self.candidates(False)))
+
+    def candidates(self, advance: bool = True) -> list[int]:
+        """Healthy replicas, starting from the next one in round-robin order"""
+        count = len(self.engines)
+        start = self._next
+        if advance:
+            self._next = (start + 1) % count
+        now = time.monotonic()
+        order = [(start + i) % count for i in range(count)]
+        return [i for i in order if self._down_until[i] <= now]
+
+    def mark_down(self, index: int, error: Exception):
+        LOG.warning(f"Read replica {index} marked down with error {error}")
+        METRICS.counter("db.replicas.failures").inc()
+        self._down_until[index] = time.monotonic() + self.cooldown
 
+    async def open_session(self, route_class: str) -> AsyncSession | None:
+        """Session on the first replica that accepts a connection, else None"""
+        for index in self.candidates():
+            session = _new_session(self.session_makers[index], route_class, True)
+            session.info["replica"] = True
+            try:
+                # check out eagerly, so a dead replica falls back before any query
+                await session.connection()
+                return session
+            except (DBAPIError, OSError, PoolTimeoutError) as e:
+                await session.close()
+                self.mark_down(index, e)
+        return None
 
-async def get_db_session(request: Request) -> AsyncGenerator[AsyncSession]:
+    async def check_health(self):
+        for index, engine in enumerate(self.engines):
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+                self._down_until[index] = 0.0
+            except Exception as e:
+                self.mark_down(index, e)
+
+    async def _health_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_health()
+
+    def start(self, interval: float):
+        self._health_task = asyncio.create_task(self._health_loop(interval))
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for engine in self.engines:
+            await engine.dispose()
+
+
+async def create_replica_router(conn_strings: str) -> ReplicaRouter | None:
+    """Router over the comma separated replica DSNs, None when there are none"""
+    dsns = [dsn.strip() for dsn in conn_strings.split(",") if dsn.strip()]
+    if not dsns:
+        return None
+    engines = [
+        await _create_engine(dsn, metrics_prefix=f"db.replica.{i}.pool")
+        for i, dsn in enumerate(dsns)
+    ]
+    return ReplicaRouter(engines, settings.DB_REPLICA_COOLDOWN)
+
+
+def dialect_insert(session: AsyncSession, model):
+    """INSERT construct of the session's dialect, for ON CONFLICT support"""
+    if session.bind.dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def match_any(session: AsyncSession, column, values: list):
+    """column = ANY(:values) with the list bound as one array on PostgreSQL"""
+    if session.bind.dialect.name == "postgresql":
+        return column == any_(
+            bindparam(None, values, type_=postgresql.ARRAY(column.type))
+        )
+    return column.in_(values)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flushed(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_write_statement(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session):
+    if session.info.pop("has_writes", None):
+        session.info["committed_writes"] = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_writes(session):
+    session.info.pop("has_writes", None)
+
+
+# clients that wrote recently, their reads stay on the primary to see the write
+recent_writers = TTLCache(
+    "recent_writers",
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.DB_READ_AFTER_WRITE_WINDOW,
+)
+
+
+def _client_key(request: Request) -> bytes | None:
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).digest()
+
+
+# statement_timeout and lock_timeout in ms of each class of endpoints, 0 is none
+ROUTE_TIMEOUTS = {
+    "auth": (settings.DB_AUTH_STATEMENT_TIMEOUT_MS, settings.DB_AUTH_LOCK_TIMEOUT_MS),
+    "feed": (settings.DB_FEED_STATEMENT_TIMEOUT_MS, settings.DB_FEED_LOCK_TIMEOUT_MS),
+    "detail": (
+        settings.DB_DETAIL_STATEMENT_TIMEOUT_MS,
+        settings.DB_DETAIL_LOCK_TIMEOUT_MS,
+    ),
+    "write": (
+        settings.DB_WRITE_STATEMENT_TIMEOUT_MS,
+        settings.DB_WRITE_LOCK_TIMEOUT_MS,
+    ),
+}
+
+
+def _new_session(sessionmaker, route_class: str, read_only: bool) -> AsyncSession:
+    session = sessionmaker(autoflush=not read_only)
+    session.info["route_class"] = route_class
+    session.info["read_only"] = read_only
+    return session
+
+
+def _route_limits(session: Session) -> tuple[int, int, bool] | None:
+    """(statement_timeout, lock_timeout, read_only) of the session's route class,
+    None for sessions opened outside of a route, which run with the defaults"""
+    route_class = session.info.get("route_class")
+    if route_class is None:
+        return None
+    return (*ROUTE_TIMEOUTS[route_class], session.info["read_only"])
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_route_limits(session, transaction, connection):
+    if connection.dialect.name != "postgresql":
+        return
+    limits = _route_limits(session)
+    # the pooled connection remembers what it was last set to, classes sharing
+    # its limits reuse it without a round trip. Connections used without a
+    # Session, like migrations and health checks, keep the last limits set.
+    info = connection.connection.info
+    if info.get("route_limits") == limits:
+        return
+    if limits is None:
+        sql = (
+            "RESET statement_timeout; RESET lock_timeout; "
+            "RESET default_transaction_read_only"
+        )
+    else:
+        statement_timeout, lock_timeout, read_only = limits
+        sql = (
+            f"SET statement_timeout = {int(statement_timeout)}; "
+            f"SET lock_timeout = {int(lock_timeout)}; "
+            f"SET default_transaction_read_only = {'on' if read_only else 'off'}"
+        )
+    # session level, sent on the driver connection before asyncpg's lazy BEGIN,
+    # so the settings outlive this transaction and apply to the one it starts
+    connection.connection.dbapi_connection.run_async(lambda conn: conn.execute(sql))
+    info["route_limits"] = limits
+    METRICS.counter("db.route_limits.applied").inc()
+
+
+# sqlstate of the errors raised when a route's limits are hit
+_TIMEOUT_SQLSTATES = {"57014": "statement", "55P03": "lock"}
+
+
+def db_timeout_kind(error: Exception) -> str | None:
+    """'statement', 'lock' or 'pool' when error is a database timeout"""
+    if isinstance(error, PoolTimeoutError):
+        return "pool"
+    if isinstance(error, DBAPIError):
+        return _TIMEOUT_SQLSTATES.get(getattr(error.orig, "sqlstate", None))
+    return None
+
+
+def reraise_db_timeout(error: Exception):
+    """Let timeouts reach db_timeout_handler instead of becoming a generic 500"""
+    if db_timeout_kind(error) is not None:
+        raise error
+
+
+async def db_timeout_handler(request: Request, error: Exception):
+    """504 for statement timeouts, 503 when a lock or pooled connection is busy"""
+    kind = db_timeout_kind(error)
+    if kind is None:
+        raise error
+    route_class = getattr(request.state, "db_route_class", "unknown")
+    METRICS.counter(f"db.timeouts.{kind}.{route_class}").inc()
+    LOG.warning(f"DB {kind} timeout on {request.url.path}: {error}")
+    if kind == "statement":
+        return JSONResponse(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            content={"detail": "Database query timed out"},
+        )
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+
+def _has_writes(session: AsyncSession) -> bool:
+    return bool(
+        session.info.get("has_writes")
+        or session.new
+        or session.dirty
+        or session.deleted
+    )
+
+
+@asynccontextmanager
+async def _write_session(request: Request, route_class: str):
     sessionmaker = request.app.state.session_maker
-    async with sessionmaker() as session:
+    async with _new_session(sessionmaker, route_class, False) as session:
         try:
             yield session
-            await session.commit()
+            if _has_writes(session):
+                await session.commit()
         except Exception as e:
             LOG.error(f"db session failed with exception {e}")
             await session.rollback()
             raise e
+        if session.info.get("committed_writes"):
+            key = _client_key(request)
+            if key is not None:
+                recent_writers.set(key, True)
+
+
+async def _open_read_session(app, route_class: str, primary: bool) -> AsyncSession:
+    router: ReplicaRouter | None = getattr(app.state, "replica_router", None)
+    session = None
+    if router is not None and not primary:
+        session = await router.open_session(route_class)
+    if session is None:
+        METRICS.counter("db.reads.primary").inc()
+        session = _new_session(app.state.session_maker, route_class, True)
+    else:
+        METRICS.counter("db.reads.replica").inc()
+    return session
+
+
+@asynccontextmanager
+async def _read_session(request: Request, route_class: str):
+    key = _client_key(request)
+    primary = key is not None and recent_writers.get(key) is not None
+    async with await _open_read_session(request.app, route_class, primary) as session:
+        yield session
+
+
+@asynccontextmanager
+async def read_session(app, route_class: str, primary: bool = False):
+    """Read-only session outside of a request, like the ones of read-only
+    endpoints, on a replica unless `primary` is set"""
+    async with await _open_read_session(app, route_class, primary) as session:
+        yield session
+
+
+def session_dependency(route_class: str, read_only: bool = False):
+    """Request scoped session dependency for one class of endpoints
+
+    A connection is only checked out once the first statement runs, and every
+    transaction gets the statement and lock timeouts of `route_class`. They are
+    set on the connection, which only costs a round trip when the previous
+    session on it had different limits.
+
+    Read-write sessions only send COMMIT when something was written and not
+    yet committed, otherwise the connection goes straight back to the pool.
+    Read-only sessions run READ ONLY transactions with autoflush off, on a
+    replica when one is configured. They fall back to the primary when every
+    replica is down and right after the client's own write, so it reads what
+    it just wrote.
+    """
+    open_session = _read_session if read_only else _write_session
+
+    async def get_session(request: Request) -> AsyncGenerator[AsyncSession]:
+        request.state.db_route_class = route_class
+        async with open_session(request, route_class) as session:
+            yield session
+
+    return get_session
+
+
+get_db_session = session_dependency("write")
+get_read_db_session = session_dependency("detail", read_only=True)
+
+# closes the session as soon as the endpoint returns, so the connection is back
+# in the pool before the response is sent
+DBSession = Depends(get_db_session, scope="function")
+ReadDBSession = Depends(get_read_db_session, scope="function")
+AuthDBSession = Depends(session_dependency("auth"), scope="function")
+FeedDBSession = Depends(session_dependency("feed", read_only=True), scope="function")
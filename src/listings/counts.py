@@ -0,0 +1,106 @@
+"""Feed totals without a COUNT(*) over the filtered feed on every page
+
+    exact      COUNT(*) of the filtered feed, what the feed always did
+    estimated  per-filter counters, or the planner's estimate when a location
+               filter is set
+    has_more   no total, only whether a next page exists
+
+The counters hold active listings per (listing_type, energy_type). Each worker
+loads them with one GROUP BY and then applies its own committed writes through
+src.listings.events. They are reloaded every FEED_COUNTER_TTL seconds so writes
+made by other workers are picked up, by one GROUP BY that concurrent requests
+share. Estimates include the caller's own listings, which the feed itself
+leaves out.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import get_settings
+from src.listings.events import ListingChange, subscribe
+from src.listings.models import Listings
+
+settings = get_settings()
+
+# handed to waiters when the loading caller was cancelled, they load again
+_RETRY = object()
+
+
+class FeedCounters:
+    """Active listings per (listing_type, energy_type), kept current by events"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.counts: dict[tuple[str, str], int] = {}
+        self.loaded_at: Optional[float] = None
+        self._loading: Optional[asyncio.Future] = None
+
+    @property
+    def fresh(self) -> bool:
+        if self.loaded_at is None:
+            return False
+        return time.monotonic() - self.loaded_at < self.ttl
+
+    async def load(self, session: AsyncSession):
+        """Reload the counts, concurrent callers wait on the first one's query"""
+        pending = self._loading
+        if pending is not None:
+            if await asyncio.shield(pending) is _RETRY:
+                await self.load(session)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading = future
+        try:
+            result = await session.execute(
+                select(Listings.listing_type, Listings.energy_type, func.count())
+                .filter(Listings.status == "active")
+                .group_by(Listings.listing_type, Listings.energy_type)
+            )
+            rows = result.all()
+        except asyncio.CancelledError:
+            # only this caller was cancelled, the waiters retry the load
+            future.set_result(_RETRY)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            self._loading = None
+
+        self.counts = {(t, e): count for t, e, count in rows}
+        self.loaded_at = time.monotonic()
+        future.set_result(None)
+
+    def apply(self, change: ListingChange):
+        if self.loaded_at is None:
+            return
+        for state, delta in ((change.before, -1), (change.after, 1)):
+            if state is not None and state.active:
+                key = (state.listing_type, state.energy_type)
+                self.counts[key] = max(0, self.counts.get(key, 0) + delta)
+
+    async def total(
+        self,
+        session: AsyncSession,
+        listing_type: Optional[str] = None,
+        energy_type: Optional[str] = None,
+    ) -> int:
+        if not self.fresh:
+            await self.load(session)
+        return sum(
+            count
+            for (t, e), count in self.counts.items()
+            if (listing_type is None or t == listing_type)
+            and (energy_type is None or e == energy_type)
+        )
+
+
+feed_counters = FeedCounters(settings.FEED_COUNTER_TTL)
+subscribe(feed_counters.apply)
@@ -0,0 +1,117 @@
+"""Listing changes, published once the transaction that made them commits
+
+In-memory views over listings (feed counters and the like) subscribe here
+instead of every write path updating each of them. Changes are collected from
+ORM flushes into session.info and handed to subscribers after COMMIT, so a
+rolled back write never reaches them. Core UPDATE/DELETE statements bypass
+the ORM and aren't seen.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from src.config import LOG
+from src.listings.models import Listings
+
+
+@dataclass(frozen=True)
+class ListingState:
+    """The fields subscribers care about, as of one side of a change"""
+
+    id: UUID
+    user_id: UUID
+    listing_type: str
+    energy_type: str
+    status: str
+    location_search: Optional[str]
+    price: float
+    volume: float
+    start_time: datetime
+    end_time: datetime
+
+    @property
+    def active(self) -> bool:
+        return self.status == "active"
+
+
+@dataclass(frozen=True)
+class ListingChange:
+    before: Optional[ListingState]  # None for a new listing
+    after: Optional[ListingState]  # None for a deleted one
+
+    @property
+    def listing_id(self) -> UUID:
+        return (self.after or self.before).id
+
+
+_FIELDS = [f.name for f in fields(ListingState)]
+
+_subscribers: list[Callable[[ListingChange], None]] = []
+
+
+def subscribe(callback: Callable[[ListingChange], None]):
+    """Call `callback` with every committed ListingChange, usable as decorator"""
+    _subscribers.append(callback)
+    return callback
+
+
+def publish(change: ListingChange):
+    for callback in _subscribers:
+        try:
+            callback(change)
+        except Exception as e:
+            # a broken view must not fail the write that already committed
+            LOG.error(f"Listing change subscriber {callback} failed with {e}")
+
+
+def _current(listing: Listings) -> ListingState:
+    return ListingState(**{name: getattr(listing, name) for name in _FIELDS})
+
+
+def _previous(listing: Listings) -> ListingState:
+    attrs = inspect(listing).attrs
+    values = {}
+    for name in _FIELDS:
+        history = attrs[name].history
+        values[name] = history.deleted[0] if history.deleted else attrs[name].value
+    return ListingState(**values)
+
+
+def _record(listing: Listings, change: ListingChange):
+    session = object_session(listing)
+    if session is not None:
+        session.info.setdefault("listing_changes", []).append(change)
+
+
+@event.listens_for(Listings, "after_insert")
+def _inserted(mapper, connection, listing):
+    _record(listing, ListingChange(before=None, after=_current(listing)))
+
+
+@event.listens_for(Listings, "before_update")
+def _updated(mapper, connection, listing):
+    before, after = _previous(listing), _current(listing)
+    if before != after:
+        _record(listing, ListingChange(before=before, after=after))
+
+
+@event.listens_for(Listings, "before_delete")
+def _deleted(mapper, connection, listing):
+    _record(listing, ListingChange(before=_previous(listing), after=None))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    for change in session.info.pop("listing_changes", []):
+        publish(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("listing_changes", None)
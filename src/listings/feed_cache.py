@@ -0,0 +1,363 @@
+"""Shared cache of the newest feed rows per filter combination
+
+The feed's filters (listing_type, energy_type, location) take few distinct
+values, so one entry per combination serves most requests. An entry holds the
+first FEED_CACHE_ROWS active listings of every user, each already serialized
+to JSON, and the matching total. The caller's own listings are dropped after
+the lookup, and pages are sliced out of what is left. Cursor requests and
+pages past the cached rows go to the database as before.
+
+Committed listing writes invalidate, through src.listings.events, every entry
+whose (listing_type, energy_type) tag they touch. Entries older than
+FEED_CACHE_TTL are still served up to FEED_CACHE_STALE_TTL while one
+background task reloads them. Writes made by other workers are picked up on
+that reload. Loads and reloads run on read-only "feed" sessions, and within
+DB_READ_AFTER_WRITE_WINDOW of an invalidation they read the primary, so a
+lagging replica can't put the rows from before the write back in the cache.
+The cache is an LRU bounded to FEED_CACHE_MAX_BYTES.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import get_settings, LOG
+from src.database.pagination import encode_cursor, paginate
+from src.database.query_log import current_request
+from src.database.setup import read_session
+from src.listings.events import ListingChange, subscribe
+from src.listings.models import Listings
+from src.listings.schemas import ListingResponse
+from src.listings.service import feed_query
+from src.utils import CustomJSONEncoder
+from src.utils.metrics import METRICS
+from src.utils.search import normalize_text
+
+settings = get_settings()
+
+# rough per-row cost of the tuple, UUIDs and datetime next to the JSON bytes
+_ROW_OVERHEAD = 300
+# handed to waiters when the loading caller was cancelled, they load again
+_RETRY = object()
+
+FeedKey = tuple[Optional[str], Optional[str], str]
+
+
+@dataclass(frozen=True)
+class CachedRow:
+    user_id: UUID
+    id: UUID
+    created_at: datetime
+    body: bytes
+
+
+@dataclass
+class FeedCacheEntry:
+    rows: list[CachedRow]
+    total: int  # all matching listings, the caller's own included
+    complete: bool  # rows holds every matching listing
+    loaded_at: float
+    size: int
+
+    @classmethod
+    def build(cls, listings: list[Listings], total: int, complete: bool):
+        rows = [
+            CachedRow(
+                user_id=listing.user_id,
+                id=listing.id,
+                created_at=listing.created_at,
+                body=json.dumps(
+                    ListingResponse.model_validate(listing).model_dump(),
+                    cls=CustomJSONEncoder,
+                ).encode(),
+            )
+            for listing in listings
+        ]
+        size = sum(len(row.body) + _ROW_OVERHEAD for row in rows)
+        return cls(rows, total, complete, time.monotonic(), size)
+
+
+def _tag(listing_type: Optional[str], energy_type: Optional[str]) -> str:
+    return f"{listing_type or '*'}:{energy_type or '*'}"
+
+
+class FeedCache:
+    """Byte bounded LRU of FeedCacheEntry with tag invalidation
+
+    Like TTLCache, loads are single-flight and everything runs on the event
+    loop thread.
+    """
+
+    def __init__(
+        self, max_bytes: int, ttl: float, stale_ttl: float, primary_window: float
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.primary_window = primary_window
+        self.size = 0
+        self._entries: OrderedDict[FeedKey, FeedCacheEntry] = OrderedDict()
+        self._tagged: dict[str, set[FeedKey]] = {}
+        self._loading: dict[FeedKey, asyncio.Future] = {}
+        # tag -> monotonic time of its last invalidation
+        self._invalidated_at: dict[str, float] = {}
+        self._refreshes: set[asyncio.Task] = set()
+
+        self._hits = METRICS.counter("cache.feed.hits")
+        self._stale_hits = METRICS.counter("cache.feed.stale_hits")
+        self._misses = METRICS.counter("cache.feed.misses")
+        self._invalidations = METRICS.counter("cache.feed.invalidations")
+        self._evictions = METRICS.counter("cache.feed.evictions")
+        METRICS.gauge("cache.feed.size", lambda: len(self._entries))
+        METRICS.gauge("cache.feed.bytes", lambda: self.size)
+        METRICS.gauge("cache.feed.hit_rate", self.hit_rate)
+
+    def hit_rate(self) -> float:
+        hits = self._hits.value + self._stale_hits.value
+        lookups = hits + self._misses.value
+        return hits / lookups if lookups else 0.0
+
+    def _store(self, key: FeedKey, entry: FeedCacheEntry):
+        self._drop(key)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._tagged.setdefault(_tag(key[0], key[1]), set()).add(key)
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._evictions.inc()
+
+    def _drop(self, key: FeedKey):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+            keys = self._tagged.get(_tag(key[0], key[1]))
+            if keys is not None:
+                keys.discard(key)
+
+    def invalidate(self, tag: str):
+        self._invalidated_at[tag] = time.monotonic()
+        for key in self._tagged.pop(tag, set()):
+            self._drop(key)
+            self._invalidations.inc()
+        # a load that started before the write must not repopulate its entry
+        for key in [k for k in self._loading if _tag(k[0], k[1]) == tag]:
+            del self._loading[key]
+
+    def on_listing_change(self, change: ListingChange):
+        for state in (change.before, change.after):
+            if state is None or not state.active:
+                continue
+            for listing_type in (state.listing_type, None):
+                for energy_type in (state.energy_type, None):
+                    self.invalidate(_tag(listing_type, energy_type))
+
+    def needs_primary(self, key: FeedKey) -> bool:
+        """Whether a write to key's tag may not have reached the replicas yet"""
+        invalidated_at = self._invalidated_at.get(_tag(key[0], key[1]))
+        if invalidated_at is None:
+            return False
+        return time.monotonic() - invalidated_at < self.primary_window
+
+    def clear(self):
+        self._entries.clear()
+        self._tagged.clear()
+        self._loading.clear()
+        self._invalidated_at.clear()
+        self.size = 0
+
+    async def _load(
+        self, key: FeedKey, loader: Callable[[], Awaitable[FeedCacheEntry]]
+    ) -> FeedCacheEntry:
+        pending = self._loading.get(key)
+        if pending is not None:
+            entry = await asyncio.shield(pending)
+            if entry is _RETRY:
+                return await self._load(key, loader)
+            return entry
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            entry = await loader()
+        except asyncio.CancelledError:
+            # only this caller was cancelled, the waiters retry the load
+            future.set_result(_RETRY)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            is_current = self._loading.get(key) is future
+            if is_current:
+                del self._loading[key]
+
+        if is_current:
+            self._store(key, entry)
+        future.set_result(entry)
+        return entry
+
+    def _refresh(
+        self, key: FeedKey, loader: Callable[[], Awaitable[FeedCacheEntry]]
+    ):
+        if key in self._loading:
+            return
+
+        async def run():
+            # the task inherited the request's context, its statements aren't
+            # the request's
+            current_request.set(None)
+            try:
+                await self._load(key, loader)
+            except Exception as e:
+                LOG.error(f"Feed cache refresh of {key} failed with {e}")
+
+        task = asyncio.create_task(run())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def get(
+        self,
+        key: FeedKey,
+        loader: Callable[[], Awaitable[FeedCacheEntry]],
+        refresher: Callable[[], Awaitable[FeedCacheEntry]],
+    ) -> FeedCacheEntry:
+        """The entry for key, loaded with `loader` on a miss
+
+        A stale entry is returned as is and reloaded with `refresher`, which
+        must not depend on the current request.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.loaded_at
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                self._hits.inc()
+                return entry
+            if age < self.stale_ttl:
+                self._entries.move_to_end(key)
+                self._stale_hits.inc()
+                self._refresh(key, refresher)
+                return entry
+        self._misses.inc()
+        return await self._load(key, loader)
+
+
+feed_cache = FeedCache(
+    settings.FEED_CACHE_MAX_BYTES,
+    settings.FEED_CACHE_TTL,
+    settings.FEED_CACHE_STALE_TTL,
+    settings.DB_READ_AFTER_WRITE_WINDOW,
+)
+subscribe(feed_cache.on_listing_change)
+
+
+async def _load_entry(
+    session: AsyncSession,
+    listing_type: Optional[str],
+    energy_type: Optional[str],
+    location: Optional[str],
+) -> FeedCacheEntry:
+    query = feed_query(session, listing_type, energy_type, location)
+    listings, next_cursor = await paginate(
+        session, query, Listings, settings.FEED_CACHE_ROWS
+    )
+    complete = next_cursor is None
+    total = len(listings)
+    if not complete:
+        total = await session.scalar(
+            select(func.count()).select_from(query.subquery())
+        )
+    return FeedCacheEntry.build(listings, total, complete)
+
+
+async def cached_feed_page(
+    app,
+    user_id: UUID,
+    session: AsyncSession,
+    listing_type: Optional[str] = None,
+    energy_type: Optional[str] = None,
+    location: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 20,
+    count_mode: str = "exact",
+) -> Optional[bytes]:
+    """The feed page as JSON from the cache, None when it can't be served
+
+    Same body as get_feed_listings. Exact totals subtract the caller's own
+    listings, counted with one indexed query when the entry is partial.
+    """
+    offset = (page - 1) * page_size
+    if not settings.FEED_CACHE_ENABLED:
+        return None
+    if offset + page_size >= settings.FEED_CACHE_ROWS:
+        return None
+
+    location = normalize_text(location) if location else ""
+    key = (listing_type or None, energy_type or None, location)
+
+    async def load():
+        if session.info.get("replica") and feed_cache.needs_primary(key):
+            async with read_session(app, "feed", primary=True) as primary_session:
+                return await _load_entry(primary_session, *key)
+        return await _load_entry(session, *key)
+
+    async def refresh():
+        # the request's session is gone by the time this runs
+        primary = feed_cache.needs_primary(key)
+        async with read_session(app, "feed", primary) as refresh_session:
+            return await _load_entry(refresh_session, *key)
+
+    entry = await feed_cache.get(key, load, refresh)
+
+    others = [row for row in entry.rows if row.user_id != user_id]
+    has_more = len(others) > offset + page_size
+    if not has_more and not entry.complete:
+        # the page may continue past the cached rows
+        return None
+    window = others[offset : offset + page_size]
+
+    total = None
+    if count_mode == "estimated":
+        total = entry.total
+    elif count_mode == "exact":
+        if entry.complete:
+            total = len(others)
+        else:
+            own = await session.scalar(
+                select(func.count()).select_from(
+                    feed_query(session, *key)
+                    .filter(Listings.user_id == user_id)
+                    .subquery()
+                )
+            )
+            total = entry.total - own
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(window[-1].created_at, window[-1].id)
+    rest = json.dumps(
+        {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "count_mode": count_mode,
+        }
+    )
+    listings = b", ".join(row.body for row in window)
+    return b'{"listings": [' + listings + b"], " + rest[1:].encode()
@@ -1,9 +1,12 @@
 from src.database import RecordModel
-from sqlalchemy.orm import mapped_column, Mapped, relationship
-from sqlalchemy import String, TIMESTAMP, Float, ForeignKey
+from sqlalchemy.orm import mapped_column, Mapped, relationship, validates
+from sqlalchemy import String, TIMESTAMP, Float, ForeignKey, Index, text
 from datetime import datetime
 from uuid import UUID
 
+from src.utils.geo import encode_geohash
+from src.utils.search import normalize_text
+
 
 class ListingStatus(str):
     ACTIVE = "active"
@@ -14,6 +17,28 @@ class ListingStatus(str):
 
 class Listings(RecordModel):
     __tablename__ = "listings"
+    # added by migrations v0003, v0004, v0005 and v0006
+    __table_args__ = (
+        Index("ix_listings_status_created_at", "status", "created_at", "id"),
+        Index(
+            "ix_listings_location_search_trgm",
+            "location_search",
+            postgresql_using="gin",
+            postgresql_ops={"location_search": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_listings_status_geohash",
+            "status",
+            "geohash",
+            postgresql_ops={"geohash": "varchar_pattern_ops"},
+        ),
+        Index(
+            "ix_listings_location_search_null",
+            "status",
+            postgresql_where=text("location_search IS NULL"),
+            sqlite_where=text("location_search IS NULL"),
+        ),
+    )
 
     listing_type: Mapped[str] = mapped_column(
         String(50), nullable=False, index=True
@@ -31,6 +56,14 @@ class Listings(RecordModel):
         String(500), nullable=False
     )  # Location of the farm/energy source
 
+    # normalized copy of location for search, kept in sync below
+    location_search: Mapped[str] = mapped_column(String(500), nullable=True)
+
+    # optional coordinates, geohash is derived from them for radius queries
+    latitude: Mapped[float] = mapped_column(Float(), nullable=True)
+    longitude: Mapped[float] = mapped_column(Float(), nullable=True)
+    geohash: Mapped[str] = mapped_column(String(12), nullable=True)
+
     start_time: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True), nullable=False, index=True
     )
@@ -49,6 +82,21 @@ class Listings(RecordModel):
         ForeignKey("users.id", ondelete="cascade"), nullable=False, index=True
     )
 
+    @validates("location")
+    def _sync_location_search(self, key, location):
+        self.location_search = normalize_text(location)
+        return location
+
+    @validates("latitude", "longitude")
+    def _sync_geohash(self, key, value):
+        latitude = value if key == "latitude" else self.latitude
+        longitude = value if key == "longitude" else self.longitude
+        if latitude is None or longitude is None:
+            self.geohash = None
+        else:
+            self.geohash = encode_geohash(latitude, longitude)
+        return value
+
     # Relationship to user
     user = relationship("RenExUser", back_populates="listings")
     # Relationship to swaps
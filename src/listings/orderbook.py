@@ -0,0 +1,434 @@
+"""In-memory order book behind /listings/{listing_id}/matches
+
+Active listings are held per (energy_type, listing_type) side. Each side
+answers "overlaps this time window" with an interval tree and "crosses this
+price" with a price-sorted list, so a match only looks at candidates from one
+side instead of every active listing. Candidates are ranked by
+
+    price compatibility  the bid covers the ask. The rest follow, since a swap
+                         can still propose a negotiated price
+    fit                  the share of the listing's window they overlap times
+                         the smaller volume over the larger one
+    price                the better price for the listing being matched
+
+The book is loaded from the database at startup and follows committed writes
+through src.listings.events. Listings written by other workers are read back
+by updated_at every ORDER_BOOK_REFRESH_INTERVAL seconds. Deleted rows leave no
+trace there, so the book is reloaded every ORDER_BOOK_RELOAD_INTERVAL seconds
+and matched listings are re-read with the match criteria and ranked again, so
+one closed or changed elsewhere is never returned on its old terms.
+"""
+
+import asyncio
+import heapq
+import math
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from operator import attrgetter
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config import LOG
+from src.listings.events import ListingChange, ListingState, subscribe
+from src.listings.models import Listings
+from src.utils.metrics import METRICS
+
+
+# writes buffered next to an interval tree before it is rebuilt, relative to
+# the square root of its size
+REBUILD_FACTOR = 4
+# a side is searched by price first when at most this many of its orders cross
+PRICE_FIRST_MAX = 256
+# refreshes reread this far back, for transactions that committed after the
+# last refresh with an updated_at from before it
+REFRESH_OVERLAP = timedelta(seconds=30)
+
+
+def _seconds(moment: datetime) -> float:
+    # SQLite hands back naive datetimes, they are stored as UTC
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def opposite(listing_type: str) -> str:
+    return "demand" if listing_type == "supply" else "supply"
+
+
+class Order:
+    """What matching needs of an active listing"""
+
+    __slots__ = ("id", "key", "owner", "price", "volume", "start", "end")
+
+    def __init__(self, id, user_id, price, volume, start_time, end_time):
+        self.id: UUID = id
+        # ints hash and compare in C, UUIDs in Python
+        self.key: int = id.int
+        self.owner: int = user_id.int
+        self.price: float = price
+        self.volume: float = volume
+        self.start: float = _seconds(start_time)
+        self.end: float = _seconds(end_time)
+
+    @classmethod
+    def of(cls, listing: Listings | ListingState) -> "Order":
+        return cls(
+            listing.id,
+            listing.user_id,
+            listing.price,
+            listing.volume,
+            listing.start_time,
+            listing.end_time,
+        )
+
+
+@dataclass(frozen=True)
+class Match:
+    order: Order
+    score: float
+    price_compatible: bool
+
+
+class _Node:
+    __slots__ = ("center", "left", "right", "by_start", "starts", "by_end", "ends")
+
+
+_start = attrgetter("start")
+
+
+def _build(orders: list[Order]) -> Optional[_Node]:
+    """Centered interval tree over orders sorted by start"""
+    if not orders:
+        return None
+    node = _Node()
+    # the median order contains its own start, so every node keeps at least one
+    node.center = center = orders[len(orders) // 2].start
+    # orders starting after the center are a suffix, all three keep the order
+    split = bisect_right(orders, center, key=_start)
+    left = [order for order in orders[:split] if order.end < center]
+    here = [order for order in orders[:split] if order.end >= center]
+    right = orders[split:]
+    node.by_start = here
+    node.starts = [order.start for order in here]
+    node.by_end = sorted(here, key=attrgetter("end"), reverse=True)
+    # negated so the list ascends for bisect
+    node.ends = [-order.end for order in node.by_end]
+    node.left = _build(left)
+    node.right = _build(right)
+    return node
+
+
+class IntervalTree:
+    """Orders by time window
+
+    A static centered tree answers which orders contain a point, and the
+    orders sorted by start add those starting inside the window. Writes since
+    the last build are kept aside and the tree is rebuilt once they outnumber
+    REBUILD_FACTOR * sqrt(size), which keeps both the extra scan per query and
+    the rebuild cost per write near sqrt(size).
+    """
+
+    def __init__(self, orders: Iterable[Order] = ()):
+        self._rebuild(list(orders))
+
+    def __len__(self) -> int:
+        return self._size - len(self._removed) + len(self._added)
+
+    def _rebuild(self, orders: list[Order]):
+        orders.sort(key=_start)
+        self._by_start = orders
+        self._starts = [order.start for order in orders]
+        self._root = _build(orders)
+        self._size = len(orders)
+        self._added: dict[int, Order] = {}
+        # keys in the tree that were removed or replaced since the build
+        self._removed: set[int] = set()
+        self._limit = max(32, REBUILD_FACTOR * math.isqrt(len(orders)))
+
+    def _maybe_rebuild(self):
+        if len(self._added) + len(self._removed) > self._limit:
+            orders = [o for o in self._by_start if o.key not in self._removed]
+            orders.extend(self._added.values())
+            self._rebuild(orders)
+
+    def add(self, order: Order):
+        self._added[order.key] = order
+        self._maybe_rebuild()
+
+    def remove(self, order: Order):
+        if self._added.pop(order.key, None) is None:
+            self._removed.add(order.key)
+        self._maybe_rebuild()
+
+    def overlapping(self, start: float, end: float) -> list[Order]:
+        """Orders with start <= end and end >= start"""
+        found = []
+        node = self._root
+        while node is not None:
+            if start < node.center:
+                found.extend(node.by_start[: bisect_right(node.starts, start)])
+                node = node.left
+            else:
+                found.extend(node.by_end[: bisect_right(node.ends, -start)])
+                node = node.right
+        starts = self._starts
+        found.extend(
+            self._by_start[bisect_right(starts, start) : bisect_right(starts, end)]
+        )
+        if self._removed:
+            removed = self._removed
+            found = [order for order in found if order.key not in removed]
+        for order in self._added.values():
+            if order.start <= end and order.end >= start:
+                found.append(order)
+        return found
+
+
+class BookSide:
+    """Active listings of one energy_type and listing_type"""
+
+    def __init__(self, orders: list[Order]):
+        self.orders = {order.key: order for order in orders}
+        self.intervals = IntervalTree(orders)
+        # (price, key) ascending and the orders in the same positions
+        by_price = sorted(orders, key=attrgetter("price", "key"))
+        self.prices = [(order.price, order.key) for order in by_price]
+        self.by_price = by_price
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def add(self, order: Order):
+        self.remove(order.key)
+        self.orders[order.key] = order
+        self.intervals.add(order)
+        index = bisect_left(self.prices, (order.price, order.key))
+        self.prices.insert(index, (order.price, order.key))
+        self.by_price.insert(index, order)
+
+    def remove(self, key: int):
+        order = self.orders.pop(key, None)
+        if order is not None:
+            self.intervals.remove(order)
+            index = bisect_left(self.prices, (order.price, order.key))
+            del self.prices[index]
+            del self.by_price[index]
+
+    def crossing(self, price: float, bids: bool) -> tuple[int, int]:
+        """Positions in by_price of the bids at or above an ask of `price`, or
+        of the asks at or below a bid of `price`"""
+        if bids:
+            return bisect_left(self.prices, (price,)), len(self.prices)
+        # every key is below 2**128, the size of a UUID
+        return 0, bisect_right(self.prices, (price, 2**128))
+
+
+def rank(
+    target: Order, supply: bool, candidates: list[Order], limit: int
+) -> list[Match]:
+    """The best `limit` candidates for target, compatible prices first
+
+    `supply` tells whether target is a supply listing. Candidates must overlap
+    target's window, the target's own user is skipped here.
+    """
+    owner, start, end, volume = target.owner, target.start, target.end, target.volume
+    duration = (end - start) or 1.0
+    # a supply listing prefers the highest bid, a demand listing the lowest ask,
+    # and the bid covers the ask when the signed price is at least its own
+    sign = 1.0 if supply else -1.0
+    floor = sign * target.price
+
+    matches = []
+    for price_compatible in (True, False):
+        if len(matches) >= limit:
+            break
+        scored = [
+            (
+                (
+                    (o.end if o.end < end else end)
+                    - (o.start if o.start > start else start)
+                )
+                / duration
+                * (o.volume / volume if o.volume < volume else volume / o.volume),
+                sign * o.price,
+                # breaks ties, orders themselves don't compare
+                o.key,
+                o,
+            )
+            for o in candidates
+            if (sign * o.price >= floor) is price_compatible and o.owner != owner
+        ]
+        best = heapq.nlargest(limit - len(matches), scored)
+        matches += [Match(o, score, price_compatible) for score, _, _, o in best]
+    return matches
+
+
+def build_sides(
+    orders: Iterable[tuple[tuple[str, str], Order]],
+) -> dict[tuple[str, str], BookSide]:
+    """Sides from (energy_type, listing_type) and order pairs, built in bulk"""
+    grouped = defaultdict(list)
+    for key, order in orders:
+        grouped[key].append(order)
+    return {key: BookSide(side) for key, side in grouped.items()}
+
+
+class OrderBook:
+    """Per energy_type supply and demand sides, kept current by events"""
+
+    def __init__(self):
+        self.sides: dict[tuple[str, str], BookSide] = {}
+        self.loaded = False
+        # changes committed while a load or refresh reads the table, replayed
+        # over what it read
+        self._pending: Optional[list[ListingChange]] = None
+        self._loaded_at = 0.0
+        self._read_at: Optional[datetime] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        METRICS.gauge("orderbook.listings", lambda: sum(map(len, self.sides.values())))
+
+    async def _read(self, session: AsyncSession, *criteria) -> list[tuple]:
+        """(side key, id, Order or None when inactive) of the matching listings"""
+        result = await session.execute(
+            select(
+                Listings.id,
+                Listings.user_id,
+                Listings.price,
+                Listings.volume,
+                Listings.start_time,
+                Listings.end_time,
+                Listings.energy_type,
+                Listings.listing_type,
+                Listings.status,
+            ).filter(*criteria)
+        )
+        return [
+            (
+                (row.energy_type, row.listing_type),
+                row.id,
+                Order(*row[:6]) if row.status == "active" else None,
+            )
+            for row in result
+        ]
+
+    async def load(self, session: AsyncSession):
+        self._pending = []
+        try:
+            read_at = await session.scalar(select(func.now()))
+            rows = await self._read(session, Listings.status == "active")
+            sides = build_sides((key, order) for key, _, order in rows)
+            for change in self._pending:
+                self._apply(sides, change)
+        finally:
+            self._pending = None
+        self.sides = sides
+        self.loaded = True
+        self._loaded_at = time.monotonic()
+        self._read_at = read_at
+
+    async def refresh(self, session: AsyncSession):
+        """Apply the listings created or updated since the last read"""
+        self._pending = []
+        try:
+            read_at = await session.scalar(select(func.now()))
+            rows = await self._read(
+                session, Listings.updated_at >= self._read_at - REFRESH_OVERLAP
+            )
+            for key, listing_id, order in rows:
+                # the type of a listing may have changed
+                for side in self.sides.values():
+                    side.remove(listing_id.int)
+                if order is not None:
+                    self._side(self.sides, key).add(order)
+            # newer than the rows read
+            for change in self._pending:
+                self._apply(self.sides, change)
+        finally:
+            self._pending = None
+        self._read_at = read_at
+
+    @staticmethod
+    def _side(sides: dict[tuple[str, str], BookSide], key: tuple[str, str]):
+        if key not in sides:
+            sides[key] = BookSide([])
+        return sides[key]
+
+    @classmethod
+    def _apply(cls, sides: dict[tuple[str, str], BookSide], change: ListingChange):
+        for state in (change.before, change.after):
+            if state is not None:
+                side = sides.get((state.energy_type, state.listing_type))
+                if side is not None:
+                    side.remove(state.id.int)
+        after = change.after
+        if after is not None and after.active:
+            cls._side(sides, (after.energy_type, after.listing_type)).add(
+                Order.of(after)
+            )
+
+    def apply(self, change: ListingChange):
+        if self._pending is not None:
+            self._pending.append(change)
+        if self.loaded:
+            self._apply(self.sides, change)
+
+    def match(
+        self, target: Order, listing_type: str, energy_type: str, limit: int
+    ) -> list[Match]:
+        side = self.sides.get((energy_type, opposite(listing_type)))
+        if side is None:
+            return []
+        supply = listing_type == "supply"
+        owner, start, end = target.owner, target.start, target.end
+
+        # few crossing prices: check their windows, the tree is only needed
+        # when they can't fill the page
+        low, high = side.crossing(target.price, supply)
+        if high - low <= PRICE_FIRST_MAX:
+            compatible = [
+                order
+                for order in side.by_price[low:high]
+                if order.owner != owner and order.start <= end and order.end >= start
+            ]
+            if len(compatible) >= limit:
+                return rank(target, supply, compatible, limit)
+
+        return rank(target, supply, side.intervals.overlapping(start, end), limit)
+
+    async def _refresh_loop(
+        self, session_maker: async_sessionmaker, interval: float, reload: float
+    ):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with session_maker() as session:
+                    if time.monotonic() - self._loaded_at >= reload:
+                        await self.load(session)
+                    else:
+                        await self.refresh(session)
+            except Exception as e:
+                LOG.error(f"Order book refresh failed with {e}")
+
+    def start(self, session_maker: async_sessionmaker, interval: float, reload: float):
+        """Refresh every `interval` seconds, reloading once `reload` seconds
+        have passed since the last load"""
+        if interval > 0:
+            self._refresh_task = asyncio.create_task(
+                self._refresh_loop(session_maker, interval, reload)
+            )
+
+    def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        self.sides = {}
+        self.loaded = False
+
+
+order_book = OrderBook()
+subscribe(order_book.apply)
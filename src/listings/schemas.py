@@ -25,6 +25,12 @@ class ListingCreateRequest(BaseModel):
     description: Optional[str] = Field(
         None, max_length=1000, description="Optional description of the listing"
     )
+    latitude: Optional[float] = Field(
+        None, ge=-90, le=90, description="Latitude, enables radius search"
+    )
+    longitude: Optional[float] = Field(
+        None, ge=-180, le=180, description="Longitude, enables radius search"
+    )
 
     class Config:
         json_schema_extra = {
@@ -37,6 +43,8 @@ class ListingCreateRequest(BaseModel):
                 "start_time": "2024-01-15T08:00:00Z",
                 "end_time": "2024-01-15T18:00:00Z",
                 "description": "Excess solar energy from farm panels",
+                "latitude": 6.5244,
+                "longitude": 3.3792,
             }
         }
 
@@ -48,6 +56,8 @@ class ListingUpdateRequest(BaseModel):
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     description: Optional[str] = Field(None, max_length=1000)
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     status: Optional[str] = Field(
         None, pattern="^(active|inactive|completed|cancelled)$"
     )
@@ -67,19 +77,42 @@ class ListingResponse(BaseModel):
     user_id: UUID
     created_at: datetime
     updated_at: Optional[datetime]
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     class Config:
         from_attributes = True
 
 
+class NearbyListingResponse(ListingResponse):
+    distance_km: float
+
+
+class ListingMatchResponse(ListingResponse):
+    # overlap share of the listing's window times the volume ratio, 0 to 1
+    score: float
+    # the bid covers the ask, otherwise a swap would need a proposed_price
+    price_compatible: bool
+
+
 class ListingFeedResponse(BaseModel):
     listings: List[ListingResponse]
-    total: int
+    # None with count_mode has_more, approximate with estimated
+    total: Optional[int]
     page: int = 1
     page_size: int = 20
+    # pass as ?cursor= for the next page, None on the last one
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+    count_mode: str = "exact"
 
 
 class ListingDetailResponse(ListingResponse):
     user_email: Optional[str] = None
     user_first_name: Optional[str] = None
     user_last_name: Optional[str] = None
+
+
+class LocationSuggestion(BaseModel):
+    location: str
+    listings: int
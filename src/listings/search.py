@@ -0,0 +1,96 @@
+"""Location search over the normalized listings.location_search column
+
+A location matches on a substring of it or, for typos, on trigram word
+similarity. On PostgreSQL both go through the pg_trgm GIN index from migration
+v0004, on SQLite word_similarity is the Python function registered per
+connection in src.database.setup.
+
+Coordinates are searched by geohash prefix, see src.utils.geo.
+"""
+
+from typing import List, Optional
+
+from sqlalchemy import (
+    ColumnElement,
+    and_,
+    case,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.listings.models import Listings
+from src.listings.schemas import LocationSuggestion
+from src.utils.search import WORD_SIMILARITY_THRESHOLD, normalize_text
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+
+def location_match(
+    session: AsyncSession, location: str
+) -> Optional[ColumnElement[bool]]:
+    """Filter for listings at `location`, None when nothing searchable is left"""
+    term = normalize_text(location)
+    if not term:
+        return None
+    column = Listings.location_search
+    contains = column.like(f"%{_escape_like(term)}%", escape="/")
+    # rows written by instances older than v0004 have no location_search until
+    # a migration backfills them, they match on the raw location as before.
+    # The partial index from v0006 keeps this branch an index scan
+    unsearchable = and_(
+        column.is_(None),
+        Listings.location.ilike(f"%{_escape_like(location.strip())}%", escape="/"),
+    )
+    if session.bind.dialect.name == "postgresql":
+        # the operator form, unlike the function, can use the index
+        return or_(contains, literal(term).op("<%")(column), unsearchable)
+    similarity = func.word_similarity(term, column)
+    return or_(contains, similarity >= WORD_SIMILARITY_THRESHOLD, unsearchable)
+
+
+def geohash_match(session: AsyncSession, cells: list[str]) -> ColumnElement[bool]:
+    """Listings inside any of the geohash cells, as index range scans"""
+    column = Listings.geohash
+    if session.bind.dialect.name == "postgresql":
+        # the varchar_pattern_ops index only serves LIKE with a constant
+        # pattern, geohashes are base32 so inlining them is safe
+        return or_(*(column.like(literal_column(f"'{cell}%'")) for cell in cells))
+    # SQLite's LIKE is case insensitive and skips the index, a range doesn't
+    return or_(
+        *(
+            and_(column >= cell, column < cell[:-1] + chr(ord(cell[-1]) + 1))
+            for cell in cells
+        )
+    )
+
+
+async def search_locations(
+    query: str, session: AsyncSession, limit: int = 10
+) -> List[LocationSuggestion]:
+    """Locations of active listings ranked prefix first, then by similarity"""
+    match = location_match(session, query)
+    if match is None:
+        return []
+    term = normalize_text(query)
+    column = Listings.location_search
+    rank = case(
+        (column.like(f"{_escape_like(term)}%", escape="/"), 1.0), else_=0.0
+    ) + func.coalesce(func.word_similarity(term, column), 0.0)
+
+    result = await session.execute(
+        select(Listings.location, func.count().label("listings"))
+        .filter(Listings.status == "active", match)
+        .group_by(Listings.location, column)
+        .order_by(rank.desc(), func.count().desc())
+        .limit(limit)
+    )
+    return [
+        LocationSuggestion(location=location, listings=listings)
+        for location, listings in result.all()
+    ]
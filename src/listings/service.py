@@ -1,4 +1,4 @@
-from sqlalchemy import select, and_, or_, func, desc
+from sqlalchemy import select, and_, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from typing import List, Optional
@@ -11,8 +11,19 @@ from src.listings.schemas import (
     ListingUpdateRequest,
     ListingResponse,
     ListingFeedResponse,
+    ListingMatchResponse,
+    NearbyListingResponse,
 )
+from src.listings.counts import feed_counters
+from src.listings.orderbook import Order, opposite, order_book, rank
+from src.listings.search import geohash_match, location_match
 from src.auth.models import RenExUser
+from src.database.pagination import estimate_count, paginate
+from src.database.setup import reraise_db_timeout
+from src.config import get_settings
+from src.utils.geo import covering_cells, haversine_km
+
+settings = get_settings()
 
 
 async def create_listing(
@@ -27,6 +38,12 @@ async def create_listing(
             detail="Start time must be before end time",
         )
 
+    if (listing_data.latitude is None) != (listing_data.longitude is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Latitude and longitude must be given together",
+        )
+
     # Check if user exists
     user_result = await session.execute(
         select(RenExUser).filter(RenExUser.id == user_id)
@@ -48,18 +65,20 @@ async def create_listing(
             start_time=listing_data.start_time,
             end_time=listing_data.end_time,
             description=listing_data.description,
+            latitude=listing_data.latitude,
+            longitude=listing_data.longitude,
             user_id=user_id,
             status="active",
         )
 
         session.add(new_listing)
         await session.commit()
-        await session.refresh(new_listing)
 
         return ListingResponse.model_validate(new_listing)
 
     except Exception as e:
         await session.rollback()
+        reraise_db_timeout(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create listing: {str(e)}",
@@ -88,20 +107,21 @@ async def get_user_listings(
     status_filter: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
-) -> List[ListingResponse]:
-    """Get all listings for a specific user"""
+    cursor: Optional[str] = None,
+) -> tuple[List[ListingResponse], Optional[str]]:
+    """Get a page of a user's listings and the cursor of the next one"""
 
     query = select(Listings).filter(Listings.user_id == user_id)
 
     if status_filter:
         query = query.filter(Listings.status == status_filter)
 
-    query = query.order_by(desc(Listings.created_at)).limit(limit).offset(offset)
-
-    result = await session.execute(query)
-    listings = result.scalars().all()
+    listings, next_cursor = await paginate(
+        session, query, Listings, limit, cursor=cursor, offset=offset
+    )
 
-    return [ListingResponse.model_validate(listing) for listing in listings]
+    responses = [ListingResponse.model_validate(listing) for listing in listings]
+    return responses, next_cursor
 
 
 async def update_listing(
@@ -148,15 +168,24 @@ async def update_listing(
                 detail="Start time must be before end time",
             )
 
+    # checked on the result, so {"latitude": 5, "longitude": null} is rejected
+    latitude = update_dict.get("latitude", listing.latitude)
+    longitude = update_dict.get("longitude", listing.longitude)
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Latitude and longitude must be given together",
+        )
+
     for field, value in update_dict.items():
         setattr(listing, field, value)
 
     try:
         await session.commit()
-        await session.refresh(listing)
         return ListingResponse.model_validate(listing)
     except Exception as e:
         await session.rollback()
+        reraise_db_timeout(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update listing: {str(e)}",
@@ -187,12 +216,37 @@ async def delete_listing(
         return {"message": "Listing deleted successfully"}
     except Exception as e:
         await session.rollback()
+        reraise_db_timeout(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete listing: {str(e)}",
         )
 
 
+def feed_query(
+    session: AsyncSession,
+    listing_type: Optional[str] = None,
+    energy_type: Optional[str] = None,
+    location: Optional[str] = None,
+):
+    """Active listings matching the feed filters, from every user"""
+    query = select(Listings).filter(Listings.status == "active")
+
+    if listing_type:
+        query = query.filter(Listings.listing_type == listing_type)
+
+    if energy_type:
+        query = query.filter(Listings.energy_type == energy_type)
+
+    if location:
+        # substring or fuzzy match on the normalized column, see search.py
+        match = location_match(session, location)
+        if match is not None:
+            query = query.filter(match)
+
+    return query
+
+
 async def get_feed_listings(
     user_id: UUID,
     session: AsyncSession,
@@ -201,49 +255,153 @@ async def get_feed_listings(
     location: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
+    count_mode: str = "exact",
 ) -> ListingFeedResponse:
     """Get feed of listings from other users (excluding current user's listings)"""
 
     offset = (page - 1) * page_size
 
-    # Build query - exclude user's own listings and only show active listings
-    query = select(Listings).filter(
-        and_(Listings.user_id != user_id, Listings.status == "active")
+    # exclude user's own listings
+    query = feed_query(session, listing_type, energy_type, location).filter(
+        Listings.user_id != user_id
     )
 
-    # Apply filters
-    if listing_type:
-        query = query.filter(Listings.listing_type == listing_type)
-
-    if energy_type:
-        query = query.filter(Listings.energy_type == energy_type)
-
-    if location:
-        # Simple location matching (can be enhanced with geolocation)
-        query = query.filter(Listings.location.ilike(f"%{location}%"))
-
-    # Get total count
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await session.execute(count_query)
-    total = total_result.scalar() or 0
-
-    # Get paginated results
-    query = query.order_by(desc(Listings.created_at)).limit(page_size).offset(offset)
-    result = await session.execute(query)
-    listings = result.scalars().all()
+    # Get total count, see counts.py for the cheaper modes
+    total = None
+    if count_mode == "estimated":
+        if location:
+            total = await estimate_count(session, query)
+        else:
+            total = await feed_counters.total(session, listing_type, energy_type)
+        if total is None:
+            count_mode = "exact"
+    if count_mode == "exact":
+        count_query = select(func.count()).select_from(query.subquery())
+        total_result = await session.execute(count_query)
+        total = total_result.scalar() or 0
+
+    # Get paginated results, a cursor takes precedence over page
+    listings, next_cursor = await paginate(
+        session, query, Listings, page_size, cursor=cursor, offset=offset
+    )
 
     return ListingFeedResponse(
         listings=[ListingResponse.model_validate(listing) for listing in listings],
         total=total,
         page=page,
         page_size=page_size,
+        next_cursor=next_cursor,
+        has_more=next_cursor is not None,
+        count_mode=count_mode,
+    )
+
+
+async def get_nearby_listings(
+    user_id: UUID,
+    session: AsyncSession,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    listing_type: Optional[str] = None,
+    energy_type: Optional[str] = None,
+    limit: int = 20,
+) -> List[NearbyListingResponse]:
+    """Active listings of other users within radius_km, nearest first"""
+    nearby = await _listings_within(
+        user_id, session, latitude, longitude, radius_km, listing_type, energy_type
     )
+    return _nearby_responses(nearby[:limit])
+
+
+async def get_nearest_listings(
+    user_id: UUID,
+    session: AsyncSession,
+    latitude: float,
+    longitude: float,
+    listing_type: Optional[str] = None,
+    energy_type: Optional[str] = None,
+    limit: int = 20,
+) -> List[NearbyListingResponse]:
+    """The `limit` active listings of other users nearest to a point
+
+    Searches circles growing NEAREST_RADIUS_GROWTH times from
+    NEAREST_START_RADIUS_KM. Every listing inside a circle was fetched, so once
+    one holds `limit` of them they are the nearest. The last circle covers the
+    whole globe.
+    """
+    radius_km = settings.NEAREST_START_RADIUS_KM
+    while True:
+        nearby = await _listings_within(
+            user_id, session, latitude, longitude, radius_km, listing_type, energy_type
+        )
+        whole_globe = not covering_cells(latitude, longitude, radius_km)
+        if len(nearby) >= limit or whole_globe:
+            return _nearby_responses(nearby[:limit])
+        radius_km *= settings.NEAREST_RADIUS_GROWTH
+
+
+async def _listings_within(
+    user_id: UUID,
+    session: AsyncSession,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    listing_type: Optional[str],
+    energy_type: Optional[str],
+) -> list[tuple[float, Listings]]:
+    """(distance, listing) of the matching listings within radius_km, sorted"""
+    query = select(Listings).filter(
+        and_(
+            Listings.user_id != user_id,
+            Listings.status == "active",
+            Listings.geohash.is_not(None),
+        )
+    )
+    if listing_type:
+        query = query.filter(Listings.listing_type == listing_type)
+    if energy_type:
+        query = query.filter(Listings.energy_type == energy_type)
+
+    # candidates come from the few geohash cells covering the circle, a circle
+    # too large for any cell reads every listing
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells:
+        query = query.filter(geohash_match(session, cells))
+
+    result = await session.execute(query)
+    nearby = []
+    for listing in result.scalars().all():
+        distance = haversine_km(
+            latitude, longitude, listing.latitude, listing.longitude
+        )
+        if distance <= radius_km or not cells:
+            nearby.append((distance, listing))
+    nearby.sort(key=lambda pair: pair[0])
+    return nearby
+
+
+def _nearby_responses(
+    nearby: list[tuple[float, Listings]],
+) -> List[NearbyListingResponse]:
+    return [
+        NearbyListingResponse(
+            **ListingResponse.model_validate(listing).model_dump(),
+            distance_km=round(distance, 3),
+        )
+        for distance, listing in nearby
+    ]
 
 
 async def get_matching_listings(
-    user_listing_id: UUID, session: AsyncSession
-) -> List[ListingResponse]:
-    """Get listings that match a user's listing (e.g., supply matches demand)"""
+    user_listing_id: UUID, session: AsyncSession, limit: int = 20
+) -> List[ListingMatchResponse]:
+    """Get listings that match a user's listing (e.g., supply matches demand)
+
+    Ranked by the order book, see orderbook.py. Until it is loaded, the best
+    priced overlapping listings are read from the database and ranked the same
+    way.
+    """
 
     # Get the user's listing
     result = await session.execute(
@@ -256,23 +414,51 @@ async def get_matching_listings(
             status_code=status.HTTP_404_NOT_FOUND, detail="Listing not found"
         )
 
-    # Find matching listings
+    target = Order.of(user_listing)
+    supply = user_listing.listing_type == "supply"
     # If user has a supply listing, find demand listings (and vice versa)
-    opposite_type = "demand" if user_listing.listing_type == "supply" else "supply"
-
-    query = select(Listings).filter(
-        and_(
-            Listings.user_id != user_listing.user_id,
-            Listings.listing_type == opposite_type,
-            Listings.energy_type == user_listing.energy_type,
-            Listings.status == "active",
-            # Time overlap
-            Listings.start_time <= user_listing.end_time,
-            Listings.end_time >= user_listing.start_time,
-        )
+    criteria = (
+        Listings.user_id != user_listing.user_id,
+        Listings.listing_type == opposite(user_listing.listing_type),
+        Listings.energy_type == user_listing.energy_type,
+        Listings.status == "active",
+        # Time overlap
+        Listings.start_time <= user_listing.end_time,
+        Listings.end_time >= user_listing.start_time,
     )
-
+    # spares for the book's matches the re-read finds no longer matching
+    candidates = limit * 2
+    if order_book.loaded:
+        matches = order_book.match(
+            target, user_listing.listing_type, user_listing.energy_type, candidates
+        )
+        ids = [match.order.id for match in matches]
+        if not ids:
+            return []
+        # the book may trail writes made by other workers, rank the rows as they
+        # are now
+        query = select(Listings).filter(Listings.id.in_(ids), *criteria)
+    else:
+        # a supply listing wants the highest bids and a demand listing the
+        # lowest asks, which also puts the compatible prices first
+        price = Listings.price.desc() if supply else Listings.price.asc()
+        query = (
+            select(Listings)
+            .filter(*criteria)
+            .order_by(price, Listings.id)
+            .limit(candidates)
+        )
     result = await session.execute(query)
-    listings = result.scalars().all()
+    listings = {listing.id: listing for listing in result.scalars()}
+    matches = rank(
+        target, supply, [Order.of(listing) for listing in listings.values()], limit
+    )
 
-    return [ListingResponse.model_validate(listing) for listing in listings]
+    return [
+        ListingMatchResponse(
+            **ListingResponse.model_validate(listings[match.order.id]).model_dump(),
+            score=round(match.score, 4),
+            price_compatible=match.price_compatible,
+        )
+        for match in matches
+    ]
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, Query, status
-from fastapi.responses import JSONResponse
-from src.database.setup import get_db_session, AsyncSession
-from src.auth.service import get_current_user
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.responses import JSONResponse, Response
+from src.database.setup import (
+    AsyncSession,
+    DBSession,
+    FeedDBSession,
+    ReadDBSession,
+)
+from src.auth.service import get_current_user_from_token
 from src.auth.schemas import CurrentUser
 from src.utils import CustomJSONResponse
 from src.listings.schemas import (
@@ -10,7 +15,12 @@ from src.listings.schemas import (
     ListingResponse,
     ListingFeedResponse,
     ListingDetailResponse,
+    ListingMatchResponse,
+    LocationSuggestion,
+    NearbyListingResponse,
 )
+from src.listings.feed_cache import cached_feed_page
+from src.listings.search import search_locations
 from src.listings.service import (
     create_listing,
     get_listing_by_id,
@@ -19,9 +29,14 @@ from src.listings.service import (
     delete_listing,
     get_feed_listings,
     get_matching_listings,
+    get_nearby_listings,
+    get_nearest_listings,
 )
-from typing import Optional
+from src.config import get_settings
+from typing import Literal, Optional
+
 
+settings = get_settings()
 
 base_router = APIRouter(prefix="/listings", tags=["Listings"])
 
@@ -31,8 +46,8 @@ base_router = APIRouter(prefix="/listings", tags=["Listings"])
 )
 async def create_new_listing(
     listing_data: ListingCreateRequest,
-    user: CurrentUser = Depends(get_current_user),
-    session: AsyncSession = Depends(get_db_session),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = DBSession,
 ):
     """Create a new energy listing"""
     result = await create_listing(
@@ -45,6 +60,7 @@ async def create_new_listing(
 
 @base_router.get("/feed", response_model=ListingFeedResponse)
 async def get_feed(
+    request: Request,
     listing_type: Optional[str] = Query(
         None, description="Filter by listing type: demand or supply"
     ),
@@ -54,10 +70,30 @@ async def get_feed(
     location: Optional[str] = Query(None, description="Filter by location"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
-    user: CurrentUser = Depends(get_current_user),
-    session: AsyncSession = Depends(get_db_session),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor of the previous page, replaces page"
+    ),
+    count_mode: Optional[Literal["exact", "estimated", "has_more"]] = Query(
+        None, description="How total is computed, defaults to FEED_COUNT_MODE"
+    ),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = FeedDBSession,
 ):
     """Get feed of listings from other users"""
+    if cursor is None:
+        body = await cached_feed_page(
+            app=request.app,
+            user_id=user.id,
+            session=session,
+            listing_type=listing_type,
+            energy_type=energy_type,
+            location=location,
+            page=page,
+            page_size=page_size,
+            count_mode=count_mode or settings.FEED_COUNT_MODE,
+        )
+        if body is not None:
+            return Response(content=body, media_type="application/json")
     result = await get_feed_listings(
         user_id=user.id,
         session=session,
@@ -66,6 +102,8 @@ async def get_feed(
         location=location,
         page=page,
         page_size=page_size,
+        cursor=cursor,
+        count_mode=count_mode or settings.FEED_COUNT_MODE,
     )
     return CustomJSONResponse(status_code=status.HTTP_200_OK,
                               content=result.model_dump())
@@ -78,16 +116,98 @@ async def get_my_listings(
     ),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    user: CurrentUser = Depends(get_current_user),
-    session: AsyncSession = Depends(get_db_session),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor of the previous page, replaces offset"
+    ),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = ReadDBSession,
 ):
     """Get all listings created by the current user"""
-    result = await get_user_listings(
+    result, next_cursor = await get_user_listings(
         user_id=user.id,
         session=session,
         status_filter=status_filter,
         limit=limit,
         offset=offset,
+        cursor=cursor,
+    )
+    return CustomJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=[listing.model_dump() for listing in result],
+        headers={"X-Next-Cursor": next_cursor} if next_cursor else None,
+    )
+
+
+@base_router.get("/locations", response_model=list[LocationSuggestion])
+async def suggest_locations(
+    q: str = Query(..., min_length=1, max_length=100, description="Location typed"),
+    limit: int = Query(10, ge=1, le=50),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = FeedDBSession,
+):
+    """Locations of active listings matching q, for the feed's location filter"""
+    result = await search_locations(q, session, limit=limit)
+    return CustomJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=[suggestion.model_dump() for suggestion in result],
+    )
+
+
+@base_router.get("/nearby", response_model=list[NearbyListingResponse])
+async def get_nearby(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude"),
+    radius_km: float = Query(50, gt=0, le=1000, description="Search radius in km"),
+    listing_type: Optional[str] = Query(
+        None, description="Filter by listing type: demand or supply"
+    ),
+    energy_type: Optional[str] = Query(
+        None, description="Filter by energy type: solar or wind"
+    ),
+    limit: int = Query(20, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = FeedDBSession,
+):
+    """Listings from other users within radius_km, nearest first"""
+    result = await get_nearby_listings(
+        user_id=user.id,
+        session=session,
+        latitude=lat,
+        longitude=lon,
+        radius_km=radius_km,
+        listing_type=listing_type,
+        energy_type=energy_type,
+        limit=limit,
+    )
+    return CustomJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=[listing.model_dump() for listing in result],
+    )
+
+
+@base_router.get("/nearest", response_model=list[NearbyListingResponse])
+async def get_nearest(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude"),
+    listing_type: Optional[str] = Query(
+        None, description="Filter by listing type: demand or supply"
+    ),
+    energy_type: Optional[str] = Query(
+        None, description="Filter by energy type: solar or wind"
+    ),
+    limit: int = Query(20, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = FeedDBSession,
+):
+    """The `limit` listings from other users nearest to a point, at any distance"""
+    result = await get_nearest_listings(
+        user_id=user.id,
+        session=session,
+        latitude=lat,
+        longitude=lon,
+        listing_type=listing_type,
+        energy_type=energy_type,
+        limit=limit,
     )
     return CustomJSONResponse(
         status_code=status.HTTP_200_OK,
@@ -98,8 +218,8 @@ async def get_my_listings(
 @base_router.get("/{listing_id}", response_model=ListingResponse)
 async def get_listing(
     listing_id: str,
-    user: CurrentUser = Depends(get_current_user),
-    session: AsyncSession = Depends(get_db_session),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = ReadDBSession,
 ):
     """Get a specific listing by ID"""
     from uuid import UUID
@@ -120,8 +240,8 @@ async def get_listing(
 async def update_my_listing(
     listing_id: str,
     update_data: ListingUpdateRequest,
-    user: CurrentUser = Depends(get_current_user),
-    session: AsyncSession = Depends(get_db_session),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = DBSession,
 ):
     """Update a listing (only by owner)"""
     from uuid import UUID
@@ -146,8 +266,8 @@ async def update_my_listing(
 @base_router.delete("/{listing_id}", status_code=status.HTTP_200_OK)
 async def delete_my_listing(
     listing_id: str,
-    user: CurrentUser = Depends(get_current_user),
-    session: AsyncSession = Depends(get_db_session),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = DBSession,
 ):
     """Delete a listing (only by owner)"""
     from uuid import UUID
@@ -166,13 +286,19 @@ async def delete_my_listing(
     return CustomJSONResponse(status_code=status.HTTP_200_OK, content=result)
 
 
-@base_router.get("/{listing_id}/matches", response_model=list[ListingResponse])
+@base_router.get(
+    "/{listing_id}/matches", response_model=list[ListingMatchResponse]
+)
 async def get_matching_listings_for_listing(
     listing_id: str,
-    user: CurrentUser = Depends(get_current_user),
-    session: AsyncSession = Depends(get_db_session),
+    limit: int = Query(20, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user_from_token),
+    session: AsyncSession = FeedDBSession,
 ):
-    """Get listings that match a specific listing (e.g., supply matches demand)"""
+    """Get listings that match a specific listing (e.g., supply matches demand)
+
+    Best matches first, see src/listings/orderbook.py for the ranking
+    """
     from uuid import UUID
 
     try:
@@ -183,7 +309,9 @@ async def get_matching_listings_for_listing(
             content={"detail": "Invalid listing ID format"},
         )
 
-    result = await get_matching_listings(user_listing_id=listing_uuid, session=session)
+    result = await get_matching_listings(
+        user_listing_id=listing_uuid, session=session, limit=limit
+    )
     return CustomJSONResponse(
         status_code=status.HTTP_200_OK,
         content=[listing.model_dump() for listing in result],
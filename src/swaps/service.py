@@ -1,5 +1,6 @@
-from sqlalchemy import select, and_, or_, func, desc
+from sqlalchemy import select, and_, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from fastapi import HTTPException, status
 from typing import List, Optional
 from uuid import UUID
@@ -15,6 +16,8 @@ from src.swaps.schemas import (
 from src.swaps.enums import SwapStatus
 from src.listings.models import Listings
 from src.auth.models import RenExUser
+from src.database.pagination import paginate
+from src.database.setup import reraise_db_timeout
 
 
 async def create_swap(
@@ -84,12 +87,12 @@ async def create_swap(
 
         session.add(new_swap)
         await session.commit()
-        await session.refresh(new_swap)
 
         return SwapResponse.model_validate(new_swap)
 
     except Exception as e:
         await session.rollback()
+        reraise_db_timeout(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create swap: {str(e)}",
@@ -101,13 +104,30 @@ async def get_swap_by_id(
 ) -> SwapDetailResponse:
     """Get a swap by ID with details"""
 
-    result = await session.execute(select(Swap).filter(Swap.id == swap_id))
-    swap = result.scalar_one_or_none()
+    # the listing and both parties come from the same statement
+    initiator = aliased(RenExUser)
+    recipient = aliased(RenExUser)
+    result = await session.execute(
+        select(
+            Swap,
+            Listings.energy_type,
+            Listings.location,
+            Listings.volume,
+            initiator.email,
+            recipient.email,
+        )
+        .outerjoin(Listings, Listings.id == Swap.listing_id)
+        .outerjoin(initiator, initiator.id == Swap.initiator_id)
+        .outerjoin(recipient, recipient.id == Swap.recipient_id)
+        .filter(Swap.id == swap_id)
+    )
+    row = result.one_or_none()
 
-    if not swap:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Swap not found"
         )
+    swap, energy_type, location, volume, initiator_email, recipient_email = row
 
     # Check if user has permission to view this swap
     if user_id and swap.initiator_id != user_id and swap.recipient_id != user_id:
@@ -116,30 +136,14 @@ async def get_swap_by_id(
             detail="You don't have permission to view this swap",
         )
 
-    # Get related data
-    listing_result = await session.execute(
-        select(Listings).filter(Listings.id == swap.listing_id)
-    )
-    listing = listing_result.scalar_one_or_none()
-
-    initiator_result = await session.execute(
-        select(RenExUser).filter(RenExUser.id == swap.initiator_id)
-    )
-    initiator = initiator_result.scalar_one_or_none()
-
-    recipient_result = await session.execute(
-        select(RenExUser).filter(RenExUser.id == swap.recipient_id)
-    )
-    recipient = recipient_result.scalar_one_or_none()
-
     swap_dict = SwapResponse.model_validate(swap).model_dump()
     swap_dict.update(
         {
-            "listing_energy_type": listing.energy_type if listing else None,
-            "listing_location": listing.location if listing else None,
-            "listing_volume": listing.volume if listing else None,
-            "initiator_email": initiator.email if initiator else None,
-            "recipient_email": recipient.email if recipient else None,
+            "listing_energy_type": energy_type,
+            "listing_location": location,
+            "listing_volume": volume,
+            "initiator_email": initiator_email,
+            "recipient_email": recipient_email,
         }
     )
 
@@ -187,12 +191,12 @@ async def respond_to_swap(
                 swap.message = f"Response: {update_data.message}"
 
         await session.commit()
-        await session.refresh(swap)
 
         return SwapResponse.model_validate(swap)
 
     except Exception as e:
         await session.rollback()
+        reraise_db_timeout(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update swap: {str(e)}",
@@ -229,12 +233,12 @@ async def cancel_swap(
     try:
         swap.status = SwapStatus.CANCELLED.value
         await session.commit()
-        await session.refresh(swap)
 
         return SwapResponse.model_validate(swap)
 
     except Exception as e:
         await session.rollback()
+        reraise_db_timeout(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to cancel swap: {str(e)}",
@@ -280,12 +284,12 @@ async def complete_swap(
                 listing.status = "completed"
 
         await session.commit()
-        await session.refresh(swap)
 
         return SwapResponse.model_validate(swap)
 
     except Exception as e:
         await session.rollback()
+        reraise_db_timeout(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to complete swap: {str(e)}",
@@ -299,8 +303,9 @@ async def get_user_swaps(
     status_filter: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
-) -> List[SwapResponse]:
-    """Get swaps for a user"""
+    cursor: Optional[str] = None,
+) -> tuple[List[SwapResponse], Optional[str]]:
+    """Get a page of a user's swaps and the cursor of the next one"""
 
     offset = (page - 1) * page_size
 
@@ -319,12 +324,11 @@ async def get_user_swaps(
     if status_filter:
         query = query.filter(Swap.status == status_filter)
 
-    query = query.order_by(desc(Swap.created_at)).limit(page_size).offset(offset)
-
-    result = await session.execute(query)
-    swaps = result.scalars().all()
+    swaps, next_cursor = await paginate(
+        session, query, Swap, page_size, cursor=cursor, offset=offset
+    )
 
-    return [SwapResponse.model_validate(swap) for swap in swaps]
+    return [SwapResponse.model_validate(swap) for swap in swaps], next_cursor
 
 
 async def get_swaps_for_listing(
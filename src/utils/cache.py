@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from src.utils.metrics import METRICS
+
+_MISSING = object()
+# handed to waiters when the loading caller was cancelled, they load again
+_RETRY = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after ttl seconds
+
+    get_or_load is single-flight: concurrent misses for the same key wait on
+    the first caller's load instead of each running their own. Everything
+    runs on the event loop thread, so no locking is needed. Expired entries
+    are dropped in expiry order on every write, so they never hold capacity
+    that live entries need.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._loading: dict[Hashable, asyncio.Future] = {}
+        self._expiry: list[tuple[float, int, Hashable]] = []
+        self._sequence = 0
+
+        self._hits = METRICS.counter(f"cache.{name}.hits")
+        self._misses = METRICS.counter(f"cache.{name}.misses")
+        self._evictions = METRICS.counter(f"cache.{name}.evictions")
+        METRICS.gauge(f"cache.{name}.size", lambda: len(self._entries))
+
+    def get(self, key: Hashable, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses.inc()
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._misses.inc()
+            return default
+        self._entries.move_to_end(key)
+        self._hits.inc()
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        now = time.monotonic()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+        self._sequence += 1
+        heapq.heappush(self._expiry, (expires_at, self._sequence, key))
+        self.purge_expired(now)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._evictions.inc()
+
+    def purge_expired(self, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            expires_at, _, key = heapq.heappop(expiry)
+            entry = self._entries.get(key)
+            # skip heap records of entries that were overwritten since
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[key]
+
+        # drop records of overwritten or evicted entries so the heap stays bounded
+        if len(expiry) > 2 * self.maxsize:
+            self._expiry = [
+                (expires_at, i, key)
+                for i, (key, (_, expires_at)) in enumerate(self._entries.items())
+            ]
+            heapq.heapify(self._expiry)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+        # a load that started before the write must not repopulate the entry
+        self._loading.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._loading.clear()
+        self._expiry.clear()
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the cached value or load it once for all concurrent callers
+
+        Loaders returning None are not cached.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            value = await asyncio.shield(pending)
+            if value is _RETRY:
+                return await self.get_or_load(key, loader)
+            return value
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            # only this caller was cancelled, the waiters retry the load
+            future.set_result(_RETRY)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            is_current = self._loading.get(key) is future
+            if is_current:
+                del self._loading[key]
+
+        if is_current and value is not None:
+            self.set(key, value)
+        future.set_result(value)
+        return value
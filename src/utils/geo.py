@@ -0,0 +1,92 @@
+"""Great-circle distance and geohashes, no PostGIS needed
+
+A geohash interleaves longitude and latitude bits into base32, so points close
+together share a prefix and a B-tree index on the hash answers "everything in
+this cell" as a range scan. A radius query looks up the few cells covering the
+circle's bounding box, then filters candidates on the exact distance.
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def encode_geohash(lat: float, lon: float, precision: int = 12) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, char, even = [], 0, 0, True
+    while len(chars) < precision:
+        # even bits split longitude, odd bits latitude
+        value, bounds = (lon, lon_range) if even else (lat, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        char <<= 1
+        if value >= middle:
+            char |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[char])
+            bits, char = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(latitude, longitude) degrees spanned by a cell of `precision` chars"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> list[str]:
+    """Geohash prefixes whose cells together contain the circle
+
+    Uses the longest prefix whose cells are at least radius_km across, so at
+    most 3x3 cells are returned. An empty list means the circle is too large
+    for any prefix and every row is a candidate.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    lon_delta = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+
+    precision = 0
+    while precision < 12:
+        lat_size, lon_size = cell_size(precision + 1)
+        if lat_size < lat_delta or lon_size < lon_delta:
+            break
+        precision += 1
+    if precision == 0:
+        return []
+
+    lat_size, lon_size = cell_size(precision)
+    south, north = max(lat - lat_delta, -90.0), min(lat + lat_delta, 90.0)
+    west, east = lon - lon_delta, lon + lon_delta
+
+    cells = set()
+    # stepping by the cell size visits every cell the bounding box overlaps
+    cell_lat = south
+    while True:
+        cell_lon = west
+        while True:
+            wrapped = (cell_lon + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(min(cell_lat, 90.0 - 1e-9), wrapped, precision))
+            if cell_lon >= east:
+                break
+            cell_lon = min(cell_lon + lon_size, east)
+        if cell_lat >= north:
+            break
+        cell_lat = min(cell_lat + lat_size, north)
+    return sorted(cells)
@@ -0,0 +1,98 @@
+import os
+import time
+from collections import deque
+from collections.abc import Callable
+from contextlib import contextmanager
+from threading import Lock
+
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+class Histogram:
+    """Keeps running totals plus a bounded window of recent samples for percentiles"""
+
+    def __init__(self, window: int = 2048):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+            self._samples.append(value)
+
+    @contextmanager
+    def time_ms(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - start) * 1000)
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class MetricsRegistry:
+    """Process local registry of named counters, histograms and gauges"""
+
+    def __init__(self):
+        self._counters: dict[str, Counter] = {}
+        self._histograms: dict[str, Histogram] = {}
+        self._gauges: dict[str, Callable[[], float]] = {}
+
+    def counter(self, name: str) -> Counter:
+        if name not in self._counters:
+            self._counters[name] = Counter()
+        return self._counters[name]
+
+    def histogram(self, name: str) -> Histogram:
+        if name not in self._histograms:
+            self._histograms[name] = Histogram()
+        return self._histograms[name]
+
+    def gauge(self, name: str, func: Callable[[], float]):
+        self._gauges[name] = func
+
+    def snapshot(self) -> dict:
+        return {
+            # each worker keeps its own registry, the pid tells them apart
+            "pid": os.getpid(),
+            "counters": {k: v.snapshot() for k, v in self._counters.items()},
+            "histograms": {k: v.snapshot() for k, v in self._histograms.items()},
+            "gauges": {k: func() for k, func in self._gauges.items()},
+        }
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,48 @@
+"""Text normalization and trigram similarity shared by the search columns
+
+The trigrams follow pg_trgm: words are padded with two leading spaces and one
+trailing space, so "lagos" gives "  l", " la", "lag", "ago", "gos", "os ".
+word_similarity() is the SQLite stand-in for pg_trgm's function of the same
+name, close enough to keep tests and PostgreSQL agreeing on obvious matches.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# pg_trgm.word_similarity_threshold default, used by the <% operator
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_text(value: str) -> str:
+    """Casefolded, accents and punctuation stripped, single spaced"""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", stripped.casefold()).strip()
+
+
+@lru_cache(maxsize=4096)
+def trigrams(value: str) -> frozenset[str]:
+    grams = set()
+    for word in value.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def word_similarity(term: str | None, text: str | None) -> float:
+    """Best trigram similarity between `term` and a run of words of `text`"""
+    if not term or not text:
+        return 0.0
+    wanted = trigrams(term)
+    words = text.split()
+    # runs longer than the term plus one word only dilute the score
+    longest = len(term.split()) + 1
+    best = 0.0
+    for start in range(len(words)):
+        for end in range(start + 1, min(start + longest, len(words)) + 1):
+            window = trigrams(" ".join(words[start:end]))
+            best = max(best, len(wanted & window) / len(wanted | window))
+    return best
@@ -0,0 +1,119 @@
+"""Shared fixtures
+
+The app runs against SQLite files in a temporary directory. The environment is
+set before anything imports src.config, so a local .env never points the
+tests at a real database.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+DB_DIR = Path(tempfile.mkdtemp(prefix="renex-tests-"))
+API = "/renex/api"
+
+os.environ.update(
+    HOST="127.0.0.1",
+    PORT="8080",
+    DB_CONNECTION_STRING=f"sqlite+aiosqlite:///{DB_DIR / 'primary.sqlite'}",
+    DB_AUTO_MIGRATE="true",
+    DB_SSL_MODE="",
+    JWT_SECRET_KEY="test-access-secret-with-enough-bytes",
+    JWT_REFRESH_SECRET="test-refresh-secret-with-enough-bytes",
+    JWT_ALGORITHM="HS256",
+    JWT_EXP="30",
+    JWT_REFRESH_EXP="7",
+    ADMIN_API_KEY="test-admin-key",
+    INTERNAL_API_KEY="test-internal-key",
+    IMPORT_DIR=str(DB_DIR / "imports"),
+    QUERY_BUDGET_MODE="fail",
+    # every request comes from the same test client address
+    THROTTLE_IP_LIMIT="100000",
+    # cheap hashes, the cost parameters are not under test
+    ARGON2_TIME_COST="1",
+    ARGON2_MEMORY_COST="8192",
+    ARGON2_PARALLELISM="1",
+)
+
+# register every model with the mapper, as main.py does
+from src.auth.models import RenExUser  # noqa: E402, F401
+from src.listings.models import Listings  # noqa: E402, F401
+from src.swaps.models import Swap  # noqa: E402, F401
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def new_user(client):
+    """Sign up a fresh user, returning its Authorization headers"""
+
+    def create() -> dict[str, str]:
+        email = f"{uuid4().hex[:12]}@example.com"
+        response = client.post(
+            f"{API}/auth/sign-up",
+            json={
+                "email": email,
+                "password": "correct-horse",
+                "first_name": "Test",
+                "last_name": "User",
+            },
+        )
+        assert response.status_code == 201, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return create
+
+
+@pytest.fixture
+def new_listing(client):
+    """Create a listing as `headers`, returning the response body"""
+
+    def create(headers: dict[str, str], **fields) -> dict:
+        payload = {
+            "listing_type": "supply",
+            "energy_type": "solar",
+            "volume": 100,
+            "price": 0.15,
+            "location": "Lagos, Nigeria",
+            "start_time": "2030-01-15T08:00:00Z",
+            "end_time": "2030-01-15T18:00:00Z",
+            **fields,
+        }
+        response = client.post(f"{API}/listings/", json=payload, headers=headers)
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    return create
+
+
+@pytest.fixture
+def replica(client, tmp_path):
+    """An empty, migrated replica behind the app's read-only sessions"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from src.database.migrate import migrate
+    from src.database.setup import ReplicaRouter, recent_writers
+
+    async def attach():
+        path = tmp_path / "replica.sqlite"
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        await migrate(engine)
+        return ReplicaRouter([engine], cooldown=30)
+
+    router = client.portal.call(attach)
+    client.app.state.replica_router = router
+    yield router
+    client.app.state.replica_router = None
+    client.portal.call(router.close)
+    recent_writers.clear()
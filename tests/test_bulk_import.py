@@ -0,0 +1,56 @@
+import asyncio
+
+from fastapi import HTTPException, status
+
+from src.auth import bulk_import
+from src.config import get_settings
+
+API = "/renex/api"
+ADMIN = {"X-Admin-Key": "test-admin-key"}
+
+
+async def test_import_hashes_share_the_import_slots(monkeypatch):
+    monkeypatch.setattr(bulk_import, "_import_slots", asyncio.Semaphore(1))
+    running, peak = 0, 0
+
+    async def hash_password(password):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return f"hash:{password}"
+
+    monkeypatch.setattr(bulk_import, "hash_password", hash_password)
+    first, second = await asyncio.gather(
+        bulk_import.admitted_hasher(["a", "b"]),
+        bulk_import.admitted_hasher(["c"]),
+    )
+    assert (first, second) == (["hash:a", "hash:b"], ["hash:c"])
+    assert peak == 1
+
+
+async def test_shed_hashes_are_retried(monkeypatch):
+    monkeypatch.setattr(get_settings(), "HASH_RETRY_AFTER", 0)
+    calls = 0
+
+    async def hash_password(password):
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return f"hash:{password}"
+
+    monkeypatch.setattr(bulk_import, "hash_password", hash_password)
+    assert await bulk_import.admitted_hasher(["a"]) == ["hash:a"]
+    assert calls == 3
+
+
+def test_upload_rejected_without_a_spare_hashing_slot(client, monkeypatch):
+    monkeypatch.setattr(bulk_import, "IMPORT_HASH_SLOTS", 0)
+    response = client.post(
+        f"{API}/auth/admin/import-users",
+        files={"file": ("users.csv", b"email,password,first_name,last_name\n")},
+        headers=ADMIN,
+    )
+    assert response.status_code == 503, response.text
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.migrate import migrate
+from src.database.query_log import assert_max_queries, register_query_events
+from src.listings.counts import FeedCounters
+
+
+@pytest.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'feed.sqlite'}")
+    await migrate(engine)
+    register_query_events(engine)
+    yield async_sessionmaker(bind=engine)
+    await engine.dispose()
+
+
+async def test_concurrent_reloads_share_one_query(session_maker):
+    counters = FeedCounters(ttl=60)
+    sessions = [session_maker() for _ in range(5)]
+    with assert_max_queries(1):
+        totals = await asyncio.gather(
+            *(counters.total(session, "supply") for session in sessions)
+        )
+    assert totals == [0] * 5
+    assert counters.fresh
+    for session in sessions:
+        await session.close()
+
+
+async def test_waiters_reload_when_the_loader_is_cancelled(session_maker):
+    counters = FeedCounters(ttl=60)
+    async with session_maker() as first, session_maker() as second:
+        loader = asyncio.create_task(counters.load(first))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(counters.load(second))
+        await asyncio.sleep(0)
+        loader.cancel()
+        await waiter
+    assert loader.cancelled()
+    assert counters.fresh
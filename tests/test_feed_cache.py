@@ -0,0 +1,123 @@
+import asyncio
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import update
+
+from src.listings.feed_cache import feed_cache
+from src.listings.models import Listings
+
+API = "/renex/api"
+
+
+@pytest.fixture
+def place():
+    """A location no other test's listings are in"""
+    return f"Feedtown{uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def settled():
+    """Wait for the feed cache's background refreshes"""
+
+    def wait(client):
+        async def run():
+            await asyncio.gather(*feed_cache._refreshes)
+
+        client.portal.call(run)
+
+    return wait
+
+
+def feed(client, headers, place: str) -> dict[str, dict]:
+    response = client.get(
+        f"{API}/listings/feed", params={"location": place}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return {listing["id"]: listing for listing in response.json()["listings"]}
+
+
+def reprice_behind_the_cache(client, listing_id: str, price: float):
+    """Change a listing without the cache hearing of it, like a write made by
+    another worker"""
+
+    async def run():
+        async with client.app.state.session_maker() as session:
+            await session.execute(
+                update(Listings)
+                .where(Listings.id == UUID(listing_id))
+                .values(price=price)
+            )
+            await session.commit()
+
+    client.portal.call(run)
+
+
+def test_repeated_feed_is_served_from_cache(client, new_user, new_listing, place):
+    owner, reader = new_user(), new_user()
+    listing = new_listing(owner, location=f"{place}, Nigeria")
+
+    assert list(feed(client, reader, place)) == [listing["id"]]
+    hits = feed_cache._hits.value
+    assert list(feed(client, reader, place)) == [listing["id"]]
+    assert feed_cache._hits.value == hits + 1
+
+
+def test_listing_writes_invalidate_feed(client, new_user, new_listing, place):
+    owner, reader = new_user(), new_user()
+    first = new_listing(owner, location=f"{place}, Nigeria")
+    assert list(feed(client, reader, place)) == [first["id"]]
+
+    second = new_listing(owner, location=f"{place}, Nigeria")
+    assert set(feed(client, reader, place)) == {first["id"], second["id"]}
+
+    response = client.put(
+        f"{API}/listings/{first['id']}", json={"price": 0.42}, headers=owner
+    )
+    assert response.status_code == 200, response.text
+    assert feed(client, reader, place)[first["id"]]["price"] == 0.42
+
+    response = client.delete(f"{API}/listings/{first['id']}", headers=owner)
+    assert response.status_code < 300, response.text
+    assert list(feed(client, reader, place)) == [second["id"]]
+
+
+def test_stale_entry_served_while_refreshed(
+    client, new_user, new_listing, place, settled, monkeypatch
+):
+    monkeypatch.setattr(feed_cache, "ttl", 0)
+    owner, reader = new_user(), new_user()
+    listing = new_listing(owner, location=f"{place}, Nigeria", price=0.1)
+    assert feed(client, reader, place)[listing["id"]]["price"] == 0.1
+
+    reprice_behind_the_cache(client, listing["id"], 0.3)
+    stale_hits = feed_cache._stale_hits.value
+    assert feed(client, reader, place)[listing["id"]]["price"] == 0.1
+    assert feed_cache._stale_hits.value == stale_hits + 1
+
+    settled(client)
+    assert feed(client, reader, place)[listing["id"]]["price"] == 0.3
+
+
+def test_load_after_invalidation_reads_primary(
+    client, replica, new_user, new_listing, place
+):
+    owner, reader = new_user(), new_user()
+    listing = new_listing(owner, location=f"{place}, Nigeria")
+    # the reader's session is on the replica, which never got the listing
+    assert list(feed(client, reader, place)) == [listing["id"]]
+
+
+def test_refresh_reads_replica_once_writes_settled(
+    client, replica, new_user, new_listing, place, settled, monkeypatch
+):
+    monkeypatch.setattr(feed_cache, "ttl", 0)
+    owner, reader = new_user(), new_user()
+    listing = new_listing(owner, location=f"{place}, Nigeria")
+    assert list(feed(client, reader, place)) == [listing["id"]]
+
+    # the stale entry is served and refreshed from the empty replica
+    monkeypatch.setattr(feed_cache, "primary_window", 0)
+    assert list(feed(client, reader, place)) == [listing["id"]]
+    settled(client)
+    assert feed(client, reader, place) == {}
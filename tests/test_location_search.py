@@ -0,0 +1,46 @@
+from uuid import UUID
+
+from sqlalchemy import update
+
+from src.listings.feed_cache import feed_cache
+from src.listings.models import Listings
+
+API = "/renex/api"
+
+
+def clear_location_search(client, listing_id: str):
+    """Make a listing look like one written before migration v0004"""
+
+    async def run():
+        async with client.app.state.session_maker() as session:
+            await session.execute(
+                update(Listings)
+                .where(Listings.id == UUID(listing_id))
+                .values(location_search=None)
+            )
+            await session.commit()
+
+    client.portal.call(run)
+    feed_cache.clear()
+
+
+def feed_ids(client, headers, location: str) -> set[str]:
+    response = client.get(
+        f"{API}/listings/feed", params={"location": location}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return {listing["id"] for listing in response.json()["listings"]}
+
+
+def test_feed_matches_normalized_location(client, new_user, new_listing):
+    listing = new_listing(new_user(), location="São Tomé, Príncipe")
+    assert listing["id"] in feed_ids(client, new_user(), "sao tome")
+
+
+def test_feed_matches_listing_without_location_search(
+    client, new_user, new_listing
+):
+    listing = new_listing(new_user(), location="Kumasi, Ghana")
+    clear_location_search(client, listing["id"])
+    assert listing["id"] in feed_ids(client, new_user(), "kumasi")
+    assert listing["id"] not in feed_ids(client, new_user(), "accra")
@@ -0,0 +1,13 @@
+API = "/renex/api"
+
+
+def test_logout_revokes_access_token_everywhere(client, new_user):
+    headers = new_user()
+    assert client.get(f"{API}/auth/me", headers=headers).status_code == 200
+
+    response = client.post(f"{API}/auth/logout", headers=headers)
+    assert response.status_code == 204, response.text
+
+    for path in ("/auth/me", "/listings/me"):
+        response = client.get(API + path, headers=headers)
+        assert response.status_code == 401, f"{path}: {response.text}"
@@ -0,0 +1,114 @@
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import update
+
+from src.listings.models import Listings
+from src.listings.orderbook import order_book
+
+API = "/renex/api"
+
+WINDOW = {"start_time": "2031-06-01T08:00:00Z", "end_time": "2031-06-01T18:00:00Z"}
+
+
+def deactivate_behind_the_book(client, listing_ids: list[str]):
+    """Deactivate listings without the order book hearing of it, like a write
+    made by another worker"""
+
+    async def run():
+        async with client.app.state.session_maker() as session:
+            await session.execute(
+                update(Listings)
+                .where(Listings.id.in_([UUID(i) for i in listing_ids]))
+                .values(status="inactive")
+            )
+            await session.commit()
+
+    client.portal.call(run)
+
+
+def match_ids(client, headers, listing_id: str, limit: int) -> list[str]:
+    response = client.get(
+        f"{API}/listings/{listing_id}/matches",
+        params={"limit": limit},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return [match["id"] for match in response.json()]
+
+
+def test_matches_fill_limit_past_stale_listings(client, new_user, new_listing):
+    buyer, seller = new_user(), new_user()
+    demand = new_listing(
+        buyer, listing_type="demand", energy_type="wind", price=0.3, **WINDOW
+    )
+    for price in (0.1, 0.12, 0.14, 0.16):
+        new_listing(seller, energy_type="wind", price=price, **WINDOW)
+
+    best = match_ids(client, buyer, demand["id"], limit=2)
+    assert len(best) == 2
+    deactivate_behind_the_book(client, best)
+
+    remaining = match_ids(client, buyer, demand["id"], limit=2)
+    assert len(remaining) == 2
+    assert not set(remaining) & set(best)
+
+
+def change_behind_the_book(client, listing_id: str, **values):
+    async def run():
+        async with client.app.state.session_maker() as session:
+            await session.execute(
+                update(Listings).where(Listings.id == UUID(listing_id)).values(**values)
+            )
+            await session.commit()
+
+    client.portal.call(run)
+
+
+def test_matches_reflect_terms_changed_behind_the_book(client, new_user, new_listing):
+    buyer, seller = new_user(), new_user()
+    window = {"start_time": "2031-07-01T08:00:00Z", "end_time": "2031-07-01T18:00:00Z"}
+    demand = new_listing(
+        buyer, listing_type="demand", energy_type="wind", price=0.3, **window
+    )
+    moved, repriced = (
+        new_listing(seller, energy_type="wind", price=price, **window)["id"]
+        for price in (0.1, 0.2)
+    )
+
+    # one no longer overlaps the demand, the other now asks more than it bids
+    change_behind_the_book(
+        client,
+        moved,
+        start_time=datetime(2032, 1, 1, tzinfo=timezone.utc),
+        end_time=datetime(2032, 1, 2, tzinfo=timezone.utc),
+    )
+    change_behind_the_book(client, repriced, price=0.5)
+
+    response = client.get(f"{API}/listings/{demand['id']}/matches", headers=buyer)
+    assert response.status_code == 200, response.text
+    matches = response.json()
+    assert [match["id"] for match in matches] == [repriced]
+    assert matches[0]["price"] == 0.5
+    assert not matches[0]["price_compatible"]
+
+
+def test_fallback_reads_the_best_priced_listings(
+    client, new_user, new_listing, monkeypatch
+):
+    buyer, seller = new_user(), new_user()
+    window = {"start_time": "2031-08-01T08:00:00Z", "end_time": "2031-08-01T18:00:00Z"}
+    demand = new_listing(
+        buyer, listing_type="demand", energy_type="wind", price=0.3, **window
+    )
+    for price in (0.4, 0.25, 0.1, 0.2, 0.35):
+        new_listing(seller, energy_type="wind", price=price, **window)
+
+    monkeypatch.setattr(order_book, "loaded", False)
+    response = client.get(
+        f"{API}/listings/{demand['id']}/matches",
+        params={"limit": 2},
+        headers=buyer,
+    )
+    assert response.status_code == 200, response.text
+    assert [match["price"] for match in response.json()] == [0.1, 0.2]
@@ -0,0 +1,7 @@
+API = "/renex/api"
+
+
+def test_metrics_require_the_admin_key(client):
+    assert client.get(f"{API}/metrics").status_code == 403
+    response = client.get(f"{API}/metrics", headers={"X-Admin-Key": "test-admin-key"})
+    assert response.status_code == 200, response.text
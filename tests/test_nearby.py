@@ -0,0 +1,75 @@
+import math
+
+import pytest
+
+from src.utils.geo import KM_PER_DEGREE_LAT
+
+API = "/renex/api"
+
+# points in the southern oceans, far from each other and the other tests' listings
+ORIGINS = {"nearby": (-40.0, -140.0), "nearest": (-50.0, 100.0)}
+
+
+@pytest.fixture
+def far_listings(request, new_user, new_listing):
+    """Listings about 1, 500 and 3000 km east of the test's origin"""
+    owner = new_user()
+    lat, lon = ORIGINS[request.param]
+    km_per_degree = KM_PER_DEGREE_LAT * math.cos(math.radians(lat))
+    return [
+        new_listing(owner, latitude=lat, longitude=lon + km / km_per_degree)
+        for km in (1, 500, 3000)
+    ]
+
+
+@pytest.mark.parametrize("far_listings", ["nearby"], indirect=True)
+def test_nearby_stays_within_radius(client, new_user, far_listings):
+    lat, lon = ORIGINS["nearby"]
+    response = client.get(
+        f"{API}/listings/nearby",
+        params={"lat": lat, "lon": lon, "radius_km": 600},
+        headers=new_user(),
+    )
+    assert response.status_code == 200, response.text
+    assert [listing["id"] for listing in response.json()] == [
+        listing["id"] for listing in far_listings[:2]
+    ]
+
+
+@pytest.mark.parametrize("far_listings", ["nearest"], indirect=True)
+def test_nearest_grows_until_limit_is_reached(client, new_user, far_listings):
+    lat, lon = ORIGINS["nearest"]
+    response = client.get(
+        f"{API}/listings/nearest",
+        params={"lat": lat, "lon": lon, "limit": 3},
+        headers=new_user(),
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [listing["id"] for listing in body] == [
+        listing["id"] for listing in far_listings
+    ]
+    distances = [listing["distance_km"] for listing in body]
+    assert distances == sorted(distances)
+    assert distances[-1] > 2500
+
+
+def test_update_rejects_latitude_without_longitude(client, new_user, new_listing):
+    owner = new_user()
+    listing = new_listing(owner, latitude=6.5, longitude=3.4)
+    url = f"{API}/listings/{listing['id']}"
+
+    response = client.put(
+        url, json={"latitude": 5, "longitude": None}, headers=owner
+    )
+    assert response.status_code == 400, response.text
+
+    response = client.put(url, json={"latitude": 5}, headers=owner)
+    assert response.status_code == 200, response.text
+    assert (response.json()["latitude"], response.json()["longitude"]) == (5, 3.4)
+
+    response = client.put(
+        url, json={"latitude": None, "longitude": None}, headers=owner
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["latitude"] is None
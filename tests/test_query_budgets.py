@@ -0,0 +1,245 @@
+"""Statements run by every endpoint, read from the X-DB-Queries header
+
+Each request is made with the caches that save queries cleared, so the count
+is the worst case, and compared with its ROUTE_QUERY_BUDGETS entry. conftest
+runs with QUERY_BUDGET_MODE=fail, so an overrun also fails the request.
+"""
+
+from collections.abc import Callable
+from uuid import uuid4
+
+import pytest
+
+from src.auth.service import token_version_cache, user_cache
+from src.auth.views import base_router as auth_router
+from src.database.query_log import ROUTE_QUERY_BUDGETS
+from src.listings.counts import feed_counters
+from src.listings.feed_cache import feed_cache
+from src.listings.views import base_router as listings_router
+from src.swaps.views import base_router as swaps_router
+
+API = "/renex/api"
+ADMIN = {"X-Admin-Key": "test-admin-key"}
+INTERNAL = {"X-Internal-Key": "test-internal-key"}
+PASSWORD = "correct-horse"
+
+
+def route_keys() -> set[str]:
+    return {
+        f"{method} {route.path}"
+        for router in (auth_router, listings_router, swaps_router)
+        for route in router.routes
+        for method in route.methods
+    }
+
+
+def cold_caches():
+    token_version_cache.clear()
+    user_cache.clear()
+    feed_cache.clear()
+    feed_counters.loaded_at = None
+
+
+class Scenario:
+    """A seller with a supply listing and a buyer with a matching demand"""
+
+    def __init__(self, client, new_user, new_listing):
+        self.client = client
+        self.new_listing = new_listing
+        self.email = f"{uuid4().hex[:12]}@example.com"
+        response = client.post(
+            f"{API}/auth/sign-up",
+            json={
+                "email": self.email,
+                "password": PASSWORD,
+                "first_name": "Test",
+                "last_name": "Seller",
+            },
+        )
+        self.tokens = response.json()
+        self.seller = {"Authorization": f"Bearer {self.tokens['access_token']}"}
+        self.buyer = new_user()
+        self.listing = new_listing(self.seller, latitude=6.5, longitude=3.4)
+        self.demand = new_listing(self.buyer, listing_type="demand", price=0.2)
+
+    def swap(self, status: str | None = None) -> str:
+        """A swap proposed by the buyer, answered with `status` by the seller"""
+        response = self.client.post(
+            f"{API}/swaps/",
+            json={"listing_id": self.listing["id"], "proposed_volume": 10},
+            headers=self.buyer,
+        )
+        assert response.status_code == 201, response.text
+        swap_id = response.json()["id"]
+        if status is not None:
+            response = self.client.put(
+                f"{API}/swaps/{swap_id}/respond",
+                json={"status": status},
+                headers=self.seller,
+            )
+            assert response.status_code == 200, response.text
+        return swap_id
+
+    def import_upload(self) -> dict:
+        rows = f"email,password,first_name,last_name\n{uuid4().hex}@example.com,"
+        rows += f"{PASSWORD},Imported,User\n"
+        return {"files": {"file": ("users.csv", rows.encode())}, "headers": ADMIN}
+
+    def import_job(self) -> str:
+        response = self.client.post(
+            f"{API}/auth/admin/import-users", **self.import_upload()
+        )
+        assert response.status_code == 202, response.text
+        return response.json()["job_id"]
+
+
+# stubs answering 501, still measured
+NOT_IMPLEMENTED = {"POST /auth/google-oauth", "POST /auth/forgot-password"}
+
+# route -> (url, request arguments) of a request that succeeds on it
+CASES: dict[str, Callable[[Scenario], tuple[str, dict]]] = {
+    "POST /auth/sign-up": lambda s: (
+        "/auth/sign-up",
+        {
+            "json": {
+                "email": f"{uuid4().hex[:12]}@example.com",
+                "password": PASSWORD,
+                "first_name": "New",
+                "last_name": "User",
+            }
+        },
+    ),
+    "POST /auth/login": lambda s: (
+        "/auth/login",
+        {"json": {"email": s.email, "password": PASSWORD}},
+    ),
+    "POST /auth/form-login": lambda s: (
+        "/auth/form-login",
+        {"data": {"username": s.email, "password": PASSWORD}},
+    ),
+    "GET /auth/me": lambda s: ("/auth/me", {"headers": s.seller}),
+    "POST /auth/refresh-token": lambda s: (
+        "/auth/refresh-token",
+        {"json": {"refresh_token": s.tokens["refresh_token"]}},
+    ),
+    "POST /auth/logout": lambda s: ("/auth/logout", {"headers": s.buyer}),
+    "POST /auth/introspect": lambda s: (
+        "/auth/introspect",
+        {"json": {"tokens": [s.tokens["access_token"]]}, "headers": INTERNAL},
+    ),
+    "POST /auth/admin/import-users": lambda s: (
+        "/auth/admin/import-users",
+        s.import_upload(),
+    ),
+    "GET /auth/admin/import-users/{job_id}": lambda s: (
+        f"/auth/admin/import-users/{s.import_job()}",
+        {"headers": ADMIN},
+    ),
+    "POST /auth/google-oauth": lambda s: (
+        "/auth/google-oauth",
+        {"json": {"id_token": "token"}},
+    ),
+    "POST /auth/forgot-password": lambda s: (
+        "/auth/forgot-password",
+        {"params": {"request": s.email}},
+    ),
+    "POST /listings/": lambda s: (
+        "/listings/",
+        {
+            "json": {
+                "listing_type": "supply",
+                "energy_type": "wind",
+                "volume": 50,
+                "price": 0.12,
+                "location": "Abuja, Nigeria",
+                "start_time": "2030-02-01T08:00:00Z",
+                "end_time": "2030-02-01T18:00:00Z",
+            },
+            "headers": s.seller,
+        },
+    ),
+    "GET /listings/feed": lambda s: (
+        "/listings/feed",
+        {"params": {"location": "lagos"}, "headers": s.buyer},
+    ),
+    "GET /listings/me": lambda s: ("/listings/me", {"headers": s.seller}),
+    "GET /listings/locations": lambda s: (
+        "/listings/locations",
+        {"params": {"q": "lag"}, "headers": s.buyer},
+    ),
+    "GET /listings/nearby": lambda s: (
+        "/listings/nearby",
+        {"params": {"lat": 6.5, "lon": 3.4}, "headers": s.buyer},
+    ),
+    "GET /listings/nearest": lambda s: (
+        "/listings/nearest",
+        {"params": {"lat": -33.9, "lon": 18.4, "limit": 100}, "headers": s.buyer},
+    ),
+    "GET /listings/{listing_id}": lambda s: (
+        f"/listings/{s.listing['id']}",
+        {"headers": s.buyer},
+    ),
+    "PUT /listings/{listing_id}": lambda s: (
+        f"/listings/{s.listing['id']}",
+        {"json": {"price": 0.18}, "headers": s.seller},
+    ),
+    "DELETE /listings/{listing_id}": lambda s: (
+        f"/listings/{s.listing['id']}",
+        {"headers": s.seller},
+    ),
+    "GET /listings/{listing_id}/matches": lambda s: (
+        f"/listings/{s.demand['id']}/matches",
+        {"headers": s.buyer},
+    ),
+    "POST /swaps/": lambda s: (
+        "/swaps/",
+        {
+            "json": {"listing_id": s.listing["id"], "proposed_volume": 10},
+            "headers": s.buyer,
+        },
+    ),
+    "GET /swaps/me": lambda s: ("/swaps/me", {"headers": s.buyer}),
+    "GET /swaps/{swap_id}": lambda s: (f"/swaps/{s.swap()}", {"headers": s.seller}),
+    "PUT /swaps/{swap_id}/respond": lambda s: (
+        f"/swaps/{s.swap()}/respond",
+        {"json": {"status": "accepted"}, "headers": s.seller},
+    ),
+    "POST /swaps/{swap_id}/cancel": lambda s: (
+        f"/swaps/{s.swap()}/cancel",
+        {"headers": s.buyer},
+    ),
+    "POST /swaps/{swap_id}/complete": lambda s: (
+        f"/swaps/{s.swap('accepted')}/complete",
+        {"headers": s.seller},
+    ),
+    "GET /swaps/listing/{listing_id}": lambda s: (
+        f"/swaps/listing/{s.listing['id']}",
+        {"headers": s.seller},
+    ),
+}
+
+
+@pytest.fixture
+def scenario(client, new_user, new_listing):
+    return Scenario(client, new_user, new_listing)
+
+
+def test_every_endpoint_has_a_budget():
+    assert route_keys() - ROUTE_QUERY_BUDGETS.keys() == set()
+
+
+def test_every_endpoint_is_measured():
+    assert route_keys() == CASES.keys()
+
+
+@pytest.mark.parametrize("route", sorted(CASES))
+def test_query_budget(client, scenario, route):
+    method, _ = route.split(" ", 1)
+    url, kwargs = CASES[route](scenario)
+    cold_caches()
+    response = client.request(method, API + url, **kwargs)
+    if route in NOT_IMPLEMENTED:
+        assert response.status_code == 501, response.text
+    else:
+        assert response.status_code < 400, response.text
+    assert int(response.headers["x-db-queries"]) <= ROUTE_QUERY_BUDGETS[route]
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.query_log import (
+    assert_max_queries,
+    fingerprint,
+    query_stats,
+    register_query_events,
+)
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    register_query_events(engine)
+    yield engine
+    await engine.dispose()
+
+
+def test_fingerprint_replaces_literals_and_lists():
+    assert fingerprint("SELECT * FROM t WHERE a = 'x' AND b IN (?, ?, ?)") == (
+        "SELECT * FROM t WHERE a = ? AND b IN (...)"
+    )
+
+
+async def test_failed_statements_are_counted(engine):
+    sql = "SELECT * FROM missing_table WHERE id = 7"
+    with assert_max_queries(2) as queries:
+        async with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                await conn.execute(text(sql))
+            await conn.execute(text("SELECT 1"))
+
+    assert queries.count == 2
+    assert queries.fingerprints[fingerprint(sql)] == 1
+    stats = query_stats[fingerprint(sql)].snapshot()
+    assert stats["errors"] >= 1
+    assert query_stats[fingerprint("SELECT 1")].snapshot()["errors"] == 0
@@ -0,0 +1,117 @@
+"""Read replica routing, with SQLite files standing in for the primary and its
+replicas. A replica whose directory doesn't exist refuses connections."""
+
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.setup import ReplicaRouter, recent_writers
+
+API = "/renex/api"
+
+
+def sqlite_engine(path):
+    return create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+
+@pytest.fixture
+async def router(tmp_path):
+    router = ReplicaRouter(
+        [sqlite_engine(tmp_path / f"replica-{i}.sqlite") for i in range(2)],
+        cooldown=30,
+    )
+    yield router
+    await router.close()
+
+
+def test_candidates_rotate(router):
+    assert router.candidates() == [0, 1]
+    assert router.candidates() == [1, 0]
+    assert router.candidates() == [0, 1]
+    assert router.candidates(advance=False) == [1, 0]
+
+
+def test_marked_down_replica_skipped_for_cooldown(router):
+    router.mark_down(0, OSError("connection refused"))
+    assert router.candidates() == [1]
+    assert router.candidates() == [1]
+
+
+def test_marked_down_replica_returns_after_cooldown(router):
+    router.cooldown = 0.05
+    router.mark_down(0, OSError("connection refused"))
+    assert router.candidates(advance=False) == [1]
+    time.sleep(0.06)
+    assert sorted(router.candidates(advance=False)) == [0, 1]
+
+
+async def test_open_session_fails_over_to_next_replica(tmp_path):
+    dead = sqlite_engine(tmp_path / "missing" / "replica.sqlite")
+    alive = sqlite_engine(tmp_path / "replica.sqlite")
+    router = ReplicaRouter([dead, alive], cooldown=30)
+    try:
+        session = await router.open_session("detail")
+        assert session is not None
+        assert session.bind is alive
+        assert session.info["read_only"]
+        await session.close()
+        assert router.candidates(advance=False) == [1]
+    finally:
+        await router.close()
+
+
+async def test_open_session_none_when_every_replica_is_down(tmp_path):
+    router = ReplicaRouter(
+        [sqlite_engine(tmp_path / "missing" / "replica.sqlite")], cooldown=30
+    )
+    try:
+        assert await router.open_session("detail") is None
+        assert router.candidates() == []
+    finally:
+        await router.close()
+
+
+async def test_health_check_restores_replica(tmp_path):
+    missing = tmp_path / "missing"
+    router = ReplicaRouter([sqlite_engine(missing / "replica.sqlite")], cooldown=30)
+    try:
+        await router.check_health()
+        assert router.candidates() == []
+        missing.mkdir()
+        await router.check_health()
+        assert router.candidates() == [0]
+    finally:
+        await router.close()
+
+
+def test_reads_go_to_replica(client, replica, new_user, new_listing):
+    owner, reader = new_user(), new_user()
+    listing = new_listing(owner)
+    # the replica never receives the write, so reading from it finds nothing
+    response = client.get(f"{API}/listings/{listing['id']}", headers=reader)
+    assert response.status_code == 404
+
+
+def test_reads_stay_on_primary_after_own_write(
+    client, replica, new_user, new_listing
+):
+    owner = new_user()
+    listing = new_listing(owner)
+    response = client.get(f"{API}/listings/{listing['id']}", headers=owner)
+    assert response.status_code == 200
+
+    # once the read-after-write window is over, the replica serves it again
+    recent_writers.clear()
+    response = client.get(f"{API}/listings/{listing['id']}", headers=owner)
+    assert response.status_code == 404
+
+
+def test_reads_fall_back_to_primary_when_replicas_are_down(
+    client, replica, new_user, new_listing
+):
+    owner, reader = new_user(), new_user()
+    listing = new_listing(owner)
+    replica.mark_down(0, OSError("connection refused"))
+    response = client.get(f"{API}/listings/{listing['id']}", headers=reader)
+    assert response.status_code == 200
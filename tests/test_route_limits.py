@@ -0,0 +1,47 @@
+"""Per-class statement and lock timeouts on PostgreSQL connections, checked
+against a stand-in connection that records what reaches the driver"""
+
+from types import SimpleNamespace
+
+from src.database.setup import _apply_route_limits
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent: list[str] = []
+        self.dialect = SimpleNamespace(name="postgresql")
+        driver = SimpleNamespace(
+            run_async=lambda fn: self.sent.append(fn(SimpleNamespace(execute=str)))
+        )
+        self.connection = SimpleNamespace(info={}, dbapi_connection=driver)
+
+
+def begin(connection, route_class: str | None, read_only: bool = False):
+    info = {}
+    if route_class is not None:
+        info = {"route_class": route_class, "read_only": read_only}
+    _apply_route_limits(SimpleNamespace(info=info), None, connection)
+
+
+def test_limits_are_only_sent_when_they_change():
+    connection = FakeConnection()
+    begin(connection, "feed", read_only=True)
+    begin(connection, "feed", read_only=True)
+    assert len(connection.sent) == 1
+    assert "default_transaction_read_only = on" in connection.sent[0]
+
+    begin(connection, "write")
+    assert len(connection.sent) == 2
+    assert "default_transaction_read_only = off" in connection.sent[1]
+
+
+def test_sessions_outside_routes_reset_the_limits():
+    connection = FakeConnection()
+    begin(connection, None)
+    assert connection.sent == []
+
+    begin(connection, "auth")
+    begin(connection, None)
+    assert connection.sent[-1].startswith("RESET")
+    begin(connection, None)
+    assert len(connection.sent) == 2
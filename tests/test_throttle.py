@@ -0,0 +1,55 @@
+import pytest
+from fastapi import HTTPException
+
+from src.auth.throttle import (
+    LoginThrottle,
+    MemoryThrottleBackend,
+    SQLiteThrottleBackend,
+)
+
+EMAIL = "victim@example.com"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def throttle(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryThrottleBackend(max_keys=100)
+    else:
+        backend = SQLiteThrottleBackend(str(tmp_path / "throttle.sqlite"))
+    return LoginThrottle(
+        backend,
+        window=60,
+        ip_limit=100,
+        email_limit=5,
+        free_failures=1,
+        base_delay=60,
+        max_delay=900,
+    )
+
+
+async def assert_throttled(throttle, ip: str):
+    with pytest.raises(HTTPException) as error:
+        await throttle.check(ip, EMAIL)
+    assert error.value.status_code == 429
+
+
+async def test_failures_back_off_only_their_ip(throttle):
+    for _ in range(2):
+        await throttle.check("10.0.0.1", EMAIL)
+        await throttle.record_failure("10.0.0.1", EMAIL)
+
+    await assert_throttled(throttle, "10.0.0.1")
+    await throttle.check("10.0.0.2", EMAIL)
+
+
+async def test_success_clears_the_back_off(throttle):
+    await throttle.record_failure("10.0.0.1", EMAIL)
+    await throttle.record_failure("10.0.0.1", EMAIL)
+    await throttle.record_success("10.0.0.1", EMAIL)
+    await throttle.check("10.0.0.1", EMAIL)
+
+
+async def test_email_is_rate_limited_across_ips(throttle):
+    for i in range(5):
+        await throttle.check(f"10.0.0.{i}", EMAIL)
+    await assert_throttled(throttle, "10.0.0.9")